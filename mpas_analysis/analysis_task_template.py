@@ -15,16 +15,18 @@ Instructions for creating a new analysis task:
 2. note, no changes need to be made to mpas_analysis/shared/analysis_task.py
 3. modify config.default (and possibly any machine-specific config files in
    configs/<machine>)
-4. import new analysis task in mpas_analysis/<component>/__init__.py
-5. add new analysis task to run_analysis.py under build_analysis_list:
-      analyses.append(<component>.MyTask(config, myArg='argValue'))
-   This will add a new object of the MyTask class to a list of analysis tasks
-   created in build_analysis_list.  Later on in run_analysis, it will first
-   go through the list to make sure each task needs to be generated
-   (by calling check_generate, which is defined in AnalysisTask), then, will
-   call setup_and_check on each task (to make sure the appropriate AM is on
-   and files are present), and will finally call run on each task that is
-   to be generated and is set up properly.
+4. add new analysis task to taskRegistry in mpas_analysis/task_registry.py:
+      RegisteredTask('myTask', '<component>', ['<tag1>', '<tag2>'],
+                     'mpas_analysis.<component>.<my_task_module>', 'MyTask',
+                     {'myArg': 'argValue'}),
+   The task name, component and tags must match those passed to
+   AnalysisTask.__init__ below.  In run_analysis, build_analysis_list first
+   goes through the registry to find the tasks that need to be generated
+   (by calling check_generate, which is defined in AnalysisTask), then
+   imports the module and creates an object of the MyTask class for each of
+   these, then will call setup_and_check on each task (to make sure the
+   appropriate AM is on and files are present), and will finally call run on
+   each task that is to be generated and is set up properly.
 
 Don't forget to remove this docstring. (It's not needed.)
 
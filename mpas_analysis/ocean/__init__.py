@@ -1,7 +1,2 @@
-from climatology_map import ClimatologyMapSST, ClimatologyMapMLD, \
-    ClimatologyMapSSS
-from time_series_ohc import TimeSeriesOHC
-from time_series_sst import TimeSeriesSST
-from index_nino34 import IndexNino34
-from streamfunction_moc import StreamfunctionMOC
-from meridional_heat_transport import MeridionalHeatTransport
\ No newline at end of file
+# Analysis tasks are imported only when needed, through
+# mpas_analysis.task_registry
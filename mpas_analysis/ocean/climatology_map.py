@@ -24,8 +24,7 @@ from ..shared.io.utility import build_config_full_path
 from ..shared.io import write_netcdf
 from ..shared.html import write_image_xml
 
-from ..shared.generalized_reader.generalized_reader \
-    import open_multifile_dataset
+from ..shared.generalized_reader.dataset_broker import datasetBroker
 
 from ..shared.timekeeping.utility import get_simulation_start_time
 
@@ -33,8 +32,9 @@ from ..shared.climatology import get_lat_lon_comparison_descriptor, \
     get_remapper, get_mpas_climatology_file_names, \
     get_observation_climatology_file_names, \
     compute_climatology, cache_climatologies, \
+    get_climatology_cache_file_names, \
     update_climatology_bounds_from_file_names, \
-    remap_and_write_climatology
+    remap_and_write_climatology, MpasMappingFileStage
 
 from ..shared.grid import MpasMeshDescriptor, LatLonGridDescriptor
 
@@ -88,6 +88,30 @@ class ClimatologyMapOcean(AnalysisTask):  # {{{
         changed, self.startYear, self.endYear, self.startDate, self.endDate = \
             update_climatology_bounds_from_file_names(self.inputFiles,
                                                       self.config)
+
+        # climatologies are cached one year at a time
+        self.add_input_files(self.inputFiles,
+                             variableList=[self.mpasFieldName],
+                             iselValues=self.iselValues,
+                             timeSlicesInMemory=12)
+
+        # the data set is shared with other tasks that read the same files
+        self.datasetKey = datasetBroker.register(
+            self.inputFiles, self.calendar,
+            timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
+            variableList=[self.mpasFieldName], iselValues=self.iselValues)
+
+        try:
+            self.restartFileName = self.runStreams.readpath('restart')[0]
+        except ValueError:
+            raise IOError('No MPAS-O restart file found: need at least one '
+                          'restart file for ocn_modelvsobs calculation')
+
+        # the mapping file is shared with other tasks, so it is created in a
+        # separate stage
+        self.add_stage(MpasMappingFileStage(self.config,
+                                            self.restartFileName))
+
         mainRunName = self.config.get('runs', 'mainRunName')
         comparisonTimes = self.config.getExpression(self.taskName,
                                                     'comparisonTimes')
@@ -105,6 +129,32 @@ class ClimatologyMapOcean(AnalysisTask):  # {{{
 
         # }}}
 
+    def get_cache_files(self):  # {{{
+        """
+        Returns the climatology of the model results for each season, before
+        and after remapping, and the climatologies of spans of years from
+        which it is aggregated
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        comparisonDescriptor = get_lat_lon_comparison_descriptor(self.config)
+        cacheFiles = []
+        for season in self.config.getExpression(self.taskName,
+                                                'comparisonTimes'):
+            (climatologyFileName, climatologyPrefix, remappedFileName) = \
+                get_mpas_climatology_file_names(
+                    config=self.config,
+                    fieldName=self.fieldName,
+                    monthNames=season,
+                    mpasMeshName=self.config.get('input', 'mpasMeshName'),
+                    comparisonGridName=comparisonDescriptor.meshName)
+            cacheFiles.extend(get_climatology_cache_file_names(
+                self.config, climatologyPrefix))
+            cacheFiles.append(remappedFileName)
+        return cacheFiles  # }}}
+
     def run(self):  # {{{
         """
         Plots a comparison of ACME/MPAS output to SST, MLD or SSS observations
@@ -117,6 +167,25 @@ class ClimatologyMapOcean(AnalysisTask):  # {{{
         print "\nPlotting 2-d maps of {} climatologies...".format(
             self.fieldNameInTitle)
 
+        # release the shared data set even if the analysis fails, so it is
+        # closed once the other tasks using it are done
+        try:
+            self._compute_and_plot()
+        finally:
+            datasetBroker.release(self.datasetKey)
+
+        # }}}
+
+    def _compute_and_plot(self):  # {{{
+        """
+        Computes seasonal climatologies of the model results and
+        observations, then plots them and their biases
+
+        Authors
+        -------
+        Luke Van Roekel, Xylar Asay-Davis, Milena Veneziani
+        """
+
         # get local versions of member variables for convenience
         config = self.config
         calendar = self.calendar
@@ -131,43 +200,28 @@ class ClimatologyMapOcean(AnalysisTask):  # {{{
 
         mainRunName = config.get('runs', 'mainRunName')
 
-        try:
-            restartFileName = self.runStreams.readpath('restart')[0]
-        except ValueError:
-            raise IOError('No MPAS-O restart file found: need at least one '
-                          'restart file for ocn_modelvsobs calculation')
-
         outputTimes = config.getExpression(self.taskName, 'comparisonTimes')
 
         comparisonDescriptor = get_lat_lon_comparison_descriptor(config)
 
         varList = [self.mpasFieldName]
 
-        ds = open_multifile_dataset(fileNames=self.inputFiles,
-                                    calendar=calendar,
-                                    config=config,
-                                    simulationStartTime=simulationStartTime,
-                                    timeVariableName=['xtime_startMonthly',
-                                                      'xtime_endMonthly'],
-                                    variableList=varList,
-                                    iselValues=self.iselValues,
-                                    startDate=self.startDate,
-                                    endDate=self.endDate)
+        ds = datasetBroker.open_dataset(
+            self.datasetKey, config, simulationStartTime=simulationStartTime,
+            variableList=varList, iselValues=self.iselValues,
+            startDate=self.startDate, endDate=self.endDate,
+            chunking='climatology')
 
         mpasDescriptor = MpasMeshDescriptor(
-            restartFileName, meshName=config.get('input', 'mpasMeshName'))
-
-        parallel = self.config.getint('execute', 'parallelTaskCount') > 1
-        if parallel:
-            # avoid writing the same mapping file from multiple processes
-            mappingFilePrefix = 'map_{}'.format(self.taskName)
-        else:
-            mappingFilePrefix = 'map'
+            self.restartFileName,
+            meshName=config.get('input', 'mpasMeshName'))
 
+        # the mapping file has typically already been created by the
+        # MpasMappingFileStage
         mpasRemapper = get_remapper(
             config=config, sourceDescriptor=mpasDescriptor,
             comparisonDescriptor=comparisonDescriptor,
-            mappingFilePrefix=mappingFilePrefix,
+            mappingFilePrefix='map',
             method=config.get('climatology', 'mpasInterpolationMethod'))
 
         obsDescriptor = LatLonGridDescriptor()
@@ -359,6 +413,9 @@ class ClimatologyMapSST(ClimatologyMapOcean):  # {{{
 
         self.outFileLabel = 'sstHADOI'
 
+        self.mpasFieldName = 'timeMonthly_avg_activeTracers_temperature'
+        self.iselValues = {'nVertLevels': 0}
+
         # first, call setup_and_check from the base class (AnalysisTask),
         # which will perform some common setup, including storing:
         #     self.runDirectory , self.historyDirectory, self.plotsDirectory,
@@ -374,9 +431,6 @@ class ClimatologyMapSST(ClimatologyMapOcean):  # {{{
             "{}/MODEL.SST.HAD187001-198110.OI198111-201203.nc".format(
                 observationsDirectory)
 
-        self.mpasFieldName = 'timeMonthly_avg_activeTracers_temperature'
-        self.iselValues = {'nVertLevels': 0}
-
         self.obsFieldName = 'SST'
 
         climStartYear = self.config.getint('oceanObservations',
@@ -478,6 +532,9 @@ class ClimatologyMapSSS(ClimatologyMapOcean):  # {{{
 
         self.outFileLabel = 'sssAquarius'
 
+        self.mpasFieldName = 'timeMonthly_avg_activeTracers_salinity'
+        self.iselValues = {'nVertLevels': 0}
+
         # first, call setup_and_check from the base class (AnalysisTask),
         # which will perform some common setup, including storing:
         #     self.runDirectory , self.historyDirectory, self.plotsDirectory,
@@ -493,9 +550,6 @@ class ClimatologyMapSSS(ClimatologyMapOcean):  # {{{
             '{}/Aquarius_V3_SSS_Monthly.nc'.format(
                 observationsDirectory)
 
-        self.mpasFieldName = 'timeMonthly_avg_activeTracers_salinity'
-        self.iselValues = {'nVertLevels': 0}
-
         self.obsFieldName = 'SSS'
 
         self.observationTitleLabel = 'Observations (Aquarius, 2011-2014)'
@@ -580,6 +634,9 @@ class ClimatologyMapMLD(ClimatologyMapOcean):  # {{{
 
         self.outFileLabel = 'mldHolteTalleyARGO'
 
+        self.mpasFieldName = 'timeMonthly_avg_dThreshMLD'
+        self.iselValues = None
+
         # first, call setup_and_check from the base class (AnalysisTask),
         # which will perform some common setup, including storing:
         #     self.runDirectory , self.historyDirectory, self.plotsDirectory,
@@ -595,9 +652,6 @@ class ClimatologyMapMLD(ClimatologyMapOcean):  # {{{
             '{}/holtetalley_mld_climatology.nc'.format(
                 observationsDirectory)
 
-        self.mpasFieldName = 'timeMonthly_avg_dThreshMLD'
-        self.iselValues = None
-
         self.obsFieldName = 'mld_dt_mean'
 
         # Set appropriate MLD figure labels
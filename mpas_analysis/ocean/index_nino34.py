@@ -83,6 +83,13 @@ class IndexNino34(AnalysisTask):  # {{{
                           '{}.'.format(streamName, self.startDate,
                                        self.endDate))
 
+        self.varName = \
+            'timeMonthly_avg_avgValueWithinOceanRegion_avgSurfaceTemperature'
+        # only the NINO3.4 region is used
+        regionIndex = self.config.getint('indexNino34', 'regionIndicesToPlot')
+        self.add_input_files(self.inputFiles, variableList=[self.varName],
+                             iselValues={'nOceanRegions': regionIndex})
+
         mainRunName = self.config.get('runs', 'mainRunName')
 
         self.xmlFileNames = []
@@ -137,8 +144,7 @@ class IndexNino34(AnalysisTask):  # {{{
         regionIndex = config.getint('indexNino34', 'regionIndicesToPlot')
 
         # Load data:
-        varName = \
-            'timeMonthly_avg_avgValueWithinOceanRegion_avgSurfaceTemperature'
+        varName = self.varName
         varList = [varName]
         ds = open_multifile_dataset(fileNames=self.inputFiles,
                                     calendar=calendar,
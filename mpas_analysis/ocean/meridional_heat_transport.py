@@ -10,14 +10,13 @@ from ..shared.plot.plotting import plot_vertical_section,\
 
 from ..shared.io.utility import build_config_full_path, make_directories
 
-from ..shared.generalized_reader.generalized_reader \
-    import open_multifile_dataset
+from ..shared.generalized_reader.dataset_broker import datasetBroker
 
 from ..shared.timekeeping.utility import get_simulation_start_time
 
 from ..shared.climatology.climatology import \
     update_climatology_bounds_from_file_names, \
-    cache_climatologies
+    cache_climatologies, get_climatology_cache_file_names
 
 from ..shared.analysis_task import AnalysisTask
 from ..shared.html import write_image_xml
@@ -100,6 +99,25 @@ class MeridionalHeatTransport(AnalysisTask):  # {{{
                           '{}.'.format(streamName, self.startDate,
                                        self.endDate))
 
+        self.add_input_files(self.inputFiles)
+
+        ######################################################################
+        # Mark P Note: Currently only supports global MHT.
+        # Need to add variables merHeatTransLatRegion and
+        # merHeatTransLatZRegion
+        # These are not computed by default in ACME right now.
+        # Then we will need to add another section for regions with a loop
+        # over number of regions.
+        ######################################################################
+        self.variableList = ['timeMonthly_avg_meridionalHeatTransportLat',
+                             'timeMonthly_avg_meridionalHeatTransportLatZ']
+
+        # the data set is shared with other tasks that read the same files
+        self.datasetKey = datasetBroker.register(
+            self.inputFiles, self.calendar,
+            timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
+            variableList=self.variableList)
+
         changed, self.startYear, self.endYear, self.startDate, self.endDate = \
             update_climatology_bounds_from_file_names(self.inputFiles,
                                                       self.config)
@@ -113,6 +131,7 @@ class MeridionalHeatTransport(AnalysisTask):  # {{{
                           'one ')
 
         self.mhtFile = mhtFiles[0]
+        self.add_input_files([self.mhtFile])
 
         self.simulationStartTime = get_simulation_start_time(self.runStreams)
 
@@ -153,6 +172,21 @@ class MeridionalHeatTransport(AnalysisTask):  # {{{
 
         # }}}
 
+    def get_cache_files(self):  # {{{
+        """
+        Returns the annual climatology of MHT and the climatologies of spans
+        of years from which it is aggregated
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        outputDirectory = build_config_full_path(self.config, 'output',
+                                                 'mpasClimatologySubdirectory')
+        cachePrefix = '{}/meridionalHeatTransport'.format(outputDirectory)
+        return get_climatology_cache_file_names(self.config,
+                                                cachePrefix)  # }}}
+
     def run(self):  # {{{
         """
         Process MHT analysis member data if available.
@@ -166,6 +200,24 @@ class MeridionalHeatTransport(AnalysisTask):  # {{{
         """
         print "\nPlotting meridional heat transport (MHT)..."
 
+        # release the shared data set even if the analysis fails, so it is
+        # closed once the other tasks using it are done
+        try:
+            self._compute_and_plot()
+        finally:
+            datasetBroker.release(self.datasetKey)
+
+        # }}}
+
+    def _compute_and_plot(self):  # {{{
+        """
+        Computes the annual climatology of MHT and plots it
+
+        Authors
+        -------
+        Mark Petersen, Milena Veneziani, Xylar Asay-Davis
+        """
+
         config = self.config
 
         # Read in depth and MHT latitude points
@@ -190,17 +242,6 @@ class MeridionalHeatTransport(AnalysisTask):  # {{{
         refLayerThickness[1:nVertLevels] = (refBottomDepth[1:nVertLevels] -
                                             refBottomDepth[0:nVertLevels-1])
 
-        ######################################################################
-        # Mark P Note: Currently only supports global MHT.
-        # Need to add variables merHeatTransLatRegion and
-        # merHeatTransLatZRegion
-        # These are not computed by default in ACME right now.
-        # Then we will need to add another section for regions with a loop
-        # over number of regions.
-        ######################################################################
-        variableList = ['timeMonthly_avg_meridionalHeatTransportLat',
-                        'timeMonthly_avg_meridionalHeatTransportLatZ']
-
         print '\n  Compute and plot global meridional heat transport'
 
         outputDirectory = build_config_full_path(config, 'output',
@@ -214,15 +255,13 @@ class MeridionalHeatTransport(AnalysisTask):  # {{{
         make_directories(outputDirectory)
 
         print '   Load data...'
-        ds = open_multifile_dataset(
-            fileNames=self.inputFiles,
-            calendar=self.calendar,
-            config=config,
+        ds = datasetBroker.open_dataset(
+            self.datasetKey, config,
             simulationStartTime=self.simulationStartTime,
-            timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
-            variableList=variableList,
+            variableList=self.variableList,
             startDate=self.startDate,
-            endDate=self.endDate)
+            endDate=self.endDate,
+            chunking='climatology')
 
         # Compute annual climatology
         cachePrefix = '{}/meridionalHeatTransport'.format(outputDirectory)
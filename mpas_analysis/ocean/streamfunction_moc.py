@@ -11,8 +11,7 @@ from ..shared.plot.plotting import plot_vertical_section,\
 
 from ..shared.io.utility import build_config_full_path, make_directories
 
-from ..shared.generalized_reader.generalized_reader \
-    import open_multifile_dataset
+from ..shared.generalized_reader.dataset_broker import datasetBroker
 
 from ..shared.timekeeping.utility import get_simulation_start_time, \
     days_to_datetime
@@ -133,6 +132,26 @@ class StreamfunctionMOC(AnalysisTask):  # {{{
         self.startYearTseries = config.getint('timeSeries', 'startYear')
         self.endYearTseries = config.getint('timeSeries', 'endYear')
 
+        # the climatology is computed with ncclimo in a separate process
+        self.add_input_files(self.inputFilesClimo)
+        if self.mocAnalysisMemberEnabled:
+            self.add_input_files(self.inputFilesTseries)
+        else:
+            # the MOC time series is computed from the 3D velocity one year at
+            # a time
+            self.add_input_files(
+                self.inputFilesTseries,
+                variableList=['timeMonthly_avg_normalVelocity',
+                              'timeMonthly_avg_vertVelocityTop'],
+                timeSlicesInMemory=12)
+            # the data set is shared with other tasks that read the same
+            # files
+            self.datasetKeyTseries = datasetBroker.register(
+                self.inputFilesTseries, self.calendar,
+                timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
+                variableList=['timeMonthly_avg_normalVelocity',
+                              'timeMonthly_avg_vertVelocityTop'])
+
         self.sectionName = 'streamfunctionMOC'
 
         self.xmlFileNames = []
@@ -159,6 +178,31 @@ class StreamfunctionMOC(AnalysisTask):  # {{{
 
         # }}}
 
+    def estimate_resources(self):  # {{{
+        '''
+        Estimate the peak memory and number of cores needed to run this task.
+        If the MOC is computed in post-processing, ncclimo computes the
+        velocity climatologies with one process per month in background
+        parallel mode.
+
+        Returns
+        -------
+        memory : float
+            The estimated peak memory in bytes
+
+        cores : int
+            The number of cores used by the task
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        memory, cores = super(StreamfunctionMOC, self).estimate_resources()
+        if not self.mocAnalysisMemberEnabled and \
+                self.config.get('execute', 'ncclimoParallelMode') == 'bck':
+            cores = 12
+        return memory, cores  # }}}
+
     def run(self):  # {{{
         '''
         Process MOC analysis member data if available, or compute MOC at
@@ -196,9 +240,12 @@ class StreamfunctionMOC(AnalysisTask):  # {{{
             #                                      sectionName, dictClimo,
             #                                      dictTseries)
         else:
-            self._compute_velocity_climatologies()
-            self._compute_moc_climo_postprocess()
-            dsMOCTimeSeries = self._compute_moc_time_series_postprocess()
+            try:
+                self._compute_velocity_climatologies()
+                self._compute_moc_climo_postprocess()
+                dsMOCTimeSeries = self._compute_moc_time_series_postprocess()
+            finally:
+                datasetBroker.release(self.datasetKeyTseries)
 
         # **** Plot MOC ****
         # Define plotting variables
@@ -514,14 +561,12 @@ class StreamfunctionMOC(AnalysisTask):  # {{{
         if config.has_option(self.sectionName, 'maxChunkSize'):
             chunking = config.getExpression(self.sectionName, 'maxChunkSize')
         else:
-            chunking = None
+            # the MOC is computed for each time, so chunks hold whole records
+            chunking = 'timeSeries'
 
-        ds = open_multifile_dataset(
-            fileNames=self.inputFilesTseries,
-            calendar=self.calendar,
-            config=config,
+        ds = datasetBroker.open_dataset(
+            self.datasetKeyTseries, config,
             simulationStartTime=self.simulationStartTime,
-            timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
             variableList=variableList,
             startDate=self.startDateTseries,
             endDate=self.endDateTseries,
@@ -95,6 +95,15 @@ class TimeSeriesOHC(AnalysisTask):
                           '{}.'.format(self.streamName, self.startDate,
                                        self.endDate))
 
+        # the averages over each layer of each region are read for every
+        # month
+        layerPrefix = 'timeMonthly_avg_avgValueWithinOceanLayerRegion_'
+        self.variableList = [
+            '{}{}'.format(layerPrefix, name) for name in
+            ['avgLayerTemperature', 'sumLayerMaskValue', 'avgLayerArea',
+             'avgLayerThickness']]
+        self.add_input_files(self.inputFiles, variableList=self.variableList)
+
         mainRunName = config.get('runs', 'mainRunName')
         regions = config.getExpression('regions', 'regions')
         regionIndicesToPlot = config.getExpression('timeSeriesOHC',
@@ -113,6 +122,19 @@ class TimeSeriesOHC(AnalysisTask):
 
         return  # }}}
 
+    def get_cache_files(self):  # {{{
+        """
+        Returns the cached time series of ocean heat content, which is
+        extended if it already exists
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        outputDirectory = build_config_full_path(self.config, 'output',
+                                                 'timeseriesSubdirectory')
+        return ['{}/ohcTimeSeries.nc'.format(outputDirectory)]  # }}}
+
     def run(self):  # {{{
         """
         Performs analysis of ocean heat content (OHC) from time-series output.
@@ -182,16 +204,9 @@ class TimeSeriesOHC(AnalysisTask):
 
         # Load data
         print '  Load ocean data...'
-        avgTempVarName = \
-            'timeMonthly_avg_avgValueWithinOceanLayerRegion_avgLayerTemperature'
-        sumMaskVarName = \
-            'timeMonthly_avg_avgValueWithinOceanLayerRegion_sumLayerMaskValue'
-        avgAreaVarName = \
-            'timeMonthly_avg_avgValueWithinOceanLayerRegion_avgLayerArea'
-        avgThickVarName = \
-            'timeMonthly_avg_avgValueWithinOceanLayerRegion_avgLayerThickness'
-        variableList = [avgTempVarName, sumMaskVarName, avgAreaVarName,
-                        avgThickVarName]
+        variableList = self.variableList
+        (avgTempVarName, sumMaskVarName, avgAreaVarName, avgThickVarName) = \
+            variableList
         ds = open_multifile_dataset(fileNames=self.inputFiles,
                                     calendar=calendar,
                                     config=config,
@@ -94,6 +94,10 @@ class TimeSeriesSST(AnalysisTask):
                           '{}.'.format(streamName, self.startDate,
                                        self.endDate))
 
+        self.varName = \
+            'timeMonthly_avg_avgValueWithinOceanRegion_avgSurfaceTemperature'
+        self.add_input_files(self.inputFiles, variableList=[self.varName])
+
         mainRunName = config.get('runs', 'mainRunName')
         regions = config.getExpression('regions', 'regions')
         regionIndicesToPlot = config.getExpression('timeSeriesSST',
@@ -112,6 +116,19 @@ class TimeSeriesSST(AnalysisTask):
 
         return  # }}}
 
+    def get_cache_files(self):  # {{{
+        """
+        Returns the cached time series of sea surface temperature, which is
+        extended if it already exists
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        outputDirectory = build_config_full_path(self.config, 'output',
+                                                 'timeseriesSubdirectory')
+        return ['{}/sstTimeSeries.nc'.format(outputDirectory)]  # }}}
+
     def run(self):  # {{{
         """
         Performs analysis of the time-series output of sea-surface temperature
@@ -158,8 +175,7 @@ class TimeSeriesSST(AnalysisTask):
         regionNames = [regionNames[index] for index in regionIndicesToPlot]
 
         # Load data:
-        varName = \
-            'timeMonthly_avg_avgValueWithinOceanRegion_avgSurfaceTemperature'
+        varName = self.varName
         varList = [varName]
         ds = open_multifile_dataset(fileNames=self.inputFiles,
                                     calendar=calendar,
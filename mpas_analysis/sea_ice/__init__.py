@@ -1,2 +1,2 @@
-from climatology_map import ClimatologyMapSeaIceConc, ClimatologyMapSeaIceThick
-from time_series import TimeSeriesSeaIce
\ No newline at end of file
+# Analysis tasks are imported only when needed, through
+# mpas_analysis.task_registry
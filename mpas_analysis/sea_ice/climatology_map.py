@@ -11,9 +11,9 @@ from ..shared.constants import constants
 from ..shared.climatology import get_lat_lon_comparison_descriptor, \
     get_remapper, get_mpas_climatology_file_names, \
     get_observation_climatology_file_names, \
-    cache_climatologies, \
+    cache_climatologies, get_climatology_cache_file_names, \
     update_climatology_bounds_from_file_names, \
-    remap_and_write_climatology
+    remap_and_write_climatology, MpasMappingFileStage
 from ..shared.grid import MpasMeshDescriptor, LatLonGridDescriptor
 
 from ..shared.plot.plotting import plot_polar_comparison, \
@@ -23,8 +23,7 @@ from ..shared.io.utility import build_config_full_path
 from ..shared.io import write_netcdf
 from ..shared.html import write_image_xml
 
-from ..shared.generalized_reader.generalized_reader \
-    import open_multifile_dataset
+from ..shared.generalized_reader.dataset_broker import datasetBroker
 
 from .sea_ice_analysis_task import SeaIceAnalysisTask
 
@@ -75,6 +74,22 @@ class ClimatologyMapSeaIce(SeaIceAnalysisTask):
             update_climatology_bounds_from_file_names(self.inputFiles,
                                                       self.config)
 
+        # climatologies are cached one year at a time
+        self.add_input_files(self.inputFiles,
+                             variableList=[self.mpasFieldName],
+                             timeSlicesInMemory=12)
+
+        # the data set is shared with other tasks that read the same files
+        self.datasetKey = datasetBroker.register(
+            self.inputFiles, self.calendar,
+            timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
+            variableList=[self.mpasFieldName])
+
+        # the mapping file is shared with other tasks, so it is created in a
+        # separate stage
+        self.add_stage(MpasMappingFileStage(self.config,
+                                            self.restartFileName))
+
         mainRunName = self.config.get('runs', 'mainRunName')
 
         self.xmlFileNames = []
@@ -92,6 +107,32 @@ class ClimatologyMapSeaIce(SeaIceAnalysisTask):
 
         return  # }}}
 
+    def get_cache_files(self):  # {{{
+        """
+        Returns the climatology of the model results for each season, before
+        and after remapping, and the climatologies of spans of years from
+        which it is aggregated
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        fieldName = '{}{}'.format(self.mpasFieldName, self.hemisphere)
+        comparisonDescriptor = get_lat_lon_comparison_descriptor(self.config)
+        cacheFiles = []
+        for season in self.seasons:
+            (climatologyFileName, climatologyPrefix, remappedFileName) = \
+                get_mpas_climatology_file_names(
+                    config=self.config,
+                    fieldName=fieldName,
+                    monthNames=season,
+                    mpasMeshName=self.config.get('input', 'mpasMeshName'),
+                    comparisonGridName=comparisonDescriptor.meshName)
+            cacheFiles.extend(get_climatology_cache_file_names(
+                self.config, climatologyPrefix))
+            cacheFiles.append(remappedFileName)
+        return cacheFiles  # }}}
+
     def run(self):  # {{{
         """
         Performs analysis of sea-ice properties by comparing with
@@ -111,42 +152,40 @@ class ClimatologyMapSeaIce(SeaIceAnalysisTask):
                   os.path.basename(self.inputFiles[-1]))
         # Load data
 
-        print '  Load sea-ice data...'
-        varList = [self.mpasFieldName]
-
-        self.ds = open_multifile_dataset(
-            fileNames=self.inputFiles,
-            calendar=self.calendar,
-            config=self.config,
-            simulationStartTime=self.simulationStartTime,
-            timeVariableName=['xtime_startMonthly', 'xtime_endMonthly'],
-            variableList=varList,
-            startDate=self.startDate,
-            endDate=self.endDate)
-
-        # Compute climatologies (first motnhly and then seasonally)
-        print '  Compute seasonal climatologies...'
-
-        mpasDescriptor = MpasMeshDescriptor(
-            self.restartFileName,
-            meshName=self.config.get('input', 'mpasMeshName'))
-
-        comparisonDescriptor = get_lat_lon_comparison_descriptor(self.config)
-
-        parallel = self.config.getint('execute', 'parallelTaskCount') > 1
-        if parallel:
-            # avoid writing the same mapping file from multiple processes
-            mappingFilePrefix = 'map_{}'.format(self.taskName)
-        else:
-            mappingFilePrefix = 'map'
-
-        self.mpasRemapper = get_remapper(
-            config=self.config, sourceDescriptor=mpasDescriptor,
-            comparisonDescriptor=comparisonDescriptor,
-            mappingFilePrefix=mappingFilePrefix,
-            method=self.config.get('climatology', 'mpasInterpolationMethod'))
-
-        self._compute_and_plot()  # }}}
+        try:
+            print '  Load sea-ice data...'
+            varList = [self.mpasFieldName]
+
+            self.ds = datasetBroker.open_dataset(
+                self.datasetKey, self.config,
+                simulationStartTime=self.simulationStartTime,
+                variableList=varList,
+                startDate=self.startDate,
+                endDate=self.endDate,
+                chunking='climatology')
+
+            # Compute climatologies (first motnhly and then seasonally)
+            print '  Compute seasonal climatologies...'
+
+            mpasDescriptor = MpasMeshDescriptor(
+                self.restartFileName,
+                meshName=self.config.get('input', 'mpasMeshName'))
+
+            comparisonDescriptor = \
+                get_lat_lon_comparison_descriptor(self.config)
+
+            # the mapping file has typically already been created by the
+            # MpasMappingFileStage
+            self.mpasRemapper = get_remapper(
+                config=self.config, sourceDescriptor=mpasDescriptor,
+                comparisonDescriptor=comparisonDescriptor,
+                mappingFilePrefix='map',
+                method=self.config.get('climatology',
+                                       'mpasInterpolationMethod'))
+
+            self._compute_and_plot()
+        finally:
+            datasetBroker.release(self.datasetKey)  # }}}
 
     def _compute_and_plot(self):  # {{{
         '''
@@ -1,6 +1,6 @@
 from ..shared.analysis_task import AnalysisTask
 
-from ..shared.io import StreamsFile
+from ..shared.io import runContext
 from ..shared.io.utility import build_config_full_path
 
 from ..shared.timekeeping.utility import get_simulation_start_time
@@ -42,8 +42,8 @@ class SeaIceAnalysisTask(AnalysisTask):  # {{{
                                                   'runSubdirectory')
             oceanStreamsFileName = build_config_full_path(
                 self.config, 'input', 'oceanStreamsFileName')
-            oceanStreams = StreamsFile(oceanStreamsFileName,
-                                       streamsdir=runDirectory)
+            oceanStreams = runContext.get_streams_file(
+                oceanStreamsFileName, streamsdir=runDirectory)
             self.simulationStartTime = get_simulation_start_time(oceanStreams)
 
         try:
@@ -55,8 +55,8 @@ class SeaIceAnalysisTask(AnalysisTask):  # {{{
                                                       'runSubdirectory')
                 oceanStreamsFileName = build_config_full_path(
                     self.config, 'input', 'oceanStreamsFileName')
-                oceanStreams = StreamsFile(oceanStreamsFileName,
-                                           streamsdir=runDirectory)
+                oceanStreams = runContext.get_streams_file(
+                    oceanStreamsFileName, streamsdir=runDirectory)
                 self.restartFileName = oceanStreams.readpath('restart')[0]
             except ValueError:
                 raise IOError('No MPAS-O or MPAS-Seaice restart file found: '
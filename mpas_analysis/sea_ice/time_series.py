@@ -1,4 +1,5 @@
 import xarray as xr
+import numpy
 import os
 
 from .sea_ice_analysis_task import SeaIceAnalysisTask
@@ -12,6 +13,8 @@ from ..shared.io.utility import build_config_full_path, check_path_exists, \
 from ..shared.timekeeping.utility import date_to_days, days_to_datetime, \
     datetime_to_days
 from ..shared.timekeeping.MpasRelativeDelta import MpasRelativeDelta
+from ..shared.timekeeping.vectorized_calendar import days_to_dates, \
+    dates_to_days, days_in_month
 
 from ..shared.generalized_reader.generalized_reader \
     import open_multifile_dataset
@@ -97,6 +100,12 @@ class TimeSeriesSeaIce(SeaIceAnalysisTask):
                           '{}.'.format(streamName, self.startDate,
                                        self.endDate))
 
+        # the time series is cached 10 years at a time
+        self.add_input_files(self.inputFiles,
+                             variableList=['timeMonthly_avg_iceAreaCell',
+                                           'timeMonthly_avg_iceVolumeCell'],
+                             timeSlicesInMemory=120)
+
         # these are redundant for now.  Later cleanup is needed where these
         # file names are reused in run()
         self.xmlFileNames = []
@@ -137,6 +146,21 @@ class TimeSeriesSeaIce(SeaIceAnalysisTask):
             self.xmlFileNames.extend(polarXMLFileNames)
         return  # }}}
 
+    def get_cache_files(self):  # {{{
+        """
+        Returns the cached time series of sea-ice area and volume in each
+        hemisphere, which are extended if they already exist
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        outputDirectory = build_config_full_path(self.config, 'output',
+                                                 'timeseriesSubdirectory')
+        return ['{}/seaIceAreaVolumeTimeSeries_{}.nc'.format(outputDirectory,
+                                                             hemisphere)
+                for hemisphere in ['NH', 'SH']]  # }}}
+
     def run(self):  # {{{
         """
         Performs analysis of time series of sea-ice properties.
@@ -217,7 +241,8 @@ class TimeSeriesSeaIce(SeaIceAnalysisTask):
             variableList=['timeMonthly_avg_iceAreaCell',
                           'timeMonthly_avg_iceVolumeCell'],
             startDate=self.startDate,
-            endDate=self.endDate)
+            endDate=self.endDate,
+            chunking='timeSeries')
 
         yearStart = days_to_datetime(ds.Time.min(), calendar=calendar).year
         yearEnd = days_to_datetime(ds.Time.max(), calendar=calendar).year
@@ -545,16 +570,14 @@ class TimeSeriesSeaIce(SeaIceAnalysisTask):
 
         dsShift = dsToReplicate.copy()
 
-        times = days_to_datetime(dsShift.Time, calendar=calendar)
-        dsShift.coords['Time'] = ('Time',
-                                  datetime_to_days(times + startIndex*period,
-                                                   calendar=calendar))
+        times = dsShift.Time.values
+        dsShift.coords['Time'] = ('Time', self._shift_times(
+            times, startIndex*period, calendar))
         # replicate cycle:
         for cycleIndex in range(startIndex, endIndex):
             dsNew = dsToReplicate.copy()
-            dsNew.coords['Time'] = \
-                ('Time', datetime_to_days(times + (cycleIndex+1)*period,
-                                          calendar=calendar))
+            dsNew.coords['Time'] = ('Time', self._shift_times(
+                times, (cycleIndex+1)*period, calendar))
             dsShift = xr.concat([dsShift, dsNew], dim='Time')
 
         # clip dsShift to the range of ds
@@ -566,6 +589,50 @@ class TimeSeriesSeaIce(SeaIceAnalysisTask):
 
         return dsShift  # }}}
 
+    def _shift_times(self, times, shift, calendar):  # {{{
+        """
+        Shift an array of times (in days since 0001-01-01) by an interval,
+        keeping the day of the month (or using the last day of a shorter
+        month) as adding the interval to each date would
+
+        Parameters
+        ----------
+        times : numpy.ndarray
+            The times to shift
+
+        shift : ``MpasRelativeDelta`` object
+            The interval to shift by
+
+        calendar : {'gregorian', 'gregorian_noleap'}
+            The name of one of the calendars supported by MPAS cores
+
+        Returns:
+        --------
+        shiftedTimes : numpy.ndarray
+            The shifted times
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if shift.days != 0 or shift.hours != 0 or shift.minutes != 0 or \
+                shift.seconds != 0:
+            # intervals that aren't whole months are added to each date
+            dates = days_to_datetime(times, calendar=calendar)
+            return datetime_to_days(dates + shift, calendar=calendar)
+
+        (years, months, days, seconds) = days_to_dates(times,
+                                                       calendar=calendar)
+        monthIndices = 12*years + months - 1 + 12*shift.years + shift.months
+        years = monthIndices//12
+        months = monthIndices % 12 + 1
+        # like MpasRelativeDelta, use the number of days in the month on the
+        # interval's calendar
+        days = numpy.minimum(days, days_in_month(years, months,
+                                                 calendar=shift.calendar))
+        return dates_to_days(years, months, days, seconds,
+                             calendar=calendar)  # }}}
+
     def _compute_area_vol_part(self, timeIndices, firstCall):  # {{{
         '''
         Compute part of the time series of sea ice volume and area, given time
@@ -0,0 +1,134 @@
+'''
+Defines the base class for analysis stages, steps that produce intermediate
+output files (e.g. mapping files) that may be shared between several analysis
+tasks.
+
+Authors
+-------
+Xylar Asay-Davis
+
+'''
+
+import os
+
+from .scheduler.resources import get_base_memory
+
+
+class AnalysisStage(object):  # {{{
+    '''
+    The base class for analysis stages.
+
+    A stage is identified by its ``stageName``.  Two stages with the same name
+    are assumed to do exactly the same work, so that the scheduler only needs
+    to run one of them, after which all analysis tasks (and other stages) that
+    depend on that stage can proceed.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+
+    '''
+    def __init__(self, config, stageName, inputs=None, outputs=None):  # {{{
+        '''
+        Construct the analysis stage.
+
+        Parameters
+        ----------
+        config :  instance of MpasAnalysisConfigParser
+            Contains configuration options
+
+        stageName :  str
+            A unique name for the stage.  Stages that perform identical work
+            (e.g. creating the same mapping file) must have the same name.
+
+        inputs : list of str, optional
+            The files this stage reads.  If another stage lists one of these
+            files among its ``outputs``, this stage depends on that stage.
+
+        outputs : list of str, optional
+            The files this stage produces.  The stage is considered complete
+            if all of its outputs already exist.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        self.config = config
+        self.stageName = stageName
+        if inputs is None:
+            inputs = []
+        if outputs is None:
+            outputs = []
+        self.inputs = inputs
+        self.outputs = outputs  # }}}
+
+    def is_complete(self):  # {{{
+        '''
+        Determines whether this stage has already been run (i.e. whether all
+        of its outputs exist).  Stages with no outputs are never complete.
+
+        Returns
+        -------
+        complete : bool
+            Whether the stage can be skipped
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        if len(self.outputs) == 0:
+            return False
+        for fileName in self.outputs:
+            if not os.path.exists(fileName):
+                return False
+        return True  # }}}
+
+    def estimate_resources(self):  # {{{
+        '''
+        Estimate the peak memory and number of cores needed to run this
+        stage.  By default, only the base memory for any task or stage and a
+        single core are needed.  Individual stages should override this
+        method if they need more resources.
+
+        Returns
+        -------
+        memory : float
+            The estimated peak memory in bytes
+
+        cores : int
+            The number of cores used by the stage
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        return get_base_memory(self.config), 1  # }}}
+
+    def estimate_bytes_read(self):  # {{{
+        '''
+        Estimate the number of bytes of input data this stage will read.  By
+        default, stages are assumed to read a negligible amount of data.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        return 0.  # }}}
+
+    def run(self):  # {{{
+        '''
+        Runs the analysis stage.
+
+        Individual stages (children classes of this base class) should
+        override this method to produce the stage's ``outputs``.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        return  # }}}
+
+# }}}
+
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -7,10 +7,13 @@ Xylar Asay-Davis
 
 '''
 
+import os
 import warnings
 
-from .io import NameList, StreamsFile
+from .io import runContext
 from .io.utility import build_config_full_path, make_directories
+from .scheduler.resources import get_base_memory, estimate_input_memory, \
+    estimate_input_bytes, bytesPerGB
 
 
 class AnalysisTask(object):  # {{{
@@ -56,7 +59,9 @@ class AnalysisTask(object):  # {{{
         self.config = config
         self.taskName = taskName
         self.componentName = componentName
-        self.tags = tags  # }}}
+        self.tags = tags
+        self.stages = []
+        self.inputFileGroups = []  # }}}
 
     def setup_and_check(self):  # {{{
         '''
@@ -105,15 +110,21 @@ class AnalysisTask(object):  # {{{
         namelistFileName = build_config_full_path(
             self.config,  'input',
             '{}NamelistFileName'.format(self.componentName))
-        self.namelist = NameList(namelistFileName)
+        # the namelist and streams files are shared with other tasks
+        self.namelist = runContext.get_namelist(namelistFileName)
 
         streamsFileName = build_config_full_path(
             self.config, 'input',
             '{}StreamsFileName'.format(self.componentName))
-        self.runStreams = StreamsFile(streamsFileName,
-                                      streamsdir=self.runDirectory)
-        self.historyStreams = StreamsFile(streamsFileName,
-                                          streamsdir=self.historyDirectory)
+        self.runStreams = runContext.get_streams_file(
+            streamsFileName, streamsdir=self.runDirectory)
+        # the times in each history file are indexed so files can be
+        # selected exactly by date
+        indexDirectory = build_config_full_path(self.config, 'output',
+                                                'streamIndexSubdirectory')
+        self.historyStreams = runContext.get_streams_file(
+            streamsFileName, streamsdir=self.historyDirectory,
+            indexDirectory=indexDirectory)
 
         self.calendar = self.namelist.get('config_calendar_type')
 
@@ -140,6 +151,180 @@ class AnalysisTask(object):  # {{{
         '''
         return  # }}}
 
+    def add_stage(self, stage):  # {{{
+        '''
+        Add a stage that must be complete before this task can run.  Stages
+        with the same name that are added by different tasks are only run
+        once by the scheduler.
+
+        Parameters
+        ----------
+        stage : ``AnalysisStage`` object
+            The stage this task depends on
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        self.stages.append(stage)  # }}}
+
+    def add_input_files(self, fileNames, variableList=None, iselValues=None,
+                        timeSlicesInMemory=None):  # {{{
+        '''
+        Add a group of input files and the variables read from them, used to
+        estimate the resources needed by this task and to determine if its
+        inputs have changed since it last ran.
+
+        Parameters
+        ----------
+        fileNames : list of str
+            The input files
+
+        variableList : list of str, optional
+            The variables read from each input file.  If not supplied, the
+            files are not included in the estimate of the memory used by the
+            task.
+
+        iselValues : dict, optional
+            Dimensions (e.g. ``nVertLevels``) that are indexed so that only
+            a single entry is read
+
+        timeSlicesInMemory : int, optional
+            The number of time slices that are held in memory at the same
+            time (e.g. 12 if the data is processed one year at a time).  By
+            default, all time slices are assumed to be in memory.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        self.inputFileGroups.append({'fileNames': fileNames,
+                                     'variableList': variableList,
+                                     'iselValues': iselValues,
+                                     'timeSlicesInMemory': timeSlicesInMemory})
+        # }}}
+
+    def estimate_resources(self):  # {{{
+        '''
+        Estimate the peak memory and number of cores needed to run this task,
+        used to determine which tasks can run at the same time.
+
+        By default, the memory is estimated from the size of the variables in
+        the input files added with ``add_input_files``, multiplied by
+        ``memoryFactor`` from the ``execute`` section of the config file to
+        account for intermediate copies of the data.  The estimate can be
+        replaced with the ``estimatedMemory`` option (in GB) in this task's
+        section of the config file.  Individual tasks that use more than one
+        core should override this method.
+
+        Returns
+        -------
+        memory : float
+            The estimated peak memory in bytes
+
+        cores : int
+            The number of cores used by the task
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        config = self.config
+        cores = 1
+        if config.has_option(self.taskName, 'estimatedMemory'):
+            memory = bytesPerGB*config.getfloat(self.taskName,
+                                                'estimatedMemory')
+            return memory, cores
+
+        memoryFactor = config.getWithDefault('execute', 'memoryFactor',
+                                             default=3.)
+        memory = get_base_memory(config) + \
+            memoryFactor*estimate_input_memory(self.inputFileGroups)
+
+        return memory, cores  # }}}
+
+    def estimate_bytes_read(self):  # {{{
+        '''
+        Estimate the number of bytes of input data this task will read, from
+        the input files added with ``add_input_files``
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        return estimate_input_bytes(self.inputFileGroups)  # }}}
+
+    def get_cache_files(self):  # {{{
+        '''
+        Returns the intermediate files (e.g. climatologies or time series)
+        this task caches so they can be reused if the task is run again.  An
+        existing cache will be reused (or extended), while a missing one must
+        be computed.  By default, there are no cache files; tasks with caches
+        should override this method.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        return []  # }}}
+
+    def get_input_files(self):  # {{{
+        '''
+        Returns the input files of this task, used to determine if the task
+        needs to be rerun.  By default, these are the files added with
+        ``add_input_files``.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        fileNames = []
+        for group in self.inputFileGroups:
+            for fileName in group['fileNames']:
+                if fileName not in fileNames:
+                    fileNames.append(fileName)
+        return fileNames  # }}}
+
+    def get_output_files(self):  # {{{
+        '''
+        Returns the output files of this task, used to determine if the task
+        needs to be rerun.  By default, these are the XML files in
+        ``xmlFileNames`` and the corresponding PNG images.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        fileNames = []
+        if hasattr(self, 'xmlFileNames'):
+            for xmlFileName in self.xmlFileNames:
+                fileNames.append(xmlFileName)
+                fileNames.append('{}.png'.format(
+                    os.path.splitext(xmlFileName)[0]))
+        return fileNames  # }}}
+
+    def get_config_sections(self):  # {{{
+        '''
+        Returns the names of the config sections whose options affect the
+        results of this task, used to determine if the task needs to be
+        rerun.  By default, these are the ``runs`` section, the sections for
+        the task, its tags (e.g. ``climatology``) and its component's
+        observations and reference runs, and the ``regions`` and ``plot``
+        sections.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        '''
+        sections = ['runs', self.taskName]
+        for tag in ['climatology', 'timeSeries', 'index']:
+            if tag in self.tags:
+                sections.append(tag)
+        for suffix in ['Observations', 'Reference', 'PreprocessedReference']:
+            sections.append('{}{}'.format(self.componentName, suffix))
+        sections.extend(['regions', 'plot'])
+        return sections  # }}}
+
     def check_generate(self):
         # {{{
         '''
@@ -175,30 +360,8 @@ class AnalysisTask(object):  # {{{
             raise ValueError('Analysis tasks\'s member self.tags '
                              'must be NOne or a list of strings.')
 
-        config = self.config
-        generateList = config.getExpression('output', 'generate')
-        generate = False
-        for element in generateList:
-            if '_' in element:
-                (prefix, suffix) = element.split('_', 1)
-            else:
-                prefix = element
-                suffix = None
-
-            allSuffixes = [self.componentName]
-            if self.tags is not None:
-                allSuffixes = allSuffixes + self.tags
-            noSuffixes = [self.taskName] + allSuffixes
-            if prefix == 'all':
-                if (suffix in allSuffixes) or (suffix is None):
-                    generate = True
-            elif prefix == 'no':
-                if suffix in noSuffixes:
-                    generate = False
-            elif element == self.taskName:
-                generate = True
-
-        return generate  # }}}
+        return check_generate(self.config, self.taskName, self.componentName,
+                              self.tags)  # }}}
 
     def check_analysis_enabled(self, analysisOptionName, default=False,
                                raiseException=True):
@@ -286,4 +449,61 @@ class AnalysisTask(object):  # {{{
 # }}}
 
 
+def check_generate(config, taskName, componentName, tags):  # {{{
+    '''
+    Determines if an analysis task should be generated, based on the
+    `generate` config option and the task's `taskName`, `componentName` and
+    `tags`.  This can be called before the task (or even its module) has been
+    created.
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    taskName : str
+        The name of the task
+
+    componentName : {'ocean', 'seaIce'}
+        The name of the component (same as the folder where the task
+        resides)
+
+    tags : list of str
+        Tags used to describe the task
+
+    Returns
+    -------
+    generate : bool
+        Whether or not this task should be run.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    '''
+
+    generateList = config.getExpression('output', 'generate')
+    generate = False
+    for element in generateList:
+        if '_' in element:
+            (prefix, suffix) = element.split('_', 1)
+        else:
+            prefix = element
+            suffix = None
+
+        allSuffixes = [componentName]
+        if tags is not None:
+            allSuffixes = allSuffixes + tags
+        noSuffixes = [taskName] + allSuffixes
+        if prefix == 'all':
+            if (suffix in allSuffixes) or (suffix is None):
+                generate = True
+        elif prefix == 'no':
+            if suffix in noSuffixes:
+                generate = False
+        elif element == taskName:
+            generate = True
+
+    return generate  # }}}
+
+
 # vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -1,7 +1,9 @@
 from .climatology import get_lat_lon_comparison_descriptor, get_remapper, \
-    get_mpas_climatology_file_names, get_observation_climatology_file_names, \
+    get_mapping_file_name, get_mpas_climatology_file_names, \
+    get_observation_climatology_file_names, \
     compute_monthly_climatology, compute_climatology, cache_climatologies, \
+    get_climatology_cache_file_names, \
     update_climatology_bounds_from_file_names, \
     add_years_months_days_in_month, remap_and_write_climatology, \
     compute_climatologies_with_ncclimo
-
+from .mapping_file_stage import MpasMappingFileStage
@@ -15,7 +15,7 @@ import subprocess
 
 from ..constants import constants
 
-from ..timekeeping.utility import days_to_datetime
+from ..timekeeping.time_table import build_time_table
 
 from ..io.utility import build_config_full_path, make_directories, \
     fingerprint_generator
@@ -23,6 +23,12 @@ from ..io import write_netcdf
 
 from ..interpolation import Remapper
 from ..grid import LatLonGridDescriptor, ProjectionGridDescriptor
+from ..performance import record_phase
+
+# remappers that have already been created in this process, indexed by
+# mapping file name, so mapping matrices stay in memory when the same mapping
+# is used again (e.g. by another task or by the next update in watch mode)
+_remapperCache = {}
 
 
 def get_lat_lon_comparison_descriptor(config):  # {{{
@@ -72,7 +78,9 @@ def get_remapper(config, sourceDescriptor, comparisonDescriptor,
     or data sets to corresponding data sets on the comparison grid.
 
     If necessary, creates the mapping file containing weights and indices
-    needed to perform remapping.
+    needed to perform remapping.  A remapper that was already created in this
+    process for the same mapping file is reused, so its weights don't need to
+    be read again.
 
     Parameters
     ----------
@@ -106,41 +114,83 @@ def get_remapper(config, sourceDescriptor, comparisonDescriptor,
 
     if not _matches_comparison(sourceDescriptor, comparisonDescriptor):
         # we need to remap because the grids don't match
+        mappingFileName = get_mapping_file_name(
+            config, sourceDescriptor.meshName, comparisonDescriptor.meshName,
+            mappingFilePrefix, method)
+
+        make_directories(os.path.dirname(mappingFileName))
 
-        mappingBaseName = '{}_{}_to_{}_{}.nc'.format(
-                mappingFilePrefix,
-                sourceDescriptor.meshName,
-                comparisonDescriptor.meshName,
-                method)
-
-        if config.has_option('input', 'mappingDirectory'):
-            # a mapping directory was supplied, so we'll see if there's
-            # a mapping file there that we can use
-            mappingSubdirectory = config.get('input', 'mappingDirectory')
-            mappingFileName = '{}/{}'.format(mappingSubdirectory,
-                                             mappingBaseName)
-            if not os.path.exists(mappingFileName):
-                # nope, looks like we still need to make a mapping file
-                mappingFileName = None
-
-        if mappingFileName is None:
-            # we don't have a mapping file yet, so get ready to create one
-            # in the output subfolder if needed
-            mappingSubdirectory = \
-                build_config_full_path(config, 'output',
-                                       'mappingSubdirectory')
-            make_directories(mappingSubdirectory)
-            mappingFileName = '{}/{}'.format(mappingSubdirectory,
-                                             mappingBaseName)
+        if mappingFileName in _remapperCache and \
+                os.path.exists(mappingFileName):
+            return _remapperCache[mappingFileName]
 
     remapper = Remapper(sourceDescriptor, comparisonDescriptor,
                         mappingFileName)
 
     remapper.build_mapping_file(method=method)
 
+    if mappingFileName is not None:
+        _remapperCache[mappingFileName] = remapper
+
     return remapper  # }}}
 
 
+def get_mapping_file_name(config, sourceMeshName, comparisonMeshName,
+                          mappingFilePrefix, method):  # {{{
+    """
+    Given config options, the names of the source and comparison grids,
+    returns the full path of the mapping file between them.  If a mapping file
+    with the appropriate name is found in the ``mappingDirectory`` in the
+    ``input`` section of the config file, that file is used.  Otherwise, the
+    mapping file is (or will be) in the ``mappingSubdirectory`` of the output.
+
+    Parameters
+    ----------
+    config :  instance of ``MpasAnalysisConfigParser``
+        Contains configuration options
+
+    sourceMeshName, comparisonMeshName : str
+        The names of the source mesh and comparison grid
+
+    mappingFilePrefix : str
+        A prefix to be prepended to the mapping file name
+
+    method : {'bilinear', 'neareststod', 'conserve'}
+        The method of interpolation used.
+
+    Returns
+    -------
+    mappingFileName : str
+        The full path to the mapping file (which may not exist yet)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    mappingBaseName = '{}_{}_to_{}_{}.nc'.format(mappingFilePrefix,
+                                                 sourceMeshName,
+                                                 comparisonMeshName,
+                                                 method)
+
+    if config.has_option('input', 'mappingDirectory'):
+        # a mapping directory was supplied, so we'll see if there's
+        # a mapping file there that we can use
+        mappingSubdirectory = config.get('input', 'mappingDirectory')
+        mappingFileName = '{}/{}'.format(mappingSubdirectory,
+                                         mappingBaseName)
+        if os.path.exists(mappingFileName):
+            return mappingFileName
+
+    # we don't have a mapping file yet, so it will be created in the output
+    # subfolder if needed
+    mappingSubdirectory = build_config_full_path(config, 'output',
+                                                 'mappingSubdirectory')
+    mappingFileName = '{}/{}'.format(mappingSubdirectory, mappingBaseName)
+
+    return mappingFileName  # }}}
+
+
 def get_mpas_climatology_file_names(config, fieldName, monthNames,
                                     mpasMeshName,
                                     comparisonGridName=None):  # {{{
@@ -223,6 +273,7 @@ def get_mpas_climatology_file_names(config, fieldName, monthNames,
     # }}}
 
 
+@record_phase('climatology')
 def compute_climatologies_with_ncclimo(config, inDirectory, outDirectory,
                                        startYear, endYear,
                                        variableList, modelName,
@@ -367,6 +418,7 @@ def get_observation_climatology_file_names(config, fieldName, monthNames,
     return (climatologyFileName, remappedFileName)  # }}}
 
 
+@record_phase('climatology')
 def compute_monthly_climatology(ds, calendar=None, maskVaries=True):  # {{{
     """
     Compute monthly climatologies from a data set.  The mean is weighted but
@@ -416,6 +468,7 @@ def compute_monthly_climatology(ds, calendar=None, maskVaries=True):  # {{{
     return monthlyClimatology  # }}}
 
 
+@record_phase('climatology')
 def compute_climatology(ds, monthValues, calendar=None,
                         maskVaries=True):  # {{{
     """
@@ -472,6 +525,7 @@ def compute_climatology(ds, monthValues, calendar=None,
     return climatology  # }}}
 
 
+@record_phase('climatology')
 def cache_climatologies(ds, monthValues, config, cachePrefix, calendar,
                         printProgress=False):  # {{{
     '''
@@ -535,13 +589,10 @@ def cache_climatologies(ds, monthValues, config, cachePrefix, calendar,
                                                          cachePrefix,
                                                          monthValues)
 
-    ds = ds.copy()
-    ds.coords['cacheIndices'] = ('Time', cacheIndices)
-
     # compute and store each cache file with interval yearsPerCacheFile
-    _cache_individual_climatologies(ds, cacheInfo, printProgress,
-                                    yearsPerCacheFile, monthValues,
-                                    calendar)
+    _cache_individual_climatologies(ds, cacheInfo, cacheIndices,
+                                    printProgress, yearsPerCacheFile,
+                                    monthValues, calendar)
 
     # compute the aggregate climatology
     climatology = _cache_aggregated_climatology(startYearClimo, endYearClimo,
@@ -627,7 +678,10 @@ def add_years_months_days_in_month(ds, calendar=None):  # {{{
     The number of days in each month of ``ds`` is computed either using the
     ``startTime`` and ``endTime`` if available or assuming ``gregorian_noleap``
     calendar and ignoring leap years.  ``year`` and ``month`` are computed
-    accounting correctly for the the calendar.
+    accounting correctly for the the calendar.  Data sets opened with
+    ``open_multifile_dataset`` already have these coordinates (or, without
+    ``startTime`` and ``endTime``, all but ``daysInMonth``) from their time
+    table, in which case ``ds`` is returned or only ``daysInMonth`` is added.
 
     Parameters
     ----------
@@ -660,13 +714,13 @@ def add_years_months_days_in_month(ds, calendar=None):  # {{{
         if calendar is None:
             raise ValueError('calendar must be provided if month and year '
                              'coordinate is not in ds.')
-        datetimes = days_to_datetime(ds.Time, calendar=calendar)
+        timeTable = build_time_table(ds.Time.values, calendar=calendar)
 
     if 'year' not in ds.coords:
-        ds.coords['year'] = ('Time', [date.year for date in datetimes])
+        ds.coords['year'] = ('Time', timeTable['year'])
 
     if 'month' not in ds.coords:
-        ds.coords['month'] = ('Time', [date.month for date in datetimes])
+        ds.coords['month'] = ('Time', timeTable['month'])
 
     if 'daysInMonth' not in ds.coords:
         if 'startTime' in ds.coords and 'endTime' in ds.coords:
@@ -679,13 +733,13 @@ def add_years_months_days_in_month(ds, calendar=None):  # {{{
                       'will be computed with\n' \
                       'month durations ignoring leap years.'
 
-            daysInMonth = numpy.array([constants.daysInMonth[month-1] for
-                                       month in ds.month.values], float)
-            ds.coords['daysInMonth'] = ('Time', daysInMonth)
+            daysInMonth = constants.daysInMonth[ds.month.values - 1]
+            ds.coords['daysInMonth'] = ('Time', daysInMonth.astype(float))
 
     return ds  # }}}
 
 
+@record_phase('remap')
 def remap_and_write_climatology(config, climatologyDataSet,
                                 climatologyFileName, remappedFileName,
                                 remapper):  # {{{
@@ -836,6 +890,48 @@ def _matches_comparison(obsDescriptor, comparisonDescriptor):  # {{{
     return match  # }}}
 
 
+def get_climatology_cache_file_names(config, cachePrefix):  # {{{
+    """
+    Returns the names of the files ``cache_climatologies`` writes for a given
+    prefix: a climatology for each span of ``yearsPerCacheFile`` years and
+    the climatology aggregated over all years.
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    cachePrefix :  str
+        The file prefix (including path) to which the year (or years) are
+        appended as cache files are stored
+
+    Returns
+    -------
+    cacheFileNames : list of str
+        The cache files, with the aggregated climatology last
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    startYearClimo = config.getint('climatology', 'startYear')
+    endYearClimo = config.getint('climatology', 'endYear')
+    yearsPerCacheFile = config.getint('climatology', 'yearsPerCacheFile')
+
+    cacheFileNames = []
+    for firstYear in range(startYearClimo, endYearClimo+1, yearsPerCacheFile):
+        yearString, fileSuffix = _get_year_string(
+            firstYear, firstYear+yearsPerCacheFile-1)
+        cacheFileNames.append('{}_{}.nc'.format(cachePrefix, fileSuffix))
+
+    yearString, fileSuffix = _get_year_string(startYearClimo, endYearClimo)
+    outputFileClimo = '{}_{}.nc'.format(cachePrefix, fileSuffix)
+    if outputFileClimo not in cacheFileNames:
+        cacheFileNames.append(outputFileClimo)
+
+    return cacheFileNames  # }}}
+
+
 def _setup_climatology_caching(ds, startYearClimo, endYearClimo,
                                yearsPerCacheFile, cachePrefix,
                                monthValues):  # {{{
@@ -883,26 +979,22 @@ def _setup_climatology_caching(ds, startYearClimo, endYearClimo,
                 dsCached.close()
 
         cacheIndex = len(cacheInfo)
-        for year in years:
-            for month in monthValues:
-                mask = numpy.logical_and(yearsInDs == year,
-                                         monthsInDs == month)
-                cacheIndices[mask] = cacheIndex
+        mask = numpy.logical_and(
+            numpy.logical_and(yearsInDs >= years[0], yearsInDs <= years[-1]),
+            numpy.in1d(monthsInDs, monthValues))
+        cacheIndices[mask] = cacheIndex
 
         if numpy.count_nonzero(cacheIndices == cacheIndex) == 0:
             continue
 
         cacheInfo.append((outputFileClimo, done, yearString))
 
-    ds = ds.copy()
-    ds.coords['cacheIndices'] = ('Time', cacheIndices)
-
     return cacheInfo, cacheIndices  # }}}
 
 
-def _cache_individual_climatologies(ds, cacheInfo, printProgress,
-                                    yearsPerCacheFile, monthValues,
-                                    calendar):  # {{{
+def _cache_individual_climatologies(ds, cacheInfo, cacheIndices,
+                                    printProgress, yearsPerCacheFile,
+                                    monthValues, calendar):  # {{{
     '''
     Cache individual climatologies for later aggregation.
 
@@ -915,7 +1007,9 @@ def _cache_individual_climatologies(ds, cacheInfo, printProgress,
         outputFileClimo, done, yearString = info
         if done:
             continue
-        dsYear = ds.where(ds.cacheIndices == cacheIndex, drop=True)
+        # select the times by index rather than masking every time, which
+        # would add the whole data set to the task graph of each cache file
+        dsYear = ds.isel(Time=numpy.nonzero(cacheIndices == cacheIndex)[0])
 
         if printProgress:
             print '     {}'.format(yearString)
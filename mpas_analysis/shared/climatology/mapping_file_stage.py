@@ -0,0 +1,84 @@
+"""
+An analysis stage for creating the mapping file from the MPAS mesh to the
+comparison grid, shared by all tasks that remap MPAS climatologies.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+from ..analysis_stage import AnalysisStage
+from ..grid import MpasMeshDescriptor
+
+from .climatology import get_lat_lon_comparison_descriptor, get_remapper, \
+    get_mapping_file_name
+
+
+class MpasMappingFileStage(AnalysisStage):  # {{{
+    """
+    An analysis stage for creating the mapping file from the MPAS mesh to the
+    comparison grid.  All tasks that remap from the same mesh to the same
+    comparison grid with the same method share this stage, so the mapping file
+    is only created once, even when tasks run in parallel.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, config, restartFileName):  # {{{
+        """
+        Construct the stage.
+
+        Parameters
+        ----------
+        config :  instance of MpasAnalysisConfigParser
+            Contains configuration options
+
+        restartFileName : str
+            The name of a restart file containing the MPAS mesh
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.restartFileName = restartFileName
+        self.mpasMeshName = config.get('input', 'mpasMeshName')
+        self.method = config.get('climatology', 'mpasInterpolationMethod')
+
+        comparisonDescriptor = get_lat_lon_comparison_descriptor(config)
+
+        self.mappingFileName = get_mapping_file_name(
+            config, self.mpasMeshName, comparisonDescriptor.meshName,
+            mappingFilePrefix='map', method=self.method)
+
+        stageName = 'mappingFile_{}_to_{}_{}'.format(
+            self.mpasMeshName, comparisonDescriptor.meshName, self.method)
+
+        super(MpasMappingFileStage, self).__init__(
+            config=config, stageName=stageName, inputs=[restartFileName],
+            outputs=[self.mappingFileName])  # }}}
+
+    def run(self):  # {{{
+        """
+        Creates the mapping file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        print "\nCreating mapping file {}...".format(self.mappingFileName)
+
+        mpasDescriptor = MpasMeshDescriptor(self.restartFileName,
+                                            meshName=self.mpasMeshName)
+
+        comparisonDescriptor = \
+            get_lat_lon_comparison_descriptor(self.config)
+
+        get_remapper(config=self.config, sourceDescriptor=mpasDescriptor,
+                     comparisonDescriptor=comparisonDescriptor,
+                     mappingFilePrefix='map', method=self.method)  # }}}
+
+# }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,194 @@
+"""
+A policy for choosing the dask chunks of MPAS data sets from a memory budget,
+the shapes and types of the variables and how the data set will be reduced:
+over ``Time`` (e.g. climatologies) or over space (e.g. time series of global
+or regional means).
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import numpy
+
+# the dimensions along which MPAS fields are divided into chunks, in order of
+# preference: horizontal dimensions are split before vertical ones
+horizontalDimensions = ['nCells', 'nEdges', 'nVertices']
+verticalDimensions = ['nVertLevels', 'nVertLevelsP1']
+
+# the access patterns supported by the policy
+accessPatterns = ['climatology', 'timeSeries']
+
+
+def get_chunk_memory(config):  # {{{
+    """
+    Get the largest size of a chunk in bytes, from ``[input] chunkMemory``
+    (in MB), limited to 1/8 of each task's share of ``[execute] memoryBudget``
+    (if any) so several chunks per task can be in memory at once
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    Returns
+    -------
+    chunkMemory : int
+        The memory budget for a chunk in bytes
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    bytesPerMB = 1024**2
+    chunkMemory = bytesPerMB*config.getWithDefault('input', 'chunkMemory',
+                                                   default=128.)
+
+    if config.has_option('execute', 'memoryBudget'):
+        memoryBudget = 1024**3*config.getfloat('execute', 'memoryBudget')
+        if memoryBudget > 0.:
+            taskCount = 1
+            if config.has_option('execute', 'parallelTaskCount'):
+                taskCount = max(config.getint('execute',
+                                              'parallelTaskCount'), 1)
+            chunkMemory = min(chunkMemory, memoryBudget/(8*taskCount))
+
+    return max(int(chunkMemory), 1)  # }}}
+
+
+def compute_chunks(ds, accessPattern, chunkMemory,
+                   maxTimeChunk=None):  # {{{
+    """
+    Compute the chunk size along each dimension of a data set
+
+    Parameters
+    ----------
+    ds : ``xarray.Dataset``
+        The (lazy) data set to be chunked
+
+    accessPattern : {'climatology', 'timeSeries'}
+        Whether the data set will be reduced over ``Time`` (chunks hold as
+        many times and as few cells as the budget allows) or over space
+        (chunks hold whole records, as many as the budget allows)
+
+    chunkMemory : int
+        The largest size of a chunk of any variable in bytes
+
+    maxTimeChunk : int, optional
+        The largest number of times in a chunk, e.g. the number of records
+        that are reduced together
+
+    Returns
+    -------
+    chunks : dict
+        The chunk size along each dimension that is divided into chunks,
+        suitable for ``ds.chunk()``
+
+    Raises
+    ------
+    ValueError
+        If ``accessPattern`` is not supported
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if accessPattern not in accessPatterns:
+        raise ValueError('Unsupported access pattern {}, should be one of '
+                         '{}'.format(accessPattern, accessPatterns))
+
+    chunks = {}
+    for variable in ds.data_vars.values():
+        sizes = dict(zip(variable.dims, variable.shape))
+        if maxTimeChunk is not None and 'Time' in sizes:
+            sizes['Time'] = min(sizes['Time'], maxTimeChunk)
+        variableChunks = _compute_variable_chunks(
+            sizes, variable.dtype.itemsize, accessPattern, chunkMemory)
+        # each dimension is chunked to suit the variable needing the smallest
+        # chunks
+        for dim, size in variableChunks.items():
+            chunks[dim] = min(size, chunks.get(dim, size))
+
+    return chunks  # }}}
+
+
+def get_time_chunks(years, yearsPerBlock, maxChunkSize):  # {{{
+    """
+    Compute the chunks along ``Time`` so that no chunk spans more than one
+    block of years (e.g. the years in one climatology cache file), and so
+    each block can be computed without reading the records of the others
+
+    Parameters
+    ----------
+    years : numpy.ndarray
+        The year of each time in the data set
+
+    yearsPerBlock : int
+        The number of years in each block, starting with the first year
+
+    maxChunkSize : int
+        The largest number of times in a chunk
+
+    Returns
+    -------
+    chunks : tuple of int
+        The number of times in each chunk, suitable for ``ds.chunk()``
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    years = numpy.asarray(years)
+    if len(years) == 0:
+        return ()
+
+    blocks = (years - years[0])//yearsPerBlock
+    boundaries = numpy.concatenate(([0],
+                                    numpy.nonzero(numpy.diff(blocks))[0] + 1,
+                                    [len(years)]))
+
+    chunks = []
+    for blockSize in numpy.diff(boundaries):
+        # blocks larger than a chunk are split into chunks of the largest
+        # size and the remainder
+        while blockSize > 0:
+            chunkSize = min(blockSize, maxChunkSize)
+            chunks.append(int(chunkSize))
+            blockSize -= chunkSize
+
+    return tuple(chunks)  # }}}
+
+
+def _compute_variable_chunks(sizes, itemSize, accessPattern,
+                             chunkMemory):  # {{{
+    """
+    Compute the chunks for a single variable with the given dimension sizes
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    chunks = dict(sizes)
+    if accessPattern == 'climatology':
+        # as many times as possible, then as much space as possible
+        order = ['Time'] + verticalDimensions + horizontalDimensions
+    else:
+        # whole records, then as many times as possible
+        order = verticalDimensions + horizontalDimensions + ['Time']
+
+    # the dimensions not in the list are never divided
+    divisible = [dim for dim in order if dim in sizes]
+    fixedBytes = itemSize*int(numpy.prod([size for dim, size in sizes.items()
+                                          if dim not in divisible]))
+
+    # give each dimension, in order, as much of the budget as the dimensions
+    # before it leave, with at least one entry
+    chunkBytes = fixedBytes
+    for dim in divisible:
+        remaining = chunkMemory//max(chunkBytes, 1)
+        chunks[dim] = int(max(1, min(sizes[dim], remaining)))
+        chunkBytes *= chunks[dim]
+
+    return chunks  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
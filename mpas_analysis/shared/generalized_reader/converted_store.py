@@ -0,0 +1,452 @@
+"""
+Stores holding selected variables of an MPAS history stream converted from
+one file per month (or day) into a single compressed NetCDF4 file, chunked so
+that long time series at each location are contiguous.  A store is written
+once with ``./run_analysis.py --convert`` and appended to as the simulation
+produces more output.  A JSON index beside each store records the history
+files that were converted (with their sizes, modification times and time
+ranges), so ``open_multifile_dataset`` can tell when a store holds the data
+from a set of history files and read the store instead.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import glob
+import json
+
+import netCDF4
+
+from .chunk_policy import _compute_variable_chunks
+from .virtual_dataset import _get_file_times
+from .file_pool import get_file_pool
+from ..io.utility import make_directories, build_config_full_path
+
+# the stores that have been read in this process, indexed by the name of
+# their index file and its modification time
+_storeCache = {}
+
+
+class ConvertedStore(object):  # {{{
+    """
+    A compressed, chunked NetCDF4 store of variables from many history files
+    and the index of the files it holds
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, fileName):  # {{{
+        """
+        Read the index of the store, if it exists
+
+        Parameters
+        ----------
+        fileName : str
+            The NetCDF4 file holding the store.  The index is the same file
+            name with ``.json`` appended.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.fileName = fileName
+        self.indexFileName = '{}.json'.format(fileName)
+        # the converted history files, each with its size, modification time
+        # and the first and last of its times
+        self.files = []
+        # the time of each record in the store
+        self.times = []
+        self.variables = []
+        # whether the store holds every variable with a Time dimension
+        self.complete = False
+        self.calendar = None
+        self.timeVariableName = None
+        if os.path.exists(self.indexFileName):
+            with open(self.indexFileName) as inFile:
+                index = json.load(inFile)
+            for key in ['files', 'times', 'variables', 'complete',
+                        'calendar', 'timeVariableName']:
+                setattr(self, key, index[key])  # }}}
+
+    def append(self, fileNames, calendar, timeVariableName,
+               variableList=None, timeChunkSize=120, chunkSize=4*1024**2,
+               compressionLevel=4):  # {{{
+        """
+        Convert the history files that aren't in the store yet, appending
+        records with times after the last time in the store
+
+        Parameters
+        ----------
+        fileNames : list of str
+            The history files, sorted in time
+
+        calendar : {'gregorian', 'gregorian_noleap'}
+            The name of one of the calendars supported by MPAS cores
+
+        timeVariableName : str or list of str
+            The time variable, or start and end time variables, in the files
+
+        variableList : list of str, optional
+            The variables to convert, or all variables with a Time dimension
+            if ``None`` or empty.  This must not change once the store exists.
+
+        timeChunkSize : int, optional
+            The number of records in each chunk
+
+        chunkSize : int, optional
+            The target size of each chunk in bytes, reached by dividing the
+            horizontal (and, if needed, vertical) dimensions
+
+        compressionLevel : int, optional
+            The zlib compression level (1 to 9)
+
+        Returns
+        -------
+        convertedCount : int
+            The number of history files that were converted
+
+        Raises
+        ------
+        ValueError
+            If a history file in the store has changed since it was converted
+            or the variables or time variable differ from those in the store
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if isinstance(timeVariableName, tuple):
+            timeVariableName = list(timeVariableName)
+
+        converted = dict([(entry['fileName'], entry) for entry in
+                          self.files])
+        newFileNames = []
+        for fileName in fileNames:
+            if fileName in converted:
+                fileStat = os.stat(fileName)
+                entry = converted[fileName]
+                if entry['size'] != fileStat.st_size or \
+                        entry['mtime'] != fileStat.st_mtime:
+                    raise ValueError('History file {} has changed since it '
+                                     'was added to {}.  Delete the store '
+                                     'and convert again.'.format(
+                                         fileName, self.fileName))
+            else:
+                newFileNames.append(fileName)
+
+        if len(newFileNames) == 0:
+            return 0
+
+        if os.path.exists(self.fileName):
+            if self.timeVariableName != timeVariableName or \
+                    self.calendar != calendar:
+                raise ValueError('The time variable and calendar must match '
+                                 'those of {}'.format(self.fileName))
+            # the store can't be open for reading while it is written to
+            get_file_pool().close(self.fileName)
+            outFile = netCDF4.Dataset(self.fileName, 'a')
+        else:
+            make_directories(os.path.dirname(os.path.abspath(self.fileName)))
+            self._create(newFileNames[0], calendar, timeVariableName,
+                         variableList, timeChunkSize, chunkSize,
+                         compressionLevel)
+            outFile = netCDF4.Dataset(self.fileName, 'a')
+
+        fileTimes = _get_file_times(newFileNames, timeVariableName, calendar,
+                                    simulationStartTime=None, processCount=1)
+
+        recordCount = len(self.times)
+        for fileName, times in zip(newFileNames, fileTimes):
+            # skip times that are already in the store (e.g. because the run
+            # was restarted)
+            lastTime = None
+            if len(self.times) > 0:
+                lastTime = self.times[-1]
+            records = []
+            for record, time in enumerate(times['Time']):
+                if lastTime is None or time > lastTime:
+                    records.append(record)
+                    lastTime = time
+
+            if len(records) > 0:
+                inFile = netCDF4.Dataset(fileName, 'r')
+                for variableName in self.variables:
+                    inVar = inFile.variables[variableName]
+                    outVar = outFile.variables[variableName]
+                    inVar.set_auto_maskandscale(False)
+                    outVar.set_auto_maskandscale(False)
+                    outVar[recordCount:recordCount + len(records), ...] = \
+                        inVar[records, ...]
+                inFile.close()
+                recordCount += len(records)
+                self.times.extend([float(times['Time'][record]) for record
+                                   in records])
+
+            fileStat = os.stat(fileName)
+            self.files.append({'fileName': fileName,
+                               'size': fileStat.st_size,
+                               'mtime': fileStat.st_mtime,
+                               'timeRange': [float(times['Time'].min()),
+                                             float(times['Time'].max())]})
+
+        outFile.close()
+        self.write()
+        return len(newFileNames)  # }}}
+
+    def get_time_range(self, fileNames):  # {{{
+        """
+        Get the range of times in the store that come from the given history
+        files
+
+        Parameters
+        ----------
+        fileNames : list of str
+            The history files
+
+        Returns
+        -------
+        timeRange : list of float or None
+            The first and last time from the files, or ``None`` if any of the
+            files isn't in the store (or has changed since it was converted)
+            or if the files aren't consecutive files in the store
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        indices = dict([(entry['fileName'], index) for index, entry in
+                        enumerate(self.files)])
+        fileIndices = []
+        for fileName in fileNames:
+            if fileName not in indices:
+                return None
+            entry = self.files[indices[fileName]]
+            fileStat = os.stat(fileName)
+            if entry['size'] != fileStat.st_size or \
+                    entry['mtime'] != fileStat.st_mtime:
+                return None
+            fileIndices.append(indices[fileName])
+
+        fileIndices = sorted(fileIndices)
+        if len(fileIndices) == 0 or \
+                fileIndices != range(fileIndices[0], fileIndices[-1] + 1):
+            return None
+
+        return [min([self.files[index]['timeRange'][0] for index in
+                     fileIndices]),
+                max([self.files[index]['timeRange'][1] for index in
+                     fileIndices])]  # }}}
+
+    def write(self):  # {{{
+        """
+        Write the index, making sure other processes never see a partially
+        written file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        index = {}
+        for key in ['files', 'times', 'variables', 'complete', 'calendar',
+                    'timeVariableName']:
+            index[key] = getattr(self, key)
+        tempFileName = '{}.{}.tmp'.format(self.indexFileName, os.getpid())
+        with open(tempFileName, 'w') as outFile:
+            json.dump(index, outFile, indent=1)
+        os.rename(tempFileName, self.indexFileName)  # }}}
+
+    def _create(self, templateFileName, calendar, timeVariableName,
+                variableList, timeChunkSize, chunkSize,
+                compressionLevel):  # {{{
+        """
+        Create the store with the dimensions, variables and attributes of the
+        first history file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        inFile = netCDF4.Dataset(templateFileName, 'r')
+
+        timeVariables = timeVariableName
+        if not isinstance(timeVariables, list):
+            timeVariables = [timeVariables]
+
+        self.complete = variableList is None or len(variableList) == 0
+        if self.complete:
+            variableList = [name for name, var in inFile.variables.items()
+                            if 'Time' in var.dimensions]
+        self.variables = list(variableList)
+        for name in timeVariables:
+            if name not in self.variables:
+                self.variables.append(name)
+        self.calendar = calendar
+        self.timeVariableName = timeVariableName
+
+        outFile = netCDF4.Dataset(self.fileName, 'w', format='NETCDF4')
+        outFile.setncatts(dict([(name, inFile.getncattr(name)) for name in
+                                inFile.ncattrs()]))
+
+        for variableName in self.variables:
+            inVar = inFile.variables[variableName]
+            if len(inVar.dimensions) == 0 or inVar.dimensions[0] != 'Time':
+                raise ValueError('Only variables with Time as their first '
+                                 'dimension can be converted, not '
+                                 '{}'.format(variableName))
+            for dim in inVar.dimensions:
+                if dim not in outFile.dimensions:
+                    if dim == 'Time':
+                        outFile.createDimension(dim, None)
+                    else:
+                        outFile.createDimension(
+                            dim, len(inFile.dimensions[dim]))
+
+            sizes = dict([(dim, len(outFile.dimensions[dim])) for dim in
+                          inVar.dimensions])
+            sizes['Time'] = timeChunkSize
+            # chunks holding many times and as much space as fits
+            chunks = _compute_variable_chunks(sizes, inVar.dtype.itemsize,
+                                              'climatology', chunkSize)
+
+            attrs = dict([(name, inVar.getncattr(name)) for name in
+                          inVar.ncattrs()])
+            fillValue = attrs.pop('_FillValue', None)
+            outVar = outFile.createVariable(
+                variableName, inVar.dtype, inVar.dimensions, zlib=True,
+                complevel=compressionLevel, fill_value=fillValue,
+                chunksizes=[chunks[dim] for dim in inVar.dimensions])
+            outVar.setncatts(attrs)
+
+        outFile.close()
+        inFile.close()  # }}}
+
+# }}}
+
+
+def find_store(config, fileNames, calendar, timeVariableName, variableList,
+               variableMap):  # {{{
+    """
+    Find a converted store that holds the given variables from the given
+    history files
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    fileNames : list of str
+        The history files
+
+    calendar : {'gregorian', 'gregorian_noleap'}
+        The name of one of the calendars supported by MPAS cores
+
+    timeVariableName, variableList, variableMap :
+        As in ``open_multifile_dataset``
+
+    Returns
+    -------
+    store : ``ConvertedStore`` or None
+        The store, or ``None`` if no store holds the data
+
+    timeRange : list of float or None
+        The first and last time in the store from the history files
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if not config.has_option('output', 'storeSubdirectory'):
+        return None, None
+
+    storeDirectory = build_config_full_path(config, 'output',
+                                            'storeSubdirectory')
+    for indexFileName in sorted(glob.glob('{}/*.nc.json'.format(
+            storeDirectory))):
+        store = _get_store(indexFileName)
+        if store is None or store.calendar != calendar or \
+                not _holds_variables(store, timeVariableName, variableList,
+                                     variableMap):
+            continue
+        timeRange = store.get_time_range(fileNames)
+        if timeRange is not None:
+            return store, timeRange
+
+    return None, None  # }}}
+
+
+def _get_store(indexFileName):  # {{{
+    """
+    Get a store from the cache or read its index
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    try:
+        key = (indexFileName, os.path.getmtime(indexFileName))
+    except OSError:
+        return None
+    if key not in _storeCache:
+        store = ConvertedStore(indexFileName[:-len('.json')])
+        if not os.path.exists(store.fileName):
+            return None
+        _storeCache[key] = store
+    return _storeCache[key]  # }}}
+
+
+def _holds_variables(store, timeVariableName, variableList,
+                     variableMap):  # {{{
+    """
+    Whether the store holds the time variable and the requested variables
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if variableMap is not None and timeVariableName in variableMap:
+        # the first of the possible time variables that the store holds
+        candidates = [name for name in variableMap[timeVariableName] if
+                      _all_in(name, store.variables)]
+        if len(candidates) == 0:
+            return False
+        timeVariableName = candidates[0]
+    if isinstance(timeVariableName, tuple):
+        timeVariableName = list(timeVariableName)
+    if timeVariableName != store.timeVariableName:
+        return False
+
+    if variableList is None:
+        return store.complete
+
+    if isinstance(variableList, str):
+        variableList = [variableList]
+
+    for variableName in variableList:
+        if variableMap is not None and variableName in variableMap:
+            if not any([name in store.variables for name in
+                        variableMap[variableName]
+                        if isinstance(name, str)]):
+                return False
+        elif variableName not in store.variables:
+            return False
+
+    return True  # }}}
+
+
+def _all_in(names, variables):  # {{{
+    """
+    Whether a variable name (or all of a list of names) is in the variables
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if isinstance(names, (list, tuple)):
+        return all([name in variables for name in names])
+    return names in variables  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
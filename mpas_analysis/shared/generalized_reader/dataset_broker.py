@@ -0,0 +1,415 @@
+"""
+A broker that shares multi-file data sets between the analysis tasks run in
+the same process, so the headers and time variables of a set of MPAS output
+files are read only once, no matter how many tasks use them.
+
+Tasks register the files they will read (and the variables and slices
+they need) during ``setup_and_check``, open a view of the shared data set
+(with only their variables, slices and dates) during ``run`` and release it
+when they are done.  The shared data set is read with the union of the
+registered variables and slices, so no more is read from the files than the
+tasks need.  It is closed once every task that registered it has released
+it.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import numpy
+
+from .generalized_reader import open_multifile_dataset, \
+    _select_dates_and_chunk, _map_variable_name
+from .file_pool import get_file_pool
+from ..mpas_xarray import mpas_xarray
+
+
+class DatasetBroker(object):  # {{{
+    """
+    Keeps track of shared multi-file data sets and how many tasks are using
+    each one
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self):  # {{{
+        """
+        Create a broker with no data sets
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        # the number of tasks that have registered each data set and not yet
+        # released it
+        self.refCounts = {}
+        # the arguments needed to open each data set
+        self.arguments = {}
+        # the variables and slices each task registered for each data set
+        self.registrations = {}
+        # the data sets that have been opened, indexed by the same keys
+        self.datasets = {}
+        # the variables (``None`` for all), slices and dimension sizes each
+        # data set was opened with
+        self.selections = {}  # }}}
+
+    def register(self, fileNames, calendar, timeVariableName='Time',
+                 variableMap=None, variableList=None,
+                 iselValues=None):  # {{{
+        """
+        Register that a task will read a data set from the given files
+
+        Parameters
+        ----------
+        fileNames : list of str
+            The files to read (typically from ``StreamsFile.readpath``)
+
+        calendar : {'gregorian', 'gregorian_noleap'}
+            The name of one of the calendars supported by MPAS cores
+
+        timeVariableName : str or list of str, optional
+            The name of the time variable, or the start and end time variables
+            used to compute the time coordinate
+
+        variableMap : dict, optional
+            A map from MPAS-Analysis variable names to possible MPAS variable
+            names, as in ``open_multifile_dataset``
+
+        variableList : list of str, optional
+            The variables the task will read, or ``None`` for all variables
+
+        iselValues : dict, optional
+            The indices, slices or arrays of indices along dimensions other
+            than ``Time`` the task will read, as in
+            ``open_multifile_dataset``
+
+        Returns
+        -------
+        key : tuple
+            The key used to open and release the data set
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        key = (tuple(fileNames), calendar, str(timeVariableName),
+               repr(variableMap))
+        # the key holds the time variable and variable map as strings to make
+        # it hashable, so keep the original arguments for opening the files
+        self.arguments[key] = (list(fileNames), calendar, timeVariableName,
+                               variableMap)
+        self.refCounts[key] = self.refCounts.get(key, 0) + 1
+        if variableList is not None:
+            variableList = mpas_xarray._ensure_list(variableList)
+        self.registrations.setdefault(key, []).append((variableList,
+                                                       iselValues))
+        return key  # }}}
+
+    def open_dataset(self, key, config, simulationStartTime=None,
+                     variableList=None, selValues=None, iselValues=None,
+                     startDate=None, endDate=None, chunking=None):  # {{{
+        """
+        Open a lazy view of a registered data set, reading the files the
+        first time any task opens it
+
+        Parameters
+        ----------
+        key : tuple
+            The key returned by ``register``
+
+        config :  instance of MpasAnalysisConfigParser
+            Contains configuration options
+
+        simulationStartTime, variableList, selValues, iselValues, startDate,
+        endDate, chunking : optional
+            As in ``open_multifile_dataset``.  ``simulationStartTime`` is the
+            same for all tasks analyzing a given run, so only the value given
+            when the files are first read is used.  If the variables or
+            slices were not all registered, the data set is read for this
+            task alone.
+
+        Returns
+        -------
+        ds : ``xarray.Dataset``
+            A view of the shared data set containing only the requested
+            variables, slices and dates
+
+        Raises
+        ------
+        ValueError
+            If the data set has not been registered
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if key not in self.refCounts:
+            raise ValueError('A data set must be registered before it can '
+                             'be opened.')
+
+        (fileNames, calendar, timeVariableName, variableMap) = \
+            self.arguments[key]
+
+        if key not in self.datasets:
+            # the union of the variables and slices registered by all tasks,
+            # so the shared data set can serve every task
+            (sharedVariables, sharedIselValues, variableDims, dimSizes) = \
+                self._combine_registrations(key)
+            self.datasets[key] = open_multifile_dataset(
+                fileNames=fileNames,
+                calendar=calendar,
+                config=config,
+                simulationStartTime=simulationStartTime,
+                timeVariableName=timeVariableName,
+                variableList=sharedVariables,
+                iselValues=sharedIselValues,
+                variableMap=variableMap)
+            self.selections[key] = (sharedVariables, sharedIselValues,
+                                    variableDims, dimSizes)
+
+        viewIselValues = self._get_view_selection(key, variableList,
+                                                  iselValues)
+        if viewIselValues is None:
+            # this task needs more than it registered, so it can't use the
+            # shared data set
+            return open_multifile_dataset(
+                fileNames=fileNames,
+                calendar=calendar,
+                config=config,
+                simulationStartTime=simulationStartTime,
+                timeVariableName=timeVariableName,
+                variableList=variableList,
+                selValues=selValues,
+                iselValues=iselValues,
+                variableMap=variableMap,
+                startDate=startDate,
+                endDate=endDate,
+                chunking=chunking)
+
+        ds = self.datasets[key]
+
+        if variableList is not None:
+            ds = mpas_xarray.subset_variables(ds, variableList)
+
+        if selValues is not None:
+            ds = ds.sel(**selValues)
+
+        if len(viewIselValues) > 0:
+            ds = ds.isel(**viewIselValues)
+
+        ds = _select_dates_and_chunk(ds, calendar, config, startDate, endDate,
+                                     chunking)
+
+        return ds  # }}}
+
+    def release(self, key):  # {{{
+        """
+        Release a data set a task has finished with, closing it if no other
+        registered task still needs it
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if key not in self.refCounts:
+            return
+        self.refCounts[key] -= 1
+        if self.refCounts[key] > 0:
+            return
+        self.refCounts.pop(key)
+        self.arguments.pop(key)
+        self.registrations.pop(key, None)
+        self.selections.pop(key, None)
+        if key in self.datasets:
+            self.datasets.pop(key).close()  # }}}
+
+    def close_all(self):  # {{{
+        """
+        Close all data sets, e.g. once all tasks have run
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        for ds in self.datasets.values():
+            ds.close()
+        self.datasets = {}
+        self.selections = {}
+        self.refCounts = {}
+        self.arguments = {}
+        self.registrations = {}  # }}}
+
+    def _combine_registrations(self, key):  # {{{
+        """
+        Find the union of the variables and slices registered for a data
+        set.  A dimension is only sliced if every task reading a variable
+        with that dimension registered a slice of it.
+
+        Returns
+        -------
+        variableList : list of str or None
+            The registered variables, or ``None`` if a task needs them all
+
+        iselValues : dict or None
+            Sorted arrays of the indices along each sliced dimension
+
+        variableDims : dict
+            The dimensions of each variable, by MPAS-Analysis name
+
+        dimSizes : dict
+            The size of each dimension in the files
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        (fileNames, calendar, timeVariableName, variableMap) = \
+            self.arguments[key]
+
+        # the dimensions of the variables are read from the header of the
+        # first file
+        filePool = get_file_pool()
+        with filePool.lock:
+            template = filePool.open(fileNames[0], checkForChanges=True)
+            dimSizes = dict(template.dims)
+            variableDims = dict([(name, template.variables[name].dims) for
+                                 name in template.data_vars])
+            if variableMap is not None:
+                for name in variableMap:
+                    if name == timeVariableName:
+                        continue
+                    try:
+                        mpasName = _map_variable_name(name, template,
+                                                      variableMap)
+                    except ValueError:
+                        continue
+                    if not isinstance(mpasName, (list, tuple)):
+                        variableDims[name] = template.variables[mpasName].dims
+
+        registrations = self.registrations[key]
+
+        if any([variableList is None for variableList, iselValues in
+                registrations]):
+            sharedVariables = None
+        else:
+            sharedVariables = []
+            for variableList, iselValues in registrations:
+                sharedVariables.extend([name for name in variableList if
+                                        name not in sharedVariables])
+
+        sharedIselValues = {}
+        for dim, size in dimSizes.items():
+            if dim == 'Time':
+                continue
+            indices = set()
+            for variableList, iselValues in registrations:
+                if dim not in _get_dims(variableList, variableDims):
+                    continue
+                if iselValues is None or dim not in iselValues:
+                    # this task reads the whole dimension
+                    indices = None
+                    break
+                indices.update(numpy.ravel(_get_indices(iselValues[dim],
+                                                        size)))
+            if indices is not None and 0 < len(indices) < size:
+                sharedIselValues[dim] = numpy.array(sorted(indices))
+
+        if len(sharedIselValues) == 0:
+            sharedIselValues = None
+
+        return sharedVariables, sharedIselValues, variableDims, dimSizes
+        # }}}
+
+    def _get_view_selection(self, key, variableList, iselValues):  # {{{
+        """
+        Translate the slices a task requests into slices of the shared data
+        set
+
+        Returns
+        -------
+        viewIselValues : dict or None
+            The slices to apply to the shared data set, or ``None`` if the
+            shared data set doesn't contain all the requested variables and
+            indices
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        (sharedVariables, sharedIselValues, variableDims, dimSizes) = \
+            self.selections[key]
+
+        if variableList is not None:
+            variableList = mpas_xarray._ensure_list(variableList)
+
+        if sharedVariables is not None:
+            if variableList is None:
+                return None
+            if any([name not in sharedVariables for name in variableList]):
+                return None
+
+        if iselValues is None:
+            iselValues = {}
+        if sharedIselValues is None:
+            return dict(iselValues)
+
+        # the requested variables must not need indices the shared data set
+        # doesn't have
+        dims = _get_dims(variableList, variableDims)
+        for dim in sharedIselValues:
+            if dim in dims and dim not in iselValues:
+                return None
+
+        viewIselValues = {}
+        for dim, index in iselValues.items():
+            if dim not in sharedIselValues:
+                viewIselValues[dim] = index
+                continue
+            indices = _get_indices(index, dimSizes[dim])
+            if not numpy.all(numpy.in1d(indices, sharedIselValues[dim])):
+                return None
+            positions = numpy.searchsorted(sharedIselValues[dim], indices)
+            if positions.ndim == 0:
+                positions = int(positions)
+            viewIselValues[dim] = positions
+
+        return viewIselValues  # }}}
+
+# }}}
+
+
+def _get_dims(variableList, variableDims):  # {{{
+    """
+    The dimensions of the given variables, or of all variables if
+    ``variableList`` is ``None``
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if variableList is None:
+        variableList = variableDims.keys()
+    dims = set()
+    for name in variableList:
+        dims.update(variableDims.get(name, ()))
+    return dims  # }}}
+
+
+def _get_indices(index, size):  # {{{
+    """
+    The indices along a dimension of the given size selected by an integer,
+    slice or array of indices, as ``isel`` would select them
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    return numpy.arange(size)[index]  # }}}
+
+
+# the broker shared by all tasks run in this process
+datasetBroker = DatasetBroker()
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
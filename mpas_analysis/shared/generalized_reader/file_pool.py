@@ -0,0 +1,195 @@
+"""
+A process-wide pool of open netCDF files shared by the multi-file readers.
+Rather than keeping every file of a data set open (which can exhaust the
+system's limit on open files when several tasks each read hundreds of files)
+or opening the file again for every access, the pool keeps the most recently
+used files open, up to a maximum number, and closes the least recently used
+file when another must be opened.  Each access is counted as a hit (the file
+was already open) or a miss (the file had to be opened) in the performance
+report of the current task.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import xarray
+
+from ..performance import record_file_handles
+
+
+class FilePool(object):  # {{{
+    """
+    A pool of open files, closing the least recently used file when more
+    than ``maxOpenFiles`` would be open
+
+    Attributes
+    ----------
+    maxOpenFiles : int
+        The maximum number of files in the pool
+
+    hits, misses : int
+        The number of times a file was requested that was already open or
+        that had to be opened, respectively
+
+    lock : ``threading.RLock``
+        The netCDF library is not thread safe, so files must only be opened,
+        closed or read from by a thread holding this lock
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, maxOpenFiles=128):  # {{{
+        """
+        Create an empty pool
+
+        Parameters
+        ----------
+        maxOpenFiles : int, optional
+            The maximum number of files in the pool
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.maxOpenFiles = max(maxOpenFiles, 1)
+        self.hits = 0
+        self.misses = 0
+        # the open data sets and the size and modification time of each file
+        # when it was opened, from least to most recently used
+        self._files = OrderedDict()
+        self.lock = threading.RLock()  # }}}
+
+    def open(self, fileName, checkForChanges=False):  # {{{
+        """
+        Get a data set for a file, opening it if it isn't already open.  The
+        data set is not decoded (times, in particular, are left as they are
+        in the file) and must not be closed by the caller.  It may be closed
+        by the pool once other files have been opened, so it should be
+        requested again from the pool each time data is read from it, with
+        ``lock`` held until the data has been read.
+
+        Parameters
+        ----------
+        fileName : str
+            The name of the file
+
+        checkForChanges : bool, optional
+            Whether to reopen the file if it has changed (e.g. a store that
+            has been appended to) since the pool opened it.  Readers check
+            when they first open a data set, rather than on every read, so
+            that reading a chunk doesn't require a call to ``os.stat``.
+
+        Returns
+        -------
+        ds : ``xarray.Dataset``
+            The open data set
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        stamp = None
+        if checkForChanges or fileName not in self._files:
+            fileStat = os.stat(fileName)
+            stamp = (fileStat.st_size, fileStat.st_mtime)
+
+        with self.lock:
+            if fileName in self._files:
+                ds, openStamp = self._files.pop(fileName)
+                if stamp is None or openStamp == stamp:
+                    # move the file to the most recently used position
+                    self._files[fileName] = (ds, openStamp)
+                    self.hits += 1
+                    record_file_handles(hits=1)
+                    return ds
+                # the file has changed since it was opened
+                ds.close()
+
+            if stamp is None:
+                # another thread closed the file after it was checked above
+                fileStat = os.stat(fileName)
+                stamp = (fileStat.st_size, fileStat.st_mtime)
+
+            while len(self._files) >= self.maxOpenFiles:
+                _, (oldDs, _) = self._files.popitem(last=False)
+                oldDs.close()
+
+            ds = xarray.open_dataset(fileName, decode_times=False)
+            self._files[fileName] = (ds, stamp)
+            self.misses += 1
+            record_file_handles(misses=1)
+            return ds  # }}}
+
+    def close(self, fileName=None):  # {{{
+        """
+        Close a file (e.g. before it is written to) or all files in the pool
+
+        Parameters
+        ----------
+        fileName : str, optional
+            The name of the file to close, or ``None`` to close all files
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        with self.lock:
+            if fileName is None:
+                fileNames = list(self._files.keys())
+            else:
+                fileNames = [fileName]
+            for name in fileNames:
+                if name in self._files:
+                    ds, _ = self._files.pop(name)
+                    ds.close()  # }}}
+
+    def set_max_open_files(self, maxOpenFiles):  # {{{
+        """
+        Change the maximum number of files in the pool, closing the least
+        recently used files if there are too many open
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        with self.lock:
+            self.maxOpenFiles = max(maxOpenFiles, 1)
+            while len(self._files) > self.maxOpenFiles:
+                _, (oldDs, _) = self._files.popitem(last=False)
+                oldDs.close()  # }}}
+
+    def open_file_count(self):  # {{{
+        """
+        The number of files that are currently open
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        return len(self._files)  # }}}
+
+# }}}
+
+
+# the pool shared by all readers in this process
+_filePool = FilePool()
+
+
+def get_file_pool():  # {{{
+    """
+    Returns the pool of open files shared by all readers in this process
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    return _filePool  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -8,6 +8,9 @@ open_multifile_dataset : opens a data set, maps variable names, preprocess
     the data set removes repeated time indices, and slices the time coordinate
     to lie between desired start and end dates.
 
+iterate_years : reads a data set one block of years at a time, yielding each
+    block loaded into memory.
+
 Authors
 -------
 Xylar Asay-Davis
@@ -18,13 +21,20 @@ Last modified
 """
 
 import xarray
-from functools import partial
+import numpy
 import resource
 
 from ..mpas_xarray import mpas_xarray
+from .chunk_policy import accessPatterns, compute_chunks, get_chunk_memory, \
+    get_time_chunks
 from ..timekeeping.utility import string_to_days_since_date, days_to_datetime
+from ..timekeeping.vectorized_calendar import days_to_dates
+from ..timekeeping.time_table import add_time_table_coords
+from ..performance import record_phase, record_files_opened, \
+    performance_phase
 
 
+@record_phase('load')
 def open_multifile_dataset(fileNames, calendar, config,
                            simulationStartTime=None,
                            timeVariableName='Time',
@@ -92,16 +102,23 @@ def open_multifile_dataset(fileNames, calendar, config,
         If present, the first and last dates to be used in the data set.  The
         time variable is sliced to only include dates within this range.
 
-    chunking : None, int, True, dict, optional
+    chunking : None, int, True, dict, {'climatology', 'timeSeries'}, optional
         If integer is present, applies maximum chunk size from config file
         value ``maxChunkSize``, otherwise if None do not perform chunking.  If
         True, use automated chunking using default config value
         ``maxChunkSize``. If chunking is a dict use dictionary values for
-        chunking.
+        chunking.  If 'climatology' or 'timeSeries', chunks are chosen to fit
+        in the ``chunkMemory`` budget for a data set that will be reduced over
+        Time or over space, respectively.  Climatology chunks hold the
+        records of no more than one climatology cache file
+        (``yearsPerCacheFile`` years).
 
     Returns
     -------
     ds : ``xarray.Dataset``
+        The data set, with ``year`` and ``month`` coordinates (and
+        ``daysInMonth`` if it has ``startTime`` and ``endTime``) along
+        ``Time`` from its time table
 
     Raises
     ------
@@ -124,35 +141,83 @@ def open_multifile_dataset(fileNames, calendar, config,
     04/06/2017
     """
 
-
-    preprocess_partial = partial(_preprocess,
-                                 calendar=calendar,
-                                 simulationStartTime=simulationStartTime,
-                                 timeVariableName=timeVariableName,
-                                 variableList=variableList,
-                                 selValues=selValues,
-                                 iselValues=iselValues,
-                                 variableMap=variableMap,
-                                 startDate=startDate,
-                                 endDate=endDate)
+    # imported here because these readers use the variable mapping in this
+    # module
+    from .virtual_dataset import open_virtual_dataset
+    from .converted_store import find_store
+
+    if isinstance(fileNames, str):
+        fileNames = [fileNames]
+
+    # prefer a converted store holding the variables from these files
+    store, timeRange = find_store(config, fileNames, calendar,
+                                  timeVariableName, variableList, variableMap)
+    if store is not None:
+        # only the times from these files, within the requested dates
+        timeRange = list(timeRange)
+        if startDate is not None:
+            if isinstance(startDate, str):
+                startDate = string_to_days_since_date(dateString=startDate,
+                                                      calendar=calendar)
+            timeRange[0] = max(timeRange[0], startDate)
+        if endDate is not None:
+            if isinstance(endDate, str):
+                endDate = string_to_days_since_date(dateString=endDate,
+                                                    calendar=calendar)
+            timeRange[1] = min(timeRange[1], endDate)
+        return open_virtual_dataset(fileNames=[store.fileName],
+                                    calendar=calendar,
+                                    config=config,
+                                    simulationStartTime=simulationStartTime,
+                                    timeVariableName=timeVariableName,
+                                    variableList=variableList,
+                                    selValues=selValues,
+                                    iselValues=iselValues,
+                                    variableMap=variableMap,
+                                    startDate=timeRange[0],
+                                    endDate=timeRange[1],
+                                    chunking=chunking)
+
+    if config.getWithDefault('input', 'multifileReader',
+                             default='mfdataset') == 'virtual':
+        return open_virtual_dataset(fileNames=fileNames,
+                                    calendar=calendar,
+                                    config=config,
+                                    simulationStartTime=simulationStartTime,
+                                    timeVariableName=timeVariableName,
+                                    variableList=variableList,
+                                    selValues=selValues,
+                                    iselValues=iselValues,
+                                    variableMap=variableMap,
+                                    startDate=startDate,
+                                    endDate=endDate,
+                                    chunking=chunking)
+
+    # the variable names are mapped and the selections checked only for the
+    # first file, then the same renames, subsetting and selections are
+    # applied to the others
+    preprocessPlan = _PreprocessPlan(calendar=calendar,
+                                     simulationStartTime=simulationStartTime,
+                                     timeVariableName=timeVariableName,
+                                     variableList=variableList,
+                                     selValues=selValues,
+                                     iselValues=iselValues,
+                                     variableMap=variableMap,
+                                     startDate=startDate,
+                                     endDate=endDate)
 
     kwargs = {'decode_times': False,
               'concat_dim': 'Time'}
 
-    autocloseFileLimitFraction = config.getfloat('input',
-                                                 'autocloseFileLimitFraction')
+    # use autoclose if the data set has more files than the task may have
+    # open at the same time
+    autoclose = len(fileNames) > get_open_file_limit(config)
 
-    # get the number of files that can be open at the same time.  We want the
-    # "soft" limit because we'll get a crash if we exceed it.
-    softLimit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
-
-    # use autoclose if we will use more than autocloseFileLimitFraction (50%
-    # by default) of the soft limit of open files
-    autoclose = len(fileNames) > softLimit*autocloseFileLimitFraction
+    record_files_opened(len(fileNames))
 
     try:
         ds = xarray.open_mfdataset(fileNames,
-                                   preprocess=preprocess_partial,
+                                   preprocess=preprocessPlan,
                                    autoclose=autoclose, **kwargs)
     except TypeError as e:
         if 'autoclose' in str(e):
@@ -163,13 +228,196 @@ def open_multifile_dataset(fileNames, calendar, config,
                       'try again without autoclose argument.'
 
             ds = xarray.open_mfdataset(fileNames,
-                                       preprocess=preprocess_partial,
+                                       preprocess=preprocessPlan,
                                        **kwargs)
         else:
             raise e
 
     ds = mpas_xarray.remove_repeated_time_index(ds)
 
+    # the calendar information for each time, computed once for the data set
+    ds = add_time_table_coords(ds, calendar)
+
+    ds = _select_dates_and_chunk(ds, calendar, config, startDate, endDate,
+                                 chunking)
+
+    # private record of autoclose use
+    ds.attrs['_autoclose'] = int(autoclose)
+
+    return ds  # }}}
+
+
+def iterate_years(fileNames, calendar, config, simulationStartTime=None,
+                  timeVariableName='Time', variableList=None,
+                  selValues=None, iselValues=None, variableMap=None,
+                  startDate=None, endDate=None, yearsPerBlock=1):  # {{{
+    """
+    A generator that reads a multi-file data set one block of years at a
+    time.  Only the time variables of all the files are read up front (and
+    cached); the data for each block is read from just the files holding
+    that block's times, loaded into memory and yielded, and the files are
+    closed before the next block is read.  This keeps the memory used and the
+    cost of building the task graph the same no matter how many years the
+    data set covers.
+
+    Parameters
+    ----------
+    fileNames, calendar, config, simulationStartTime, timeVariableName,
+    variableList, selValues, iselValues, variableMap, startDate, endDate :
+        As in ``open_multifile_dataset``
+
+    yearsPerBlock : int, optional
+        The number of years in each block
+
+    Yields
+    ------
+    ds : ``xarray.Dataset``
+        The data set for the times in a block of years, loaded into memory
+        and with ``year``, ``month`` and ``daysInMonth`` coordinates
+
+    Raises
+    ------
+    ValueError
+        If no times lie between ``startDate`` and ``endDate``
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    # imported here because these modules import from this one
+    from .virtual_dataset import _get_file_times
+    from .file_pool import get_file_pool
+    from ..climatology.climatology import add_years_months_days_in_month
+
+    if isinstance(fileNames, str):
+        fileNames = [fileNames]
+
+    filePool = get_file_pool()
+
+    inTimeVariableName = timeVariableName
+    if variableMap is not None and timeVariableName in variableMap:
+        with filePool.lock:
+            inTimeVariableName = _map_variable_name(
+                timeVariableName, filePool.open(fileNames[0]), variableMap)
+
+    if startDate is not None and endDate is not None:
+        if isinstance(startDate, str):
+            startDate = string_to_days_since_date(dateString=startDate,
+                                                  calendar=calendar)
+        if isinstance(endDate, str):
+            endDate = string_to_days_since_date(dateString=endDate,
+                                                calendar=calendar)
+
+    processCount = min(config.getWithDefault('input', 'fileOpenProcessCount',
+                                             default=8),
+                       get_open_file_limit(config))
+    fileTimes = _get_file_times(fileNames, inTimeVariableName, calendar,
+                                simulationStartTime, processCount)
+
+    # the year of each time in each file within the requested dates
+    fileYears = []
+    for times in fileTimes:
+        times = times['Time']
+        if startDate is not None and endDate is not None:
+            times = times[numpy.logical_and(times >= startDate,
+                                            times <= endDate)]
+        fileYears.append(dict(zip(times, days_to_dates(
+            times, calendar=calendar)[0])))
+
+    allYears = [year for years in fileYears for year in years.values()]
+    if len(allYears) == 0:
+        raise ValueError('The data set contains no Time entries between '
+                         'dates\n{} and {}.'.format(
+                             days_to_datetime(startDate, calendar=calendar),
+                             days_to_datetime(endDate, calendar=calendar)))
+
+    for firstYear in range(min(allYears), max(allYears) + 1, yearsPerBlock):
+        lastYear = firstYear + yearsPerBlock - 1
+        blockFileNames = []
+        blockTimes = []
+        for fileName, years in zip(fileNames, fileYears):
+            times = [time for time, year in years.items()
+                     if firstYear <= year <= lastYear]
+            if len(times) > 0:
+                blockFileNames.append(fileName)
+                blockTimes.extend(times)
+
+        if len(blockFileNames) == 0:
+            # there is a gap in the data set
+            continue
+
+        ds = open_multifile_dataset(fileNames=blockFileNames,
+                                    calendar=calendar,
+                                    config=config,
+                                    simulationStartTime=simulationStartTime,
+                                    timeVariableName=timeVariableName,
+                                    variableList=variableList,
+                                    selValues=selValues,
+                                    iselValues=iselValues,
+                                    variableMap=variableMap,
+                                    startDate=min(blockTimes),
+                                    endDate=max(blockTimes))
+        with performance_phase('load'):
+            ds = add_years_months_days_in_month(ds, calendar)
+            ds.load()
+
+        # the data are in memory, so the files can be closed
+        ds.close()
+        for fileName in blockFileNames:
+            filePool.close(fileName)
+
+        yield ds
+
+    # }}}
+
+
+def get_open_file_limit(config):  # {{{
+    """
+    Get the number of files an analysis task may have open at the same time,
+    either from the ``maxOpenFiles`` config option or, if it is 0, half of
+    the system's soft limit on open files divided among the tasks that may
+    run in parallel
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    Returns
+    -------
+    openFileLimit : int
+        The maximum number of open files (at least 1)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    openFileLimit = config.getWithDefault('input', 'maxOpenFiles', default=0)
+    if openFileLimit <= 0:
+        # get the number of files that can be open at the same time.  We want
+        # the "soft" limit because we'll get a crash if we exceed it.
+        softLimit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        taskCount = 1
+        if config.has_option('execute', 'parallelTaskCount'):
+            taskCount = config.getint('execute', 'parallelTaskCount')
+        openFileLimit = softLimit//(2*max(taskCount, 1))
+
+    return max(openFileLimit, 1)  # }}}
+
+
+def _select_dates_and_chunk(ds, calendar, config, startDate, endDate,
+                            chunking):  # {{{
+    """
+    Slice the time coordinate of a data set to lie between the start and end
+    dates, then chunk the data set.  See ``open_multifile_dataset`` for a
+    description of the arguments.
+
+    Authors
+    -------
+    Xylar Asay-Davis, Phillip J. Wolfram
+    """
+
     if startDate is not None and endDate is not None:
         if isinstance(startDate, str):
             startDate = string_to_days_since_date(dateString=startDate,
@@ -186,15 +434,53 @@ def open_multifile_dataset(fileNames, calendar, config,
                          '{} and {}.'.format(
                              days_to_datetime(startDate, calendar=calendar),
                              days_to_datetime(endDate, calendar=calendar)))
-    # process chunking
+    ds = _apply_chunking(ds, config, chunking)
+
+    return ds  # }}}
+
+
+def _apply_chunking(ds, config, chunking):  # {{{
+    """
+    Chunk a data set.  See ``open_multifile_dataset`` for a description of
+    the arguments.
+
+    Authors
+    -------
+    Xylar Asay-Davis, Phillip J. Wolfram
+    """
     if chunking is True:
         # limit chunk size to prevent memory error
         chunking = config.getint('input', 'maxChunkSize')
 
-    ds = mpas_xarray.process_chunking(ds, chunking)
+    elif chunking in accessPatterns:
+        accessPattern = chunking
+        maxTimeChunk = None
+        if accessPattern == 'climatology':
+            # climatologies are cached one block of years at a time, so a
+            # chunk should never hold the records of more than one block
+            yearsPerCacheFile = 1
+            if config.has_option('climatology', 'yearsPerCacheFile'):
+                yearsPerCacheFile = config.getint('climatology',
+                                                  'yearsPerCacheFile')
+            maxTimeChunk = 12*yearsPerCacheFile
+        chunking = compute_chunks(ds, accessPattern,
+                                  get_chunk_memory(config),
+                                  maxTimeChunk=maxTimeChunk)
+        # log the choice, since it depends on the mesh, the variables and the
+        # memory available
+        print '   Chunks for {}: {}'.format(
+            ', '.join(sorted(ds.data_vars.keys())),
+            ', '.join(['{}={}'.format(dim, chunking[dim]) for dim in
+                       sorted(chunking.keys())]))
+        if accessPattern == 'climatology' and 'Time' in chunking and \
+                'year' in ds.coords:
+            # align the chunks with the blocks of years, which need not start
+            # in January
+            chunking['Time'] = get_time_chunks(ds.year.values,
+                                               yearsPerCacheFile,
+                                               chunking['Time'])
 
-    # private record of autoclose use
-    ds.attrs['_autoclose'] = int(autoclose)
+    ds = mpas_xarray.process_chunking(ds, chunking)
 
     return ds  # }}}
 
@@ -310,6 +596,157 @@ def _preprocess(ds, calendar, simulationStartTime, timeVariableName,
     return ds  # }}}
 
 
+class _PreprocessPlan(object):  # {{{
+    """
+    The preprocessing of each file in a multi-file data set (see
+    ``_preprocess``), worked out once from the first file.  Variable names
+    are mapped, the variables to drop are found and the selections are
+    checked only for that file.  Each other file with the same schema (the
+    same variables, dimensions and types) is then preprocessed by dropping,
+    renaming and selecting the same variables and decoding its times.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, calendar, simulationStartTime, timeVariableName,
+                 variableList, selValues, iselValues, variableMap,
+                 startDate, endDate):  # {{{
+        """
+        Store the arguments of ``_preprocess``, which the plan is compiled
+        from when the first file is preprocessed
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.arguments = {'calendar': calendar,
+                          'simulationStartTime': simulationStartTime,
+                          'timeVariableName': timeVariableName,
+                          'variableList': variableList,
+                          'selValues': selValues,
+                          'iselValues': iselValues,
+                          'variableMap': variableMap,
+                          'startDate': startDate,
+                          'endDate': endDate}
+        self.fingerprint = None
+        # the number of files with a different schema from the first, which
+        # were preprocessed in full
+        self.fallbackCount = 0  # }}}
+
+    def __call__(self, ds):  # {{{
+        """
+        Preprocess a file, compiling the plan if this is the first file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        fingerprint = _schema_fingerprint(ds)
+        if self.fingerprint is None:
+            self._compile(ds)
+            self.fingerprint = fingerprint
+        elif fingerprint != self.fingerprint:
+            # e.g. a file from a different version of MPAS
+            self.fallbackCount += 1
+            return _preprocess(ds, **self.arguments)
+
+        ds = ds.drop(self.dropBeforeTime)
+        ds = ds.rename(self.renames)
+        ds = mpas_xarray._parse_dataset_time(
+            ds=ds, inTimeVariableName=self.inTimeVariableName,
+            calendar=self.arguments['calendar'],
+            simulationStartTime=self.arguments['simulationStartTime'],
+            outTimeVariableName='Time', referenceDate='0001-01-01')
+        ds = ds.drop(self.dropAfterTime)
+
+        if self.arguments['selValues'] is not None:
+            ds = ds.sel(**self.arguments['selValues'])
+
+        if self.arguments['iselValues'] is not None:
+            ds = ds.isel(**self.arguments['iselValues'])
+
+        return ds  # }}}
+
+    def _compile(self, ds):  # {{{
+        """
+        Work out the time variable, renames and variables to drop from the
+        first file, preprocessing it as ``_preprocess`` would
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        timeVariableName = self.arguments['timeVariableName']
+        variableMap = self.arguments['variableMap']
+        variableList = self.arguments['variableList']
+
+        submap = variableMap
+        if variableMap is not None and timeVariableName in variableMap:
+            submap = variableMap.copy()
+            submap.pop(timeVariableName, None)
+            timeVariableName = _map_variable_name(timeVariableName, ds,
+                                                  variableMap)
+        self.inTimeVariableName = timeVariableName
+
+        renames = {}
+        if submap is not None:
+            renames = _get_renames(ds, submap)
+
+        dsRenamed = ds.rename(renames)
+        dsTime = mpas_xarray._parse_dataset_time(
+            ds=dsRenamed, inTimeVariableName=timeVariableName,
+            calendar=self.arguments['calendar'],
+            simulationStartTime=self.arguments['simulationStartTime'],
+            outTimeVariableName='Time', referenceDate='0001-01-01')
+        dsSubset = dsTime
+        if variableList is not None:
+            dsSubset = mpas_xarray.subset_variables(
+                dsTime, mpas_xarray._ensure_list(variableList))
+
+        mpas_xarray._assert_valid_selections(dsSubset,
+                                             self.arguments['selValues'],
+                                             self.arguments['iselValues'])
+
+        # variables are dropped before the times are decoded (and before
+        # renaming, using their names in the file) unless they are needed to
+        # compute the times or are created along with the time coordinate
+        timeNames = mpas_xarray._ensure_list(timeVariableName)
+        originalNames = dict([(newName, oldName) for oldName, newName in
+                              renames.items()])
+        dropNames = set(dsTime.variables) - set(dsSubset.variables)
+        dropBeforeTime = [name for name in dropNames if
+                          name in dsRenamed.variables and
+                          name not in timeNames]
+        self.dropAfterTime = sorted(dropNames - set(dropBeforeTime))
+        self.dropBeforeTime = sorted([originalNames.get(name, name) for
+                                      name in dropBeforeTime])
+        self.renames = dict([(oldName, newName) for oldName, newName in
+                             renames.items() if
+                             oldName not in self.dropBeforeTime])  # }}}
+
+# }}}
+
+
+def _schema_fingerprint(ds):  # {{{
+    """
+    A hash of the name, dimensions, type and shape (apart from ``Time``) of
+    each variable in a data set, which is the same for every file of a stream
+    unless its variables change
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    schema = []
+    for name, variable in ds.variables.items():
+        sizes = tuple([size for dim, size in zip(variable.dims, variable.shape)
+                       if dim != 'Time'])
+        schema.append((name, variable.dims, variable.dtype.str, sizes))
+    return hash(tuple(sorted(schema)))  # }}}
+
+
 def _map_variable_name(variableName, ds, variableMap):  # {{{
     """
     Given a `variableName` in a `variableMap` and an xarray `ds`,
@@ -407,6 +844,21 @@ def _rename_variables(ds, variableMap):  # {{{
     02/08/2017
     """
 
+    return ds.rename(_get_renames(ds, variableMap))  # }}}
+
+
+def _get_renames(ds, variableMap):  # {{{
+    """
+    Given an `xarray.DataSet` object `ds` and a dictionary mapping
+    variable names `variableMap`, returns a dictionary of the variables in
+    `ds` with names equal to values in `variableMap` and the corresponding
+    keys they should be renamed to.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
     renameDict = {}
     for datasetVariable in ds.data_vars:
         for mapVariable in variableMap:
@@ -415,7 +867,7 @@ def _rename_variables(ds, variableMap):  # {{{
                 renameDict[datasetVariable] = mapVariable
                 break
 
-    return ds.rename(renameDict)  # }}}
+    return renameDict  # }}}
 
 
 # vim: ai ts=4 sts=4 et sw=4 ft=python
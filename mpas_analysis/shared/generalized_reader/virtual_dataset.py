@@ -0,0 +1,539 @@
+"""
+A reader that presents a set of MPAS history files as a single lazy data set
+without opening and preprocessing every file with ``xarray.open_mfdataset``.
+The variables, dimensions and data types are read from the first file and
+only the time variables are read from the others (by several processes at
+once, so the latency of opening each file is hidden).  The time index (with
+repeated times removed and sliced to the requested dates) is built from these
+times.  Selections of other dimensions (e.g. a single vertical level) are
+turned into a hyperslab of each variable in each file, so each read goes
+straight to the file and hyperslab containing the data and nothing else is
+read.  Files are opened through the process-wide pool of open files, so the
+files read most recently stay open without exceeding the limit on open files.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import datetime
+import multiprocessing
+from itertools import groupby
+
+import numpy
+import xarray
+import dask.array
+
+from .generalized_reader import get_open_file_limit, _map_variable_name, \
+    _apply_chunking
+from .file_pool import get_file_pool
+from ..mpas_xarray import mpas_xarray
+from ..mpas_xarray.mpas_xarray import _parse_dataset_time
+from ..timekeeping.utility import string_to_days_since_date, \
+    days_to_datetime, datetime_to_days
+from ..timekeeping.time_table import add_time_table_coords
+from ..performance import record_phase, record_files_opened, \
+    record_bytes_requested
+
+# the times in each file that have already been read in this process, indexed
+# by the file name, size, modification time and the options used to compute
+# the times, so the time index only needs to be updated for new files
+_timeCache = {}
+
+
+@record_phase('load')
+def open_virtual_dataset(fileNames, calendar, config,
+                         simulationStartTime=None,
+                         timeVariableName='Time',
+                         variableList=None, selValues=None,
+                         iselValues=None, variableMap=None,
+                         startDate=None, endDate=None,
+                         chunking=None):  # {{{
+    """
+    Opens and returns a lazy xarray data set given file name(s) and the MPAS
+    calendar name.  The arguments, return value and exceptions are the same
+    as ``generalized_reader.open_multifile_dataset``.  All files are assumed
+    to contain the same variables with the same dimensions (except ``Time``)
+    as the first file.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if isinstance(fileNames, str):
+        fileNames = [fileNames]
+
+    filePool = get_file_pool()
+    filePool.set_max_open_files(get_open_file_limit(config))
+
+    template = filePool.open(fileNames[0], checkForChanges=True)
+
+    # the MPAS name(s) of the time variable(s) and of each other variable
+    inTimeVariableName = timeVariableName
+    submap = variableMap
+    if variableMap is not None and timeVariableName in variableMap:
+        submap = variableMap.copy()
+        submap.pop(timeVariableName, None)
+        inTimeVariableName = _map_variable_name(timeVariableName, template,
+                                                variableMap)
+    names = {}
+    for mpasName in template.data_vars:
+        name = mpasName
+        if submap is not None:
+            for mapName in submap:
+                if mpasName in submap[mapName]:
+                    name = mapName
+                    break
+        names[name] = mpasName
+
+    if variableList is not None:
+        variableList = mpas_xarray._ensure_list(variableList)
+        missing = [name for name in variableList if name not in names]
+        if len(missing) == len(variableList):
+            raise ValueError(
+                'Empty dataset is returned.\n'
+                'Variables {}\n'
+                'are not found within the dataset '
+                'variables: {}.'.format(variableList, names.keys()))
+        names = dict([(name, names[name]) for name in variableList if
+                      name in names])
+
+    record_files_opened(len(fileNames))
+
+    # the times of each record in each file, read by no more processes than
+    # the number of files the task may have open
+    processCount = min(config.getWithDefault('input', 'fileOpenProcessCount',
+                                             default=8),
+                       get_open_file_limit(config))
+    fileTimes = _get_file_times(fileNames, inTimeVariableName, calendar,
+                                simulationStartTime, processCount)
+
+    records = _select_records(fileTimes, calendar, startDate, endDate)
+
+    coords = {}
+    for coordName in ['Time', 'startTime', 'endTime']:
+        if coordName in fileTimes[0]:
+            coords[coordName] = ('Time', numpy.array(
+                [fileTimes[fileIndex][coordName][recordIndex] for
+                 fileIndex, recordIndex in records]))
+
+    # the selections can only use the dimensions of the requested variables
+    dims = set(['Time'])
+    for mpasName in names.values():
+        dims.update(template.variables[mpasName].dims)
+    mpas_xarray._assert_valid_selections(xarray.Dataset(coords=dict(
+        [(dim, numpy.arange(2)) for dim in dims])), selValues, iselValues)
+
+    # selections of dimensions other than Time are turned into indices into
+    # each file, so only the needed hyperslab is read
+    indexers = _get_indexers(template, selValues, iselValues)
+
+    dataVars = {}
+    bytesRequested = 0
+    for name, mpasName in names.items():
+        variable = template.variables[mpasName]
+        (dims, data, readBytes) = _build_lazy_array(
+            fileNames, fileTimes, records, mpasName, variable, indexers)
+        dataVars[name] = xarray.Variable(dims, data, attrs=variable.attrs)
+        bytesRequested += readBytes
+
+    # the first file may have been closed while reading the times, so it is
+    # requested from the pool again
+    with filePool.lock:
+        template = filePool.open(fileNames[0])
+        for coordName in template.coords:
+            if coordName != 'Time':
+                coordIndexers = dict([(dim, indexers[dim]) for dim in
+                                      template[coordName].dims
+                                      if dim in indexers])
+                coords[coordName] = \
+                    template[coordName].isel(**coordIndexers).load().variable
+
+    ds = xarray.Dataset(dataVars, coords=coords, attrs=template.attrs)
+    ds = add_time_table_coords(ds, calendar)
+
+    record_bytes_requested(bytesRequested)
+
+    # selections of Time apply to the concatenated data set
+    if selValues is not None and 'Time' in selValues:
+        ds = ds.sel(Time=selValues['Time'])
+
+    if iselValues is not None and 'Time' in iselValues:
+        ds = ds.isel(Time=iselValues['Time'])
+
+    ds = _apply_chunking(ds, config, chunking)
+
+    return ds  # }}}
+
+
+def _get_file_times(fileNames, inTimeVariableName, calendar,
+                    simulationStartTime, processCount):  # {{{
+    """
+    Get the time coordinate of each record in each file in days since
+    0001-01-01, from the cache or by reading the time variable(s) of the files
+    that haven't been read yet in a pool of processes
+
+    Returns
+    -------
+    fileTimes : list of dict of numpy.ndarray
+        The ``Time`` of each record in each file and, if there is a start and
+        end time variable, the ``startTime`` and ``endTime``, in the same order
+        as ``fileNames``
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    keys = []
+    for fileName in fileNames:
+        fileStat = os.stat(fileName)
+        keys.append((fileName, fileStat.st_size, fileStat.st_mtime,
+                     str(inTimeVariableName), calendar, simulationStartTime))
+
+    missing = [index for index, key in enumerate(keys) if
+               key not in _timeCache]
+    processCount = min(processCount, len(missing))
+    if multiprocessing.current_process().daemon:
+        # daemonic processes are not allowed to have children
+        processCount = 1
+
+    if processCount > 1:
+        # the worker processes open (and close) the files themselves, rather
+        # than using the copy of this process' pool of open files
+        arguments = [(fileNames[index], inTimeVariableName, calendar,
+                      simulationStartTime, False) for index in missing]
+        pool = multiprocessing.Pool(processCount)
+        try:
+            # map returns the results in the order of the files, so the time
+            # index doesn't depend on which process finishes first
+            results = pool.map(_read_file_times, arguments)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        # the files are opened through the pool, so the most recent ones are
+        # still open when the data is read
+        arguments = [(fileNames[index], inTimeVariableName, calendar,
+                      simulationStartTime, True) for index in missing]
+        results = [_read_file_times(argument) for argument in arguments]
+
+    for index, times in zip(missing, results):
+        _timeCache[keys[index]] = times
+
+    return [_timeCache[key] for key in keys]  # }}}
+
+
+def _read_file_times(arguments):  # {{{
+    """
+    Read the time variable(s) from a file and compute the time coordinate of
+    each record.  The arguments are a single tuple so this function can be
+    mapped over a pool of processes.  The file is opened through the pool of
+    open files only if ``usePool`` is ``True``.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    (fileName, inTimeVariableName, calendar, simulationStartTime,
+     usePool) = arguments
+
+    if isinstance(inTimeVariableName, (list, tuple)):
+        mpasTimeNames = list(inTimeVariableName)
+    else:
+        mpasTimeNames = [inTimeVariableName]
+
+    if usePool:
+        filePool = get_file_pool()
+        with filePool.lock:
+            dsTime = filePool.open(fileName, checkForChanges=True)[
+                mpasTimeNames].load()
+    else:
+        with xarray.open_dataset(fileName, decode_times=False) as ds:
+            dsTime = ds[mpasTimeNames].load()
+
+    dsTime = _parse_dataset_time(ds=dsTime,
+                                 inTimeVariableName=inTimeVariableName,
+                                 calendar=calendar,
+                                 simulationStartTime=simulationStartTime,
+                                 outTimeVariableName='Time',
+                                 referenceDate='0001-01-01')
+
+    times = {}
+    for coordName in ['Time', 'startTime', 'endTime']:
+        if coordName in dsTime.coords:
+            times[coordName] = dsTime.coords[coordName].values
+
+    return times  # }}}
+
+
+def _select_records(fileTimes, calendar, startDate, endDate):  # {{{
+    """
+    Find the file and record index of each time in the data set, removing
+    repeated times (keeping the first) and times outside of the start and end
+    dates.  Either date may be ``None``, in which case the range is open at
+    that end.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    # keep the dates as they were given for the error message
+    dates = (startDate, endDate)
+    startDate = _date_to_days(startDate, calendar)
+    endDate = _date_to_days(endDate, calendar)
+
+    records = []
+    uniqueTimes = set()
+    for fileIndex, times in enumerate(fileTimes):
+        for recordIndex, time in enumerate(times['Time']):
+            if time in uniqueTimes:
+                continue
+            uniqueTimes.add(time)
+            if startDate is not None and time < startDate:
+                continue
+            if endDate is not None and time > endDate:
+                continue
+            records.append((fileIndex, recordIndex))
+
+    if len(records) == 0:
+        dateStrings = []
+        for date in dates:
+            if isinstance(date, (int, long, float)):
+                date = days_to_datetime(date, calendar=calendar)
+            dateStrings.append(date)
+        raise ValueError('The data set contains no Time entries between '
+                         'dates\n{} and {}.'.format(*dateStrings))
+    return records  # }}}
+
+
+def _date_to_days(date, calendar):  # {{{
+    """
+    Convert a date string or ``datetime.datetime`` to days since 0001-01-01,
+    leaving numbers of days and ``None`` as they are
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if isinstance(date, str):
+        date = string_to_days_since_date(dateString=date, calendar=calendar)
+    elif isinstance(date, datetime.datetime):
+        date = datetime_to_days(date, calendar=calendar)
+    return date  # }}}
+
+
+def _get_indexers(template, selValues, iselValues):  # {{{
+    """
+    Convert the selections of dimensions other than ``Time`` into integers,
+    slices or arrays of indices along each dimension
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    indexers = {}
+    if iselValues is not None:
+        for dim, index in iselValues.items():
+            if dim != 'Time':
+                indexers[dim] = index
+
+    if selValues is not None:
+        for dim, value in selValues.items():
+            if dim == 'Time':
+                continue
+            # find the indices the same way xarray would, by selecting from
+            # an array of positions along the dimension
+            positions = xarray.DataArray(
+                numpy.arange(template.dims[dim]), dims=[dim])
+            if dim in template.coords:
+                positions.coords[dim] = template.coords[dim]
+            indices = positions.sel(**{dim: value}).values
+            if indices.ndim == 0:
+                indices = int(indices)
+            indexers[dim] = indices
+
+    return indexers  # }}}
+
+
+def _build_lazy_array(fileNames, fileTimes, records, mpasName, variable,
+                      indexers):  # {{{
+    """
+    Build a dask array that reads a variable from the files containing the
+    selected records only when it is computed, reading only the hyperslab
+    given by the indexers (and the selected records) from each file
+
+    Returns
+    -------
+    dims : tuple of str
+        The dimensions of the array, without those selected with an integer
+
+    data : ``dask.array.Array``
+        The lazy array
+
+    readBytes : int
+        The number of bytes that will be read from the files
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    dims = tuple([dim for dim in variable.dims if
+                  not _is_integer_index(indexers.get(dim))])
+
+    if 'Time' not in variable.dims:
+        # the variable is the same in every file, so read it from the first
+        virtualVariable = _VirtualVariable(fileNames[0], mpasName,
+                                           variable.dims, variable.shape,
+                                           variable.dtype, indexers)
+        data = dask.array.from_array(
+            virtualVariable, chunks=virtualVariable.shape,
+            name='virtual-{}-{}-{}'.format(fileNames[0], mpasName,
+                                           virtualVariable.token),
+            lock=get_file_pool().lock)
+        return dims, data, virtualVariable.readBytes
+
+    timeAxis = dims.index('Time')
+    pieces = []
+    readBytes = 0
+    for fileIndex, fileRecords in groupby(records,
+                                          key=lambda record: record[0]):
+        fileIndexers = dict(indexers)
+        fileIndexers['Time'] = numpy.array(
+            [recordIndex for index, recordIndex in fileRecords])
+        shape = list(variable.shape)
+        shape[variable.dims.index('Time')] = \
+            len(fileTimes[fileIndex]['Time'])
+        fileName = fileNames[fileIndex]
+        virtualVariable = _VirtualVariable(fileName, mpasName, variable.dims,
+                                           shape, variable.dtype,
+                                           fileIndexers)
+        pieces.append(dask.array.from_array(
+            virtualVariable, chunks=virtualVariable.shape,
+            name='virtual-{}-{}-{}'.format(fileName, mpasName,
+                                           virtualVariable.token),
+            lock=get_file_pool().lock))
+        readBytes += virtualVariable.readBytes
+
+    return dims, dask.array.concatenate(pieces, axis=timeAxis), readBytes
+    # }}}
+
+
+def _is_integer_index(index):  # {{{
+    """
+    Whether an index selects a single entry (and removes the dimension)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    return index is not None and numpy.ndim(index) == 0 and \
+        not isinstance(index, slice)  # }}}
+
+
+class _VirtualVariable(object):  # {{{
+    """
+    A hyperslab of a variable in a single file that is only read (through the
+    pool of open files) when it is indexed
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, fileName, variableName, dims, fileShape, dtype,
+                 indexers):  # {{{
+        """
+        Find the hyperslab to read and the shape of the selected array
+
+        Parameters
+        ----------
+        fileName : str
+            The file containing the variable
+
+        variableName : str
+            The name of the variable in the file
+
+        dims : tuple of str
+            The dimensions of the variable
+
+        fileShape : tuple of int
+            The shape of the variable in the file
+
+        dtype : numpy.dtype
+            The data type of the variable (after decoding)
+
+        indexers : dict
+            Integers, slices or arrays of indices along some dimensions.  An
+            array of indices is read as the smallest slice that contains them.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.fileName = fileName
+        self.variableName = variableName
+        self.dtype = dtype
+
+        # the key used to read the hyperslab from the file and the arrays of
+        # indices (if any) into the hyperslab along each remaining axis
+        readKey = []
+        self.takeIndices = []
+        shape = []
+        readShape = []
+        for dim, size in zip(dims, fileShape):
+            index = indexers.get(dim, slice(None))
+            if isinstance(index, slice):
+                start, stop, step = index.indices(size)
+                readKey.append(slice(start, stop, step))
+                length = len(xrange(start, stop, step))
+                readShape.append(length)
+                shape.append(length)
+                self.takeIndices.append(None)
+                continue
+
+            index = numpy.asarray(index)
+            if index.dtype == bool:
+                index = numpy.nonzero(index)[0]
+            index = numpy.where(index < 0, index + size, index)
+            if index.ndim == 0:
+                readKey.append(int(index))
+                continue
+
+            first = int(index.min())
+            last = int(index.max())
+            readKey.append(slice(first, last + 1))
+            readShape.append(last + 1 - first)
+            shape.append(len(index))
+            if numpy.array_equal(index, numpy.arange(first, last + 1)):
+                self.takeIndices.append(None)
+            else:
+                self.takeIndices.append(index - first)
+
+        self.readKey = tuple(readKey)
+        self.shape = tuple(shape)
+        self.ndim = len(shape)
+        self.readBytes = int(numpy.prod(readShape))*numpy.dtype(dtype).itemsize
+        # a unique name for the hyperslab, so dask doesn't confuse different
+        # selections of the same variable
+        self.token = abs(hash(repr((self.readKey, [None if indices is None
+                                                   else indices.tolist()
+                                                   for indices in
+                                                   self.takeIndices]))))
+        # }}}
+
+    def __getitem__(self, key):  # {{{
+        filePool = get_file_pool()
+        with filePool.lock:
+            ds = filePool.open(self.fileName)
+            data = ds.variables[self.variableName][self.readKey].values
+
+        for axis, indices in enumerate(self.takeIndices):
+            if indices is not None:
+                data = numpy.take(data, indices, axis=axis)
+
+        return data[key]  # }}}
+
+# }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -5,7 +5,6 @@ import socket
 import subprocess
 import datetime
 from lxml import etree
-from PIL import Image
 
 from ..io.utility import build_config_full_path
 
@@ -174,6 +173,10 @@ def _generate_thumbnails(imageFileName, directory):
     and one with a fixed size. Note: The sizes are hard-coded to be consistent
     with the css template.  (They are displayed at 2/3 full size.)
     """
+    # PIL is only needed when images are written, so it isn't imported when
+    # MPAS-Analysis starts up
+    from PIL import Image
+
     # thumbnails with fixed size
     fixedWidth = 480
     fixedHeight = 360
@@ -5,6 +5,7 @@ from lxml import etree
 from collections import OrderedDict
 
 from ..io.utility import build_config_full_path
+from ..performance import read_performance_reports, format_duration
 
 
 def generate_html(config, analyses):  # {{{
@@ -58,6 +59,18 @@ def generate_html(config, analyses):  # {{{
         page.add_component(componentName, component.subdirectory,
                            firstImageFileName)
 
+    # add a summary of the performance of each stage and task
+    names = []
+    for analysisTask in analyses:
+        for stage in analysisTask.stages:
+            if stage.stageName not in names:
+                names.append(stage.stageName)
+        names.append(analysisTask.taskName)
+    logsDirectory = build_config_full_path(config, 'output',
+                                           'logsSubdirectory')
+    page.add_performance(read_performance_reports(
+        '{}/performance'.format(logsDirectory), names))
+
     page.generate()  # }}}
 
 
@@ -114,6 +127,9 @@ class MainPage(object):
         # start with no components
         self.components = OrderedDict()
 
+        # and no performance reports
+        self.performanceReports = []
+
     def add_component(self, name, subdirectory, imageFileName):
         """
         Create a MainPage object, reading in the templates
@@ -140,6 +156,22 @@ class MainPage(object):
         self.components[name] = {'subdirectory': subdirectory,
                                  'imageFileName': imageFileName}
 
+    def add_performance(self, performanceReports):
+        """
+        Add a table summarizing the performance of tasks to the main page
+
+        Parameters
+        ----------
+        performanceReports : list of dict
+            Performance reports (as written by ``PerformanceRecorder``) for
+            each task and stage
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.performanceReports = performanceReports
+
     def generate(self):
         """
         Generate the webpage from templates and components, and write it out to
@@ -166,7 +198,9 @@ class MainPage(object):
                 _replace_tempate_text(self.componentTemplate, replacements)
 
         replacements = {'@runName': runName,
-                        '@components': componentsText}
+                        '@components': componentsText,
+                        '@performance': _get_performance_text(
+                            self.performanceReports)}
 
         pageText = _replace_tempate_text(self.pageTemplate, replacements)
 
@@ -503,6 +537,56 @@ class ComponentPage(object):
         return quickLinkText
 
 
+def _get_performance_text(performanceReports):
+    """
+    Build an HTML table summarizing the performance of each task and stage
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if len(performanceReports) == 0:
+        return ''
+
+    bytesPerGB = 1024.**3
+    headings = ['Task', 'Status', 'Wall time', 'CPU time', 'Peak memory (GB)',
+                'Read, all I/O (GB)', 'Files opened', 'File pool hits/misses',
+                'Phases (wall time)']
+    headingText = ''.join(['<th>{}</th>'.format(heading) for heading in
+                           headings])
+    text = '    <div class="gallery-title">\n' \
+           '    <h2>Performance</h2>\n' \
+           '    </div>\n' \
+           '    <table class="performance">\n' \
+           '      <tr>{}</tr>\n'.format(headingText)
+    for report in performanceReports:
+        if report['success']:
+            status = 'success'
+        else:
+            status = 'failed'
+        phases = ', '.join(['{} {}'.format(phaseName,
+                                           format_duration(phase['wallTime']))
+                            for phaseName, phase in report['phases'].items()])
+        if report['peakRSS'] is None:
+            # the peak was set by an earlier task in the same process
+            peakMemory = '-'
+        else:
+            peakMemory = '{:.2f}'.format(report['peakRSS']/bytesPerGB)
+        entries = [report['name'], status,
+                   format_duration(report['wallTime']),
+                   format_duration(report['cpuTime']),
+                   peakMemory,
+                   '{:.2f}'.format(report['bytesRead']/bytesPerGB),
+                   '{}'.format(report['filesOpened']),
+                   '{}/{}'.format(report.get('fileHandleHits', 0),
+                                  report.get('fileHandleMisses', 0)),
+                   phases]
+        text = text + '      <tr>{}</tr>\n'.format(
+            ''.join(['<td>{}</td>'.format(entry) for entry in entries]))
+    text = text + '    </table>\n'
+    return text
+
+
 def _replace_tempate_text(template, replacements):
     """
     replace substrings in a given template based on a dictionary of
@@ -24,6 +24,7 @@ import sys
 
 from ..grid import MpasMeshDescriptor, LatLonGridDescriptor, \
     ProjectionGridDescriptor
+from ..performance import record_phase
 
 
 class Remapper(object):
@@ -88,6 +89,7 @@ class Remapper(object):
 
         # }}}
 
+    @record_phase('mapping')
     def build_mapping_file(self, method='bilinear',
                            additionalArgs=None):  # {{{
         '''
@@ -172,6 +174,7 @@ class Remapper(object):
 
         # }}}
 
+    @record_phase('remap')
     def remap_file(self, inFileName, outFileName, variableList=None,
                    overwrite=False, renormalize=None):  # {{{
         '''
@@ -277,6 +280,7 @@ class Remapper(object):
 
         subprocess.check_call(args)  # }}}
 
+    @record_phase('remap')
     def remap(self, ds, renormalizationThreshold=None):  # {{{
         '''
         Given a source data set, returns a remapped version of the data set,
@@ -1,3 +1,4 @@
 from .namelist_streams_interface import NameList, StreamsFile
+from .run_context import RunContext, runContext
 from .utility import paths
 from .write_netcdf import write_netcdf
\ No newline at end of file
@@ -11,9 +11,11 @@ Phillip Wolfram, Xylar Asay-Davis
 from lxml import etree
 import re
 import os.path
+import bisect
 
 from ..containers import ReadOnlyDict
 from .utility import paths
+from .stream_index import StreamIndex, select_files_by_time
 from ..timekeeping.utility import string_to_datetime
 
 
@@ -143,11 +145,14 @@ class StreamsFile:
     Phillip Wolfram, Xylar Asay-Davis
     """
 
-    def __init__(self, fname, streamsdir=None):
+    def __init__(self, fname, streamsdir=None, indexDirectory=None):
         """
         parse the streams file given by fname. If the optional argument
         streamsdir is provided, it is the base path to both the output streams
         data and the sreams file (the latter only if fname is a relative path).
+        If indexDirectory is provided, a persistent index of the times in each
+        file produced by a stream is kept there and used to select files by
+        date.
         """
         if not os.path.isabs(fname) and streamsdir is not None:
             # only the file name was given, not the absolute path, and
@@ -167,6 +172,13 @@ class StreamsFile:
         else:
             self.streamsdir = streamsdir
 
+        self.indexDirectory = indexDirectory
+
+        # the files produced by each stream, their dates and the times they
+        # contain (if indexed), sorted by date, so the file system is searched
+        # only once per stream
+        self.fileIndex = {}
+
     def read(self, streamname, attribname):
         """ name is a list of name entries terminanting in some value
         """
@@ -192,9 +204,10 @@ class StreamsFile:
             String or datetime.datetime objects identifying the beginning
             and end dates to be found.
 
-            Note: a buffer of one output interval is subtracted from startDate
-            and added to endDate because the file date might be the first
-            or last date contained in the file (or anything in between).
+            If the streams file has an ``indexDirectory``, files are selected
+            if they contain any times in this range (read from the files
+            themselves).  Otherwise, files are selected if the date in their
+            file names is in this range.
 
         calendar: {'gregorian', 'gregorian_noleap'}, optional
             The name of one of the calendars supported by MPAS cores, and is
@@ -215,6 +228,68 @@ class StreamsFile:
         ------
         Xylar Asay-Davis
         """
+        fileList, fileDates, timeBounds = self._get_file_index(streamName)
+
+        if (startDate is None) and (endDate is None):
+            return list(fileList)
+
+        if fileDates is None:
+            # there is no date in the template, so we can't exclude any files
+            # based on date
+            return list(fileList)
+
+        if isinstance(startDate, str):
+            startDate = string_to_datetime(startDate)
+        if isinstance(endDate, str):
+            endDate = string_to_datetime(endDate)
+
+        if timeBounds is not None:
+            return select_files_by_time(fileList, timeBounds, startDate,
+                                        endDate)
+
+        startIndex = 0
+        if startDate is not None:
+            startIndex = bisect.bisect_left(fileDates, startDate)
+
+        endIndex = len(fileList)
+        if endDate is not None:
+            endIndex = bisect.bisect_right(fileDates, endDate)
+
+        return fileList[startIndex:endIndex]
+
+    def _get_file_index(self, streamName):
+        """
+        Search the file system for the files produced by a stream (only the
+        first time the stream is queried) and returns the files, their dates
+        and the times they contain, sorted by date
+
+        Returns
+        -------
+        fileList : list of str
+            The files produced by the stream, sorted by date if the template
+            contains a date
+
+        fileDates : list of datetime.datetime or None
+            The sorted date of each file, or ``None`` if there is no date in
+            the file template
+
+        timeBounds : list of tuple or None
+            The first and last time (``datetime.datetime``) in each file, or
+            ``None`` if there is no ``indexDirectory`` or no date in the file
+            template
+
+        Raises
+        ------
+        ValueError
+            If no files from the stream are found.
+
+        Author
+        ------
+        Xylar Asay-Davis
+        """
+        if streamName in self.fileIndex:
+            return self.fileIndex[streamName]
+
         template = self.read(streamName, 'filename_template')
         if template is None:
             raise ValueError('Stream {} not found in streams file {}.'.format(
@@ -242,44 +317,75 @@ class StreamsFile:
                 "Path {} in streams file {} for '{}' not found.".format(
                     path, self.fname, streamName))
 
-        if (startDate is None) and (endDate is None):
-            return fileList
+        fileDates = self.get_file_dates(streamName, fileList)
+        timeBounds = None
+        if None in fileDates:
+            fileDates = None
+        else:
+            index = sorted(zip(fileDates, fileList))
+            fileDates = [fileDate for fileDate, fileName in index]
+            fileList = [fileName for fileDate, fileName in index]
+
+            if self.indexDirectory is not None:
+                streamIndex = StreamIndex('{}/{}.{}.json'.format(
+                    self.indexDirectory, os.path.basename(self.fname),
+                    streamName))
+                timeBounds = streamIndex.update(fileList, fileDates)
+                streamIndex.write()
+                index = sorted(zip(timeBounds, fileDates, fileList))
+                timeBounds = [bounds for bounds, fileDate, fileName in index]
+                fileDates = [fileDate for bounds, fileDate, fileName in index]
+                fileList = [fileName for bounds, fileDate, fileName in index]
+
+        self.fileIndex[streamName] = (fileList, fileDates, timeBounds)
+        return fileList, fileDates, timeBounds
+
+    def get_file_dates(self, streamName, fileList):
+        """
+        Given the name of a stream and a list of files produced by that
+        stream, returns the date of each file, parsed from the file name
+        using the file template in the stream.
 
-        if startDate is not None:
-            # read one extra file before the start date to be on the safe side
-            if isinstance(startDate, str):
-                startDate = string_to_datetime(startDate)
+        Parameters
+        ----------
+        streamName : string
+            The name of a stream that produced the files
 
-        if endDate is not None:
-            # read one extra file after the end date to be on the safe side
-            if isinstance(endDate, str):
-                endDate = string_to_datetime(endDate)
+        fileList : list of str
+            A list of file names produced by the stream (e.g. returned by
+            ``readpath``)
+
+        Returns
+        -------
+        fileDates : list of datetime.datetime
+            The date of each file, or ``None`` for each file if there is no
+            date in the file template
+
+        Author
+        ------
+        Xylar Asay-Davis
+        """
+        template = self.read(streamName, 'filename_template')
+        if template is None:
+            raise ValueError('Stream {} not found in streams file {}.'.format(
+                streamName, self.fname))
 
         # remove any path that's part of the template
         template = os.path.basename(template)
         dateStartIndex = template.find('$')
         if dateStartIndex == -1:
-            # there is no date in the template, so we can't exclude any files
-            # based on date
-            return fileList
+            return [None for fileName in fileList]
         dateEndOffset = len(template) - (template.rfind('$')+2)
 
-        outFileList = []
+        fileDates = []
         for fileName in fileList:
-            # get just the
+            # get just the date part of the file name
             baseName = os.path.basename(fileName)
             dateEndIndex = len(baseName) - dateEndOffset
             fileDateString = baseName[dateStartIndex:dateEndIndex]
-            fileDate = string_to_datetime(fileDateString)
-            add = True
-            if startDate is not None and startDate > fileDate:
-                add = False
-            if endDate is not None and endDate < fileDate:
-                add = False
-            if add:
-                outFileList.append(fileName)
-
-        return outFileList
+            fileDates.append(string_to_datetime(fileDateString))
+
+        return fileDates
 
     def has_stream(self, streamName):
         """
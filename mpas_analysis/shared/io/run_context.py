@@ -0,0 +1,177 @@
+"""
+A run context shared by the analysis tasks set up in the same process, so
+each namelist and streams file is parsed only once and the files produced by
+each stream are only searched for once, no matter how many tasks use them.
+The run context (along with the config options, after tasks have adjusted
+them during setup) can be written to a file so that subtasks use the same
+config options and input files as the process that launched them.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import cPickle as pickle
+
+from .namelist_streams_interface import NameList, StreamsFile
+
+
+class RunContext(object):  # {{{
+    """
+    Memoized ``NameList`` and ``StreamsFile`` objects, indexed by the file
+    they were read from (and the directory the streams point to)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self):  # {{{
+        """
+        Create an empty run context
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.namelists = {}
+        self.streams = {}  # }}}
+
+    def get_namelist(self, fileName):  # {{{
+        """
+        Returns the parsed namelist file, reading it the first time it is
+        requested
+
+        Parameters
+        ----------
+        fileName : str
+            The path to the namelist file
+
+        Returns
+        -------
+        namelist : ``NameList`` object
+            The namelist, which must not be modified since it is shared
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        key = os.path.abspath(fileName)
+        if key not in self.namelists:
+            self.namelists[key] = NameList(fileName)
+        return self.namelists[key]  # }}}
+
+    def get_streams_file(self, fileName, streamsdir=None,
+                         indexDirectory=None):  # {{{
+        """
+        Returns the parsed streams file, reading it the first time it is
+        requested.  Each stream's files are searched for on the first call to
+        ``readpath`` for that stream and kept in a sorted index, so later date
+        range queries (e.g. by other tasks) don't touch the file system.
+
+        Parameters
+        ----------
+        fileName : str
+            The path to the streams file
+
+        streamsdir : str, optional
+            The directory that the paths in the streams file are relative to
+
+        indexDirectory : str, optional
+            The directory for persistent indices of the times in the files
+            produced by each stream
+
+        Returns
+        -------
+        streams : ``StreamsFile`` object
+            The streams file, which must not be modified since it is shared
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        key = (os.path.abspath(fileName), streamsdir, indexDirectory)
+        if key not in self.streams:
+            self.streams[key] = StreamsFile(fileName, streamsdir=streamsdir,
+                                            indexDirectory=indexDirectory)
+        return self.streams[key]  # }}}
+
+    def clear(self):  # {{{
+        """
+        Forget all namelists, streams files and stream indices, e.g. because
+        the simulation has written more output
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.namelists = {}
+        self.streams = {}  # }}}
+
+    def write(self, fileName, config):  # {{{
+        """
+        Write the config options and the files found for each stream to a
+        file, making sure other processes never see a partially written file
+
+        Parameters
+        ----------
+        fileName : str
+            The file to write to
+
+        config :  instance of MpasAnalysisConfigParser
+            Contains configuration options, including any that were changed
+            during the setup of analysis tasks (e.g. the climatology years)
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        fileIndices = dict([(key, streams.fileIndex) for key, streams in
+                            self.streams.items()])
+        tempFileName = '{}.{}.tmp'.format(fileName, os.getpid())
+        with open(tempFileName, 'wb') as outFile:
+            pickle.dump({'config': config, 'fileIndices': fileIndices},
+                        outFile, pickle.HIGHEST_PROTOCOL)
+        os.rename(tempFileName, fileName)  # }}}
+
+    def read(self, fileName):  # {{{
+        """
+        Replace this run context with one written by ``write`` (typically
+        by the process that launched this one), so streams return the same
+        files without searching the file system
+
+        Parameters
+        ----------
+        fileName : str
+            The file to read from
+
+        Returns
+        -------
+        config :  instance of MpasAnalysisConfigParser
+            The config options of the process that wrote the run context
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        with open(fileName, 'rb') as inFile:
+            data = pickle.load(inFile)
+
+        self.clear()
+        for (streamsFileName, streamsdir, indexDirectory), fileIndex in \
+                data['fileIndices'].items():
+            streams = self.get_streams_file(streamsFileName,
+                                            streamsdir=streamsdir,
+                                            indexDirectory=indexDirectory)
+            streams.fileIndex = fileIndex
+
+        return data['config']  # }}}
+
+# }}}
+
+
+# the run context shared by all tasks set up in this process
+runContext = RunContext()
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,213 @@
+"""
+A persistent index of the files produced by a stream and the times each file
+actually contains, read once from each file and updated as new files appear,
+so that the files needed for a range of dates can be selected exactly.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import json
+import bisect
+
+import netCDF4
+
+from .utility import make_directories
+from ..timekeeping.utility import string_to_datetime
+
+# pairs of variables giving the first and last times in a file, in the order
+# they are searched for
+timeVariableNames = [('xtime_startMonthly', 'xtime_endMonthly'),
+                     ('xtime_startDaily', 'xtime_endDaily'),
+                     ('xtime_start', 'xtime_end'),
+                     ('xtime', 'xtime')]
+
+
+class StreamIndex(object):  # {{{
+    """
+    The size, modification time and time bounds of each file produced by a
+    stream, stored in a JSON file
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, fileName):  # {{{
+        """
+        Read the index, if the file exists
+
+        Parameters
+        ----------
+        fileName : str
+            The JSON file containing the index
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.fileName = fileName
+        self.entries = {}
+        self.changed = False
+        if os.path.exists(fileName):
+            with open(fileName) as inFile:
+                try:
+                    self.entries = json.load(inFile)
+                except ValueError:
+                    # the file is corrupt, so start over
+                    self.entries = {}  # }}}
+
+    def update(self, fileList, fileDates):  # {{{
+        """
+        Update the index with the given files, reading the time bounds of any
+        file that is new or has changed since it was indexed, and removing
+        files that no longer exist
+
+        Parameters
+        ----------
+        fileList : list of str
+            The files produced by the stream
+
+        fileDates : list of datetime.datetime
+            The date of each file from its name, used as both time bounds if
+            the times in the file can't be read
+
+        Returns
+        -------
+        timeBounds : list of tuple
+            The first and last time (``datetime.datetime``) in each file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        entries = {}
+        timeBounds = []
+        for fileName, fileDate in zip(fileList, fileDates):
+            fileStat = os.stat(fileName)
+            entry = self.entries.get(fileName)
+            if entry is None or entry['size'] != fileStat.st_size or \
+                    entry['mtime'] != fileStat.st_mtime:
+                (startTime, endTime) = _read_time_bounds(fileName)
+                entry = {'size': fileStat.st_size,
+                         'mtime': fileStat.st_mtime,
+                         'startTime': startTime,
+                         'endTime': endTime}
+                self.changed = True
+            entries[fileName] = entry
+            bounds = (fileDate, fileDate)
+            if entry['startTime'] is not None:
+                try:
+                    bounds = (string_to_datetime(entry['startTime']),
+                              string_to_datetime(entry['endTime']))
+                except ValueError:
+                    # the times in the file aren't dates we can use
+                    pass
+            timeBounds.append(bounds)
+
+        if len(entries) != len(self.entries):
+            self.changed = True
+        self.entries = entries
+        return timeBounds  # }}}
+
+    def write(self):  # {{{
+        """
+        Write the index if it has changed, making sure other processes never
+        see a partially written file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if not self.changed:
+            return
+        make_directories(os.path.dirname(os.path.abspath(self.fileName)))
+        tempFileName = '{}.{}.tmp'.format(self.fileName, os.getpid())
+        with open(tempFileName, 'w') as outFile:
+            json.dump(self.entries, outFile, indent=1, sort_keys=True)
+        os.rename(tempFileName, self.fileName)
+        self.changed = False  # }}}
+
+# }}}
+
+
+def select_files_by_time(fileList, timeBounds, startDate, endDate):  # {{{
+    """
+    Select the files containing times between the start and end dates
+
+    Parameters
+    ----------
+    fileList : list of str
+        The files, sorted by their first time
+
+    timeBounds : list of tuple
+        The first and last time (``datetime.datetime``) in each file, sorted
+
+    startDate, endDate : datetime.datetime or None
+        The first and last dates to include, or ``None`` for no limit
+
+    Returns
+    -------
+    fileList : list of str
+        The files with times between ``startDate`` and ``endDate``.  A file
+        whose time interval ends exactly at ``startDate`` (e.g. the previous
+        month of monthly averages) is not included.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    # the indices of files that may overlap the dates are found by bisection,
+    # since both the first and last times are sorted, then only the files at
+    # the edges need to be checked
+    startTimes = [bounds[0] for bounds in timeBounds]
+    endTimes = [bounds[1] for bounds in timeBounds]
+
+    startIndex = 0
+    if startDate is not None:
+        startIndex = bisect.bisect_left(endTimes, startDate)
+    endIndex = len(fileList)
+    if endDate is not None:
+        endIndex = bisect.bisect_right(startTimes, endDate)
+
+    selected = []
+    for index in range(startIndex, endIndex):
+        startTime, endTime = timeBounds[index]
+        if startDate is not None and endTime == startDate and \
+                startTime < endTime:
+            # the interval ends where the date range begins
+            continue
+        selected.append(fileList[index])
+    return selected  # }}}
+
+
+def _read_time_bounds(fileName):  # {{{
+    """
+    Read the first and last times in an MPAS file as strings, or ``None`` if
+    the file has no time variable or can't be read
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    try:
+        dataset = netCDF4.Dataset(fileName, 'r')
+    except (IOError, RuntimeError):
+        return (None, None)
+
+    bounds = (None, None)
+    for startName, endName in timeVariableNames:
+        if startName in dataset.variables and \
+                endName in dataset.variables and \
+                dataset.variables[startName].shape[0] > 0:
+            startTime = netCDF4.chartostring(
+                dataset.variables[startName][0])
+            endTime = netCDF4.chartostring(dataset.variables[endName][-1])
+            bounds = (str(startTime).strip(), str(endTime).strip())
+            break
+    dataset.close()
+    return bounds  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
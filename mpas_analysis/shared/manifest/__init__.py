@@ -0,0 +1,2 @@
+from .manifest import build_manifest, write_manifest, is_up_to_date, \
+    get_manifest_file_name
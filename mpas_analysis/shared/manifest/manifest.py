@@ -0,0 +1,152 @@
+"""
+Manifests recording the inputs, relevant config options and outputs of each
+analysis task, used to skip tasks whose outputs are already up to date when
+MPAS-Analysis is rerun.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import json
+from collections import OrderedDict
+
+from ..io.utility import build_config_full_path, make_directories
+
+
+def build_manifest(analysisTask):  # {{{
+    """
+    Build a manifest for a task from its input files, config options and
+    output files
+
+    Parameters
+    ----------
+    analysisTask : ``AnalysisTask`` object
+        A task whose ``setup_and_check`` method has been called
+
+    Returns
+    -------
+    manifest : OrderedDict
+        The task name, the path, size and modification time of each input
+        and output file, and the options in each relevant config section
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    config = analysisTask.config
+
+    configOptions = OrderedDict()
+    for section in analysisTask.get_config_sections():
+        if config.has_section(section):
+            configOptions[section] = OrderedDict(
+                sorted(config.items(section, raw=True)))
+
+    manifest = OrderedDict()
+    manifest['taskName'] = analysisTask.taskName
+    manifest['inputs'] = get_file_info(analysisTask.get_input_files())
+    manifest['config'] = configOptions
+    manifest['outputs'] = get_file_info(analysisTask.get_output_files())
+    return manifest  # }}}
+
+
+def write_manifest(analysisTask):  # {{{
+    """
+    Write the manifest for a task that has run successfully
+
+    Parameters
+    ----------
+    analysisTask : ``AnalysisTask`` object
+        A task that has run successfully
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    manifest = build_manifest(analysisTask)
+    fileName = get_manifest_file_name(analysisTask.config,
+                                      analysisTask.taskName)
+    make_directories(os.path.dirname(fileName))
+    with open(fileName, 'w') as outFile:
+        json.dump(manifest, outFile, indent=2)  # }}}
+
+
+def is_up_to_date(analysisTask):  # {{{
+    """
+    Determine whether a task's outputs are up to date: the task has a
+    manifest from a previous run, its input files and config options haven't
+    changed since then and its output files are still there, unchanged.
+
+    Parameters
+    ----------
+    analysisTask : ``AnalysisTask`` object
+        A task whose ``setup_and_check`` method has been called
+
+    Returns
+    -------
+    upToDate : bool
+        Whether the task can be skipped
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    fileName = get_manifest_file_name(analysisTask.config,
+                                      analysisTask.taskName)
+    if not os.path.exists(fileName):
+        return False
+
+    with open(fileName) as inFile:
+        try:
+            previous = json.load(inFile)
+        except ValueError:
+            # the file is corrupt (e.g. partially written)
+            return False
+
+    outputFiles = analysisTask.get_output_files()
+    if len(outputFiles) == 0:
+        # no way to tell if the task has done its job
+        return False
+
+    current = build_manifest(analysisTask)
+
+    # a json round trip converts tuples to lists so the two can be compared
+    current = json.loads(json.dumps(current))
+
+    return current == previous  # }}}
+
+
+def get_manifest_file_name(config, taskName):  # {{{
+    """
+    Get the name of the manifest file for a task
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    manifestDirectory = build_config_full_path(config, 'output',
+                                               'manifestSubdirectory')
+    return '{}/{}.json'.format(manifestDirectory, taskName)  # }}}
+
+
+def get_file_info(fileNames):  # {{{
+    """
+    Get the path, size and modification time of each file (``None`` for the
+    size and modification time of files that don't exist)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    info = []
+    for fileName in fileNames:
+        path = os.path.abspath(fileName)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            info.append([path, stat.st_size, stat.st_mtime])
+        else:
+            info.append([path, None, None])
+    return info  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -2,8 +2,10 @@ import numpy as np
 import xarray
 from functools import partial
 
-from ..timekeeping.utility import string_to_days_since_date, \
-    string_to_datetime, days_to_datetime, datetime_to_days
+from ..timekeeping.utility import string_to_datetime
+from ..timekeeping.vectorized_calendar import char_array_to_days, \
+    days_to_dates, dates_to_days
+from ..performance import record_phase, record_files_opened
 
 """
 Utility functions for importing MPAS files into xarray.
@@ -23,6 +25,7 @@ Last modified
 """
 
 
+@record_phase('load')
 def open_multifile_dataset(fileNames, calendar,
                            simulationStartTime=None,
                            timeVariableName='xtime',
@@ -107,6 +110,8 @@ def open_multifile_dataset(fileNames, calendar,
                                  selValues=selValues,
                                  iselValues=iselValues)
 
+    record_files_opened(len(fileNames))
+
     ds = xarray.open_mfdataset(fileNames,
                                preprocess=preprocess_partial,
                                decode_times=False, concat_dim='Time')
@@ -492,12 +497,11 @@ def _parse_dataset_time(ds, inTimeVariableName, calendar,
         timeVar = ds[inTimeVariableName]
 
         if timeVar.dtype == '|S64':
-            # this is an array of date strings like 'xtime'
-            # convert to string
-            timeStrings = [''.join(xtime).strip() for xtime in timeVar.values]
-            days = string_to_days_since_date(dateString=timeStrings,
-                                             referenceDate=referenceDate,
-                                             calendar=calendar)
+            # this is an array of date strings like 'xtime', converted
+            # directly from its characters
+            days = char_array_to_days(timeChars=timeVar.values,
+                                      referenceDate=referenceDate,
+                                      calendar=calendar)
 
         elif timeVar.dtype == 'float64':
             # this array contains floating-point days like
@@ -512,12 +516,12 @@ def _parse_dataset_time(ds, inTimeVariableName, calendar,
                 days = timeVar.values
             else:
                 # a conversion may be required
-                dates = days_to_datetime(days=timeVar.values,
-                                         referenceDate=simulationStartTime,
-                                         calendar=calendar)
-                days = datetime_to_days(dates=dates,
-                                        referenceDate=referenceDate,
-                                        calendar=calendar)
+                (years, months, days, seconds) = days_to_dates(
+                    days=timeVar.values, referenceDate=simulationStartTime,
+                    calendar=calendar)
+                days = dates_to_days(years, months, days, seconds,
+                                     referenceDate=referenceDate,
+                                     calendar=calendar)
 
         elif timeVar.dtype == 'timedelta64[ns]':
             raise TypeError('timeVar of unsupported type {}.  This is likely because xarray.open_dataset \n'
@@ -0,0 +1,4 @@
+from .performance import PerformanceRecorder, start_recording, \
+    stop_recording, get_recorder, record_files_opened, \
+    record_bytes_requested, record_file_handles, performance_phase, \
+    record_phase, read_performance_reports, format_duration
@@ -0,0 +1,448 @@
+"""
+Utilities for recording the performance (wall-clock time, CPU time, peak
+memory and I/O) of analysis tasks and of phases (e.g. load, climatology,
+remap and plot) within each task.
+
+A recorder is started for each task or stage when it runs.  Shared functions
+(e.g. reading data sets, computing climatologies, remapping and plotting) are
+decorated with ``record_phase`` so their cost is added to the appropriate
+phase of the current task.  Phases do not nest: while a phase is being
+recorded, calls to other decorated functions count toward the outer phase.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import json
+import time
+import resource
+from collections import OrderedDict
+from functools import wraps
+from contextlib import contextmanager
+
+from ..io.utility import make_directories
+
+# the recorder for the task currently running in this process (if any)
+_currentRecorder = None
+
+# the processes in which a recorder has already been started
+_recordedProcesses = set()
+
+
+class PerformanceRecorder(object):  # {{{
+    """
+    Records the performance of a task and the phases within it.
+
+    Wall-clock time, CPU time (including that of child processes such as
+    ``ncclimo`` and ``ESMF_RegridWeightGen``) and bytes read are differences
+    between the start and end of the task or phase.  Bytes read come from
+    ``rchar`` in ``/proc/self/io`` (if available), so they count everything
+    read through system calls (pipes, imported modules and the page cache
+    as well as data files), not just the data read from MPAS files.
+
+    Peak RSS is the largest resident set size of this process so far (and of
+    any child process), since the operating system does not allow it to be
+    reset.  It is only the peak of the task itself if the task is the first
+    one recorded in its process (as with the default ``subprocess``
+    executor) or if the peak grew while the task ran; otherwise (e.g. in a
+    serial run, with the ``fork`` executor or in ``--watch`` mode) the peak
+    of an earlier task would be reported, so it is ``None`` instead.  The
+    peak RSS of each phase is that of the process so far.
+
+    Files opened are counted by the
+    multi-file readers through ``record_files_opened`` and the bytes of the
+    hyperslabs they will read through ``record_bytes_requested``.  Requests
+    for files that were already open in the pool of open files (hits) or
+    that had to be opened (misses) are counted through
+    ``record_file_handles``.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, name):  # {{{
+        """
+        Start recording the performance of a task or stage
+
+        Parameters
+        ----------
+        name : str
+            The name of the task or stage
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.name = name
+        self.phases = OrderedDict()
+        self.filesOpened = 0
+        self.bytesRequested = 0
+        self.fileHandleHits = 0
+        self.fileHandleMisses = 0
+        self.activePhase = None
+        self.activePhaseStart = None
+        self.activePhaseFilesOpened = 0
+        self.activePhaseBytesRequested = 0
+        self.activePhaseFileHandleHits = 0
+        self.activePhaseFileHandleMisses = 0
+        # whether the peak RSS of the process so far is that of this task
+        self.firstInProcess = os.getpid() not in _recordedProcesses
+        _recordedProcesses.add(os.getpid())
+        self.start = _snapshot()
+        self.summary = None  # }}}
+
+    def start_phase(self, phaseName):  # {{{
+        """
+        Start recording a phase, unless another phase is already being
+        recorded
+
+        Returns
+        -------
+        started : bool
+            Whether the phase was started (as opposed to being nested in
+            another phase)
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if self.activePhase is not None:
+            return False
+        self.activePhase = phaseName
+        self.activePhaseStart = _snapshot()
+        self.activePhaseFilesOpened = self.filesOpened
+        self.activePhaseBytesRequested = self.bytesRequested
+        self.activePhaseFileHandleHits = self.fileHandleHits
+        self.activePhaseFileHandleMisses = self.fileHandleMisses
+        return True  # }}}
+
+    def end_phase(self):  # {{{
+        """
+        Stop recording the active phase, adding its cost to the total for
+        that phase
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        phaseName = self.activePhase
+        if phaseName is None:
+            return
+        end = _snapshot()
+        if phaseName not in self.phases:
+            self.phases[phaseName] = OrderedDict(
+                [('calls', 0), ('wallTime', 0.), ('cpuTime', 0.),
+                 ('peakRSS', 0), ('bytesRead', 0), ('filesOpened', 0),
+                 ('bytesRequested', 0), ('fileHandleHits', 0),
+                 ('fileHandleMisses', 0)])
+        phase = self.phases[phaseName]
+        phase['calls'] += 1
+        for key in ['wallTime', 'cpuTime', 'bytesRead']:
+            phase[key] += end[key] - self.activePhaseStart[key]
+        phase['peakRSS'] = max(phase['peakRSS'], end['peakRSS'])
+        phase['filesOpened'] += self.filesOpened - self.activePhaseFilesOpened
+        phase['bytesRequested'] += \
+            self.bytesRequested - self.activePhaseBytesRequested
+        phase['fileHandleHits'] += \
+            self.fileHandleHits - self.activePhaseFileHandleHits
+        phase['fileHandleMisses'] += \
+            self.fileHandleMisses - self.activePhaseFileHandleMisses
+        self.activePhase = None
+        self.activePhaseStart = None  # }}}
+
+    def finish(self, success):  # {{{
+        """
+        Stop recording and return a summary of the task's performance
+
+        Parameters
+        ----------
+        success : bool
+            Whether the task finished successfully
+
+        Returns
+        -------
+        summary : OrderedDict
+            The name and success of the task, its wall-clock time and CPU
+            time (in seconds), peak RSS (``None`` if it can't be attributed
+            to this task) and bytes read (in bytes), the number
+            of files opened, the bytes requested from them, the hits and
+            misses in the pool of open files and the same information for
+            each phase
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.end_phase()
+        end = _snapshot()
+        summary = OrderedDict()
+        summary['name'] = self.name
+        summary['success'] = success
+        for key in ['wallTime', 'cpuTime', 'bytesRead']:
+            summary[key] = end[key] - self.start[key]
+        if self.firstInProcess or end['peakRSS'] > self.start['peakRSS']:
+            summary['peakRSS'] = end['peakRSS']
+        else:
+            # an earlier task in this process set the peak
+            summary['peakRSS'] = None
+        summary['filesOpened'] = self.filesOpened
+        summary['bytesRequested'] = self.bytesRequested
+        summary['fileHandleHits'] = self.fileHandleHits
+        summary['fileHandleMisses'] = self.fileHandleMisses
+        summary['phases'] = self.phases
+        self.summary = summary
+        return summary  # }}}
+
+    def write(self, directory):  # {{{
+        """
+        Write the summary as a JSON file named after the task in the given
+        directory
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        make_directories(directory)
+        fileName = '{}/{}.json'.format(directory, self.name)
+        with open(fileName, 'w') as outFile:
+            json.dump(self.summary, outFile, indent=2)  # }}}
+
+# }}}
+
+
+def start_recording(name):  # {{{
+    """
+    Start recording the performance of a task or stage in this process
+
+    Parameters
+    ----------
+    name : str
+        The name of the task or stage
+
+    Returns
+    -------
+    recorder : ``PerformanceRecorder`` object
+        The recorder, which should be finished with ``stop_recording``
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    global _currentRecorder
+    _currentRecorder = PerformanceRecorder(name)
+    return _currentRecorder  # }}}
+
+
+def stop_recording(success):  # {{{
+    """
+    Stop recording the performance of the current task or stage
+
+    Parameters
+    ----------
+    success : bool
+        Whether the task finished successfully
+
+    Returns
+    -------
+    recorder : ``PerformanceRecorder`` object
+        The recorder, whose ``summary`` has been computed
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    global _currentRecorder
+    recorder = _currentRecorder
+    _currentRecorder = None
+    if recorder is not None:
+        recorder.finish(success)
+    return recorder  # }}}
+
+
+def get_recorder():  # {{{
+    """
+    Returns the recorder for the current task or stage, or ``None`` if no
+    task is being recorded
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    return _currentRecorder  # }}}
+
+
+def record_files_opened(count):  # {{{
+    """
+    Add to the number of files opened by the current task (if any)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if _currentRecorder is not None:
+        _currentRecorder.filesOpened += count  # }}}
+
+
+def record_bytes_requested(count):  # {{{
+    """
+    Add to the number of bytes the current task (if any) has asked the
+    multi-file readers to read
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if _currentRecorder is not None:
+        _currentRecorder.bytesRequested += count  # }}}
+
+
+def record_file_handles(hits=0, misses=0):  # {{{
+    """
+    Add to the number of times the current task (if any) found a file
+    already open in the pool of open files (hits) or had to open it (misses)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if _currentRecorder is not None:
+        _currentRecorder.fileHandleHits += hits
+        _currentRecorder.fileHandleMisses += misses  # }}}
+
+
+@contextmanager
+def performance_phase(phaseName):  # {{{
+    """
+    A context manager for recording the enclosed code as a phase of the
+    current task, e.g.:
+
+        with performance_phase('plot'):
+            ...
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    recorder = _currentRecorder
+    started = recorder is not None and recorder.start_phase(phaseName)
+    try:
+        yield
+    finally:
+        if started:
+            recorder.end_phase()  # }}}
+
+
+def record_phase(phaseName):  # {{{
+    """
+    A decorator for recording each call to a function as a phase of the
+    current task
+
+    Parameters
+    ----------
+    phaseName : str
+        The name of the phase (e.g. 'load', 'climatology', 'remap' or 'plot')
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with performance_phase(phaseName):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator  # }}}
+
+
+def read_performance_reports(directory, names):  # {{{
+    """
+    Read the performance reports for the given tasks and stages
+
+    Parameters
+    ----------
+    directory : str
+        The directory containing the JSON files
+
+    names : list of str
+        The names of the tasks and stages.  Those without a report (e.g.
+        because they didn't run) are omitted.
+
+    Returns
+    -------
+    reports : list of dict
+        The performance reports that were found
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    reports = []
+    for name in names:
+        fileName = '{}/{}.json'.format(directory, name)
+        if not os.path.exists(fileName):
+            continue
+        with open(fileName) as inFile:
+            reports.append(json.load(inFile, object_pairs_hook=OrderedDict))
+    return reports  # }}}
+
+
+def format_duration(seconds):  # {{{
+    """
+    Format a duration in seconds as hours, minutes and seconds (h:mm:ss.ss)
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    m, s = divmod(seconds, 60)
+    h, m = divmod(int(m), 60)
+    return '{}:{:02d}:{:05.2f}'.format(h, m, s)  # }}}
+
+
+def _snapshot():  # {{{
+    """
+    Get the current wall-clock time, CPU time, peak RSS and bytes read by
+    this process and its children
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    selfUsage = resource.getrusage(resource.RUSAGE_SELF)
+    childUsage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpuTime = selfUsage.ru_utime + selfUsage.ru_stime + \
+        childUsage.ru_utime + childUsage.ru_stime
+    # ru_maxrss is in kilobytes on Linux
+    peakRSS = 1024*max(selfUsage.ru_maxrss, childUsage.ru_maxrss)
+
+    return {'wallTime': time.time(),
+            'cpuTime': cpuTime,
+            'peakRSS': peakRSS,
+            'bytesRead': _get_bytes_read()}  # }}}
+
+
+def _get_bytes_read():  # {{{
+    """
+    Get the number of bytes this process has read through system calls
+    (``rchar``: files, including those read from the page cache, but also
+    pipes and sockets), or 0 if this isn't available on this system
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    try:
+        with open('/proc/self/io') as ioFile:
+            for line in ioFile:
+                key, value = line.split(':')
+                if key == 'rchar':
+                    return int(value)
+    except (IOError, ValueError):
+        pass
+    return 0  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -23,8 +23,10 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable, ImageGrid
 from ..timekeeping.utility import days_to_datetime, date_to_days
 
 from ..constants import constants
+from ..performance import record_phase
 
 
+@record_phase('plot')
 def timeseries_analysis_plot(config, dsvalues, N, title, xlabel, ylabel,
                              fileout, lineStyles, lineWidths, calendar,
                              titleFontSize=None, figsize=(15, 6), dpi=None,
@@ -125,6 +127,7 @@ def timeseries_analysis_plot(config, dsvalues, N, title, xlabel, ylabel,
         plt.close()
 
 
+@record_phase('plot')
 def timeseries_analysis_plot_polar(config, dsvalues, N, title,
                                    fileout, lineStyles, lineWidths,
                                    calendar, titleFontSize=None,
@@ -224,6 +227,7 @@ def timeseries_analysis_plot_polar(config, dsvalues, N, title,
         plt.close()
 
 
+@record_phase('plot')
 def plot_polar_comparison(
         config,
         Lons,
@@ -391,6 +395,7 @@ def plot_polar_comparison(
         plt.close()
 
 
+@record_phase('plot')
 def plot_global_comparison(
     config,
     Lons,
@@ -553,6 +558,7 @@ def _date_tick(days, pos, calendar='gregorian', includeMonth=True):
         return '{:04d}'.format(date.year)
 
 
+@record_phase('plot')
 def plot_1D(config, xArrays, fieldArrays, errArrays,
             lineColors, lineWidths, legendText,
             title=None, xlabel=None, ylabel=None,
@@ -674,6 +680,7 @@ def plot_1D(config, xArrays, fieldArrays, errArrays,
     return  # }}}
 
 
+@record_phase('plot')
 def plot_vertical_section(
     config,
     xArray,
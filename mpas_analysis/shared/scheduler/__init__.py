@@ -0,0 +1,6 @@
+from .task_graph import TaskGraph
+from .forked_process import ForkedProcess
+from .work_queue import WorkQueue
+from .process_monitor import ProcessMonitor
+from .runtime_history import RuntimeHistory, find_stragglers
+from .cost_estimate import estimate_wall_time
@@ -0,0 +1,82 @@
+"""
+Estimate how long the tasks and stages in a task graph that still need to run
+will take, used to size the wall time of a batch job before any analysis is
+computed.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+
+def estimate_wall_time(graph, expectedRuntimes, taskCount):  # {{{
+    """
+    Estimate the total and wall-clock runtimes of the tasks and stages in the
+    graph that still need to run (those that are ``'pending'``)
+
+    Parameters
+    ----------
+    graph : ``TaskGraph`` object
+        The graph of tasks and stages, with tasks that are up to date and
+        stages that are complete already marked as finished
+
+    expectedRuntimes : dict
+        The expected runtime (in seconds) of each node, or ``None`` if
+        unknown.  Nodes with unknown runtimes are assumed to take the average
+        of the known runtimes.
+
+    taskCount : int
+        The number of tasks and stages that can run at the same time
+
+    Returns
+    -------
+    serialTime : float
+        The sum of the expected runtimes of the nodes that need to run, i.e.
+        how long they would take to run one at a time
+
+    criticalPath : float
+        The length of the longest chain of nodes that depend on one another,
+        a lower bound on the wall time no matter how many tasks run at once
+
+    wallTime : float
+        The estimated wall time: the larger of the critical path and the
+        serial time divided evenly among ``taskCount`` parallel tasks
+
+    unknownCount : int
+        The number of nodes that need to run but have no runtime history
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    known = [runtime for runtime in expectedRuntimes.values() if
+             runtime is not None]
+    if len(known) > 0:
+        defaultRuntime = sum(known)/len(known)
+    else:
+        defaultRuntime = 0.
+
+    runtimes = {}
+    unknownCount = 0
+    for name in graph.nodes:
+        if graph.status[name] != 'pending':
+            # nodes that don't need to run take no time
+            runtimes[name] = 0.
+        elif expectedRuntimes.get(name) is None:
+            runtimes[name] = defaultRuntime
+            unknownCount += 1
+        else:
+            runtimes[name] = expectedRuntimes[name]
+
+    serialTime = sum(runtimes.values())
+    lengths = graph.get_critical_path_lengths(runtimes)
+    if len(lengths) > 0:
+        criticalPath = max(lengths.values())
+    else:
+        criticalPath = 0.
+
+    wallTime = max(criticalPath, serialTime/max(taskCount, 1))
+
+    return serialTime, criticalPath, wallTime, unknownCount  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
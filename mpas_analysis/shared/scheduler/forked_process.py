@@ -0,0 +1,108 @@
+"""
+Run analysis tasks and stages in forked copies of the main process, so that
+config parsing, imports and task setup are not repeated for each task.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import sys
+import signal
+import traceback
+
+
+class ForkedProcess(object):  # {{{
+    """
+    A child process forked from the current process that calls a function
+    and exits.  Like ``subprocess.Popen``, the object has ``pid`` and
+    ``returncode`` members and ``wait`` and ``terminate`` methods, so it can
+    be handled in the same way.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, target, logFile):  # {{{
+        """
+        Fork the current process and call ``target`` in the child, with
+        standard output and error redirected to ``logFile``.
+
+        Parameters
+        ----------
+        target : function
+            A function with no arguments to be called in the child process.
+            The child exits with an error code if ``target`` raises an
+            exception or returns an exception.
+
+        logFile : file object
+            The open log file that standard output and error are written to
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.returncode = None
+
+        # make sure buffered output doesn't get written by both processes
+        sys.stdout.flush()
+        sys.stderr.flush()
+        logFile.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            # this is the child process
+            returncode = 1
+            try:
+                os.dup2(logFile.fileno(), sys.stdout.fileno())
+                os.dup2(logFile.fileno(), sys.stderr.fileno())
+                exception = target()
+                if exception is None:
+                    returncode = 0
+            except (Exception, BaseException):
+                traceback.print_exc(file=sys.stdout)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                # skip any cleanup inherited from the parent process
+                os._exit(returncode)
+
+        self.pid = pid  # }}}
+
+    def wait(self):  # {{{
+        """
+        Wait for the child process to finish, returning (and setting)
+        ``returncode``, which is negative if the child was killed by a signal
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if self.returncode is None:
+            (pid, status) = os.waitpid(self.pid, 0)
+            if os.WIFSIGNALED(status):
+                self.returncode = -os.WTERMSIG(status)
+            else:
+                self.returncode = os.WEXITSTATUS(status)
+        return self.returncode  # }}}
+
+    def terminate(self):  # {{{
+        """
+        Stop the child process with ``SIGTERM``
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGTERM)
+            except OSError:
+                # the process has already finished
+                pass  # }}}
+
+# }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,142 @@
+"""
+Monitor the processes running analysis tasks and stages, reporting each one
+as soon as it finishes.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import time
+import threading
+import Queue
+
+
+class ProcessMonitor(object):  # {{{
+    """
+    Keeps track of running processes (``subprocess.Popen`` or
+    ``ForkedProcess`` objects).  A thread waits on each process and reports
+    when it has finished, so the caller can block until the next process
+    finishes (or a timeout expires) without polling.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self):  # {{{
+        """
+        Create a monitor with no processes
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.processes = {}
+        self.startTimes = {}
+        self.finished = Queue.Queue()  # }}}
+
+    def add(self, name, process):  # {{{
+        """
+        Start monitoring a process that has just been launched
+
+        Parameters
+        ----------
+        name : str
+            The name of the task or stage the process is running
+
+        process : ``subprocess.Popen`` or ``ForkedProcess`` object
+            The process to monitor
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.processes[name] = process
+        self.startTimes[name] = time.time()
+
+        thread = threading.Thread(target=self._wait_for_process,
+                                  args=(name, process))
+        # don't keep the main process alive if it is interrupted
+        thread.daemon = True
+        thread.start()  # }}}
+
+    def wait(self, timeout=None):  # {{{
+        """
+        Wait for the next process to finish
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum time to wait in seconds, or ``None`` to wait until a
+            process finishes
+
+        Returns
+        -------
+        name : str or None
+            The name of the task or stage whose process finished (the process
+            is no longer monitored), or ``None`` if the timeout expired
+
+        process : ``subprocess.Popen`` or ``ForkedProcess`` object or None
+            The process that finished, whose ``returncode`` is set
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        try:
+            name = self.finished.get(timeout=timeout)
+        except Queue.Empty:
+            return (None, None)
+        process = self.processes.pop(name)
+        self.startTimes.pop(name)
+        return (name, process)  # }}}
+
+    def get_names(self):  # {{{
+        """
+        Returns the names of the tasks and stages that are running
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        return list(self.processes.keys())  # }}}
+
+    def get_elapsed_times(self):  # {{{
+        """
+        Returns a dictionary of how long (in seconds) each task or stage has
+        been running
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        now = time.time()
+        return dict([(name, now - startTime) for name, startTime in
+                     self.startTimes.items()])  # }}}
+
+    def terminate(self, name):  # {{{
+        """
+        Stop the process running the given task or stage.  It will be
+        reported by ``wait`` once it has finished.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.processes[name].terminate()  # }}}
+
+    def _wait_for_process(self, name, process):  # {{{
+        """
+        Wait for a process to finish (in a separate thread) and report it
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        process.wait()
+        self.finished.put(name)  # }}}
+
+# }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,209 @@
+"""
+Utilities for estimating the memory and cores needed by analysis tasks and
+stages, and for choosing which tasks to run at the same time without
+exceeding the resources of the node.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import numpy
+import netCDF4
+
+# bytes per gigabyte, the unit used for memory in config files
+bytesPerGB = 1024.**3
+
+
+def get_base_memory(config):  # {{{
+    """
+    Returns the memory (in bytes) used by any task or stage, regardless of the
+    data it reads (e.g. for the python interpreter and imported modules)
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    return bytesPerGB*config.getWithDefault('execute', 'taskBaseMemory',
+                                            default=1.)  # }}}
+
+
+def estimate_input_memory(inputFileGroups):  # {{{
+    """
+    Estimate the number of bytes of the input data that will be in memory at
+    the same time, using the dimensions of each variable (e.g. ``nCells``,
+    ``nEdges`` and ``nVertLevels``) from the header of the first file in each
+    group.
+
+    Parameters
+    ----------
+    inputFileGroups : list of dict
+        Each group contains the names of the input files (``fileNames``), the
+        variables read from them (``variableList``), the indices of dimensions
+        that are selected so only one entry is read (``iselValues``) and the
+        number of time slices that are in memory at once
+        (``timeSlicesInMemory``, ``None`` meaning all time slices)
+
+    Returns
+    -------
+    memory : float
+        The estimated memory in bytes
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    memory = 0.
+    for group in inputFileGroups:
+        fileNames = group['fileNames']
+        if len(fileNames) == 0 or group['variableList'] is None:
+            continue
+
+        bytesPerSlice, slicesPerFile = _get_slice_size(group)
+
+        timeSlices = slicesPerFile*len(fileNames)
+        if group['timeSlicesInMemory'] is not None:
+            timeSlices = min(timeSlices, group['timeSlicesInMemory'])
+
+        memory += bytesPerSlice*timeSlices
+
+    return memory  # }}}
+
+
+def estimate_input_bytes(inputFileGroups):  # {{{
+    """
+    Estimate the number of bytes of input data that will be read, using the
+    dimensions of each variable from the header of the first file in each
+    group.  For groups without a list of variables (e.g. files read by
+    ``ncclimo``), the total size of the files is used.
+
+    Parameters
+    ----------
+    inputFileGroups : list of dict
+        The groups of input files, as in ``estimate_input_memory``
+
+    Returns
+    -------
+    bytesRead : float
+        The estimated number of bytes read
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    bytesRead = 0.
+    for group in inputFileGroups:
+        fileNames = group['fileNames']
+        if len(fileNames) == 0:
+            continue
+
+        if group['variableList'] is None:
+            for fileName in fileNames:
+                if os.path.exists(fileName):
+                    bytesRead += os.path.getsize(fileName)
+            continue
+
+        bytesPerSlice, slicesPerFile = _get_slice_size(group)
+        bytesRead += bytesPerSlice*slicesPerFile*len(fileNames)
+
+    return bytesRead  # }}}
+
+
+def select_tasks_to_launch(readyNames, runningNames, resources, coreBudget,
+                           memoryBudget):  # {{{
+    """
+    Choose which of the tasks (or stages) that are ready to run can be
+    launched without exceeding the core and memory budgets, given those that
+    are already running.  Tasks are considered in order and each is launched
+    if it fits, so small tasks can run alongside large ones.  A task that
+    doesn't fit within the budget on its own is launched once nothing else is
+    running.
+
+    Parameters
+    ----------
+    readyNames : list of str
+        The names of tasks that are ready to run, in order of preference
+
+    runningNames : list of str
+        The names of tasks that are currently running
+
+    resources : dict
+        The estimated memory (in bytes) and number of cores for each task
+
+    coreBudget : int
+        The number of cores available
+
+    memoryBudget : float
+        The memory available in bytes, or 0 for no memory limit
+
+    Returns
+    -------
+    selectedNames : list of str
+        The names of the tasks to launch
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    usedCores = 0
+    usedMemory = 0.
+    for name in runningNames:
+        memory, cores = resources[name]
+        usedCores += min(cores, coreBudget)
+        usedMemory += memory
+
+    selectedNames = []
+    for name in readyNames:
+        memory, cores = resources[name]
+        cores = min(cores, coreBudget)
+        nothingRunning = len(runningNames) + len(selectedNames) == 0
+        if usedCores + cores > coreBudget:
+            continue
+        if memoryBudget > 0 and usedMemory + memory > memoryBudget and \
+                not nothingRunning:
+            continue
+        selectedNames.append(name)
+        usedCores += cores
+        usedMemory += memory
+
+    return selectedNames  # }}}
+
+
+def _get_slice_size(group):  # {{{
+    """
+    Get the number of bytes in one time slice of the variables in a group of
+    input files and the number of time slices per file from the header of the
+    first file
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    iselValues = group['iselValues']
+    if iselValues is None:
+        iselValues = {}
+
+    bytesPerSlice = 0.
+    slicesPerFile = 1
+    with netCDF4.Dataset(group['fileNames'][0], 'r') as inFile:
+        if 'Time' in inFile.dimensions:
+            slicesPerFile = len(inFile.dimensions['Time'])
+        for variableName in group['variableList']:
+            if variableName not in inFile.variables:
+                continue
+            var = inFile.variables[variableName]
+            # selected dimensions and Time don't add to the size of a time
+            # slice
+            shape = [len(inFile.dimensions[dim]) for dim in var.dimensions
+                     if dim != 'Time' and dim not in iselValues]
+            bytesPerSlice += var.dtype.itemsize*numpy.prod(shape)
+
+    return bytesPerSlice, slicesPerFile  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,143 @@
+"""
+A small database of how long each analysis task and stage has taken in
+recent runs on each mesh, used to start the longest tasks first and to spot
+tasks that are taking much longer than usual.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import json
+
+import numpy
+
+from ..io.utility import make_directories
+
+
+class RuntimeHistory(object):  # {{{
+    """
+    The runtimes (in seconds) of the most recent successful runs of each task
+    and stage, stored in a JSON file by mesh name and then by task name
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, fileName, meshName, maxRuns=5):  # {{{
+        """
+        Read the runtime history, if the file exists
+
+        Parameters
+        ----------
+        fileName : str
+            The JSON file containing the history
+
+        meshName : str
+            The name of the MPAS mesh, since runtimes depend strongly on the
+            mesh resolution
+
+        maxRuns : int, optional
+            The number of recent runtimes to keep for each task
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.fileName = fileName
+        self.meshName = meshName
+        self.maxRuns = maxRuns
+        self.history = {}
+        if os.path.exists(fileName):
+            with open(fileName) as inFile:
+                try:
+                    self.history = json.load(inFile)
+                except ValueError:
+                    # the file is corrupt, so start over
+                    self.history = {}
+        if meshName not in self.history:
+            self.history[meshName] = {}  # }}}
+
+    def get_expected_runtime(self, name):  # {{{
+        """
+        Returns the expected runtime of a task or stage: the median of its
+        recent runtimes, or ``None`` if it hasn't run before on this mesh
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        runtimes = self.history[self.meshName].get(name, [])
+        if len(runtimes) == 0:
+            return None
+        return float(numpy.median(runtimes))  # }}}
+
+    def add_runtime(self, name, runtime):  # {{{
+        """
+        Add the runtime (in seconds) of a successful run of a task or stage
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        runtimes = self.history[self.meshName].get(name, [])
+        runtimes.append(runtime)
+        self.history[self.meshName][name] = runtimes[-self.maxRuns:]  # }}}
+
+    def write(self):  # {{{
+        """
+        Write the runtime history, making sure other processes never see a
+        partially written file
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        make_directories(os.path.dirname(os.path.abspath(self.fileName)))
+        tempFileName = '{}.{}.tmp'.format(self.fileName, os.getpid())
+        with open(tempFileName, 'w') as outFile:
+            json.dump(self.history, outFile, indent=2, sort_keys=True)
+        os.rename(tempFileName, self.fileName)  # }}}
+
+# }}}
+
+
+def find_stragglers(elapsedTimes, expectedRuntimes, factor):  # {{{
+    """
+    Find the tasks and stages that have been running for more than a given
+    factor times their expected runtime
+
+    Parameters
+    ----------
+    elapsedTimes : dict
+        How long (in seconds) each running task or stage has been running
+
+    expectedRuntimes : dict
+        The expected runtime (in seconds) of each task or stage, or ``None``
+        if unknown
+
+    factor : float
+        The factor above the expected runtime at which a task is a straggler.
+        If ``factor`` is 0, there are no stragglers.
+
+    Returns
+    -------
+    names : list of str
+        The names of the stragglers, sorted
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    names = []
+    if factor <= 0:
+        return names
+    for name, elapsed in elapsedTimes.items():
+        expected = expectedRuntimes.get(name)
+        if expected is not None and elapsed > factor*expected:
+            names.append(name)
+    return sorted(names)  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
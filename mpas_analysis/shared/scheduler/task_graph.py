@@ -0,0 +1,300 @@
+"""
+A graph of analysis tasks and the (possibly shared) stages they depend on,
+used to schedule tasks and stages so that each shared stage is run only once
+and its consumers are run as soon as it completes.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+from collections import OrderedDict
+
+
+class TaskGraph(object):  # {{{
+    """
+    A directed acyclic graph of analysis tasks and stages.  Each node is
+    either an ``AnalysisTask`` or an ``AnalysisStage`` and is identified by its
+    ``taskName`` or ``stageName``, respectively.  A task depends on the stages
+    in its ``stages`` list; a stage depends on any other stage that produces
+    one of its ``inputs``.
+
+    Each node has a status, one of ``'pending'``, ``'running'``,
+    ``'success'``, ``'fail'`` or ``'skipped'`` (because a node it depends on
+    failed).  Stages that are already complete start with ``'success'``.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, analyses):  # {{{
+        """
+        Build the graph from a list of analysis tasks and their stages.
+
+        Parameters
+        ----------
+        analyses : list of ``AnalysisTask`` objects
+            The tasks to schedule.  Their ``setup_and_check`` method has
+            already been called, so each task's ``stages`` list is complete.
+
+        Raises
+        ------
+        ValueError
+            If a stage has the same name as a task or the dependencies contain
+            a cycle
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.nodes = OrderedDict()
+        self.dependencies = OrderedDict()
+        self.status = {}
+
+        stages = OrderedDict()
+        for analysisTask in analyses:
+            for stage in analysisTask.stages:
+                # stages with the same name do the same work, so we keep the
+                # first one
+                if stage.stageName not in stages:
+                    stages[stage.stageName] = stage
+
+        # producers of each file
+        producers = {}
+        for stageName, stage in stages.items():
+            for fileName in stage.outputs:
+                producers[fileName] = stageName
+
+        for stageName, stage in stages.items():
+            dependencies = []
+            for fileName in stage.inputs:
+                if fileName in producers and \
+                        producers[fileName] != stageName and \
+                        producers[fileName] not in dependencies:
+                    dependencies.append(producers[fileName])
+            self._add_node(stageName, stage, dependencies)
+
+        for analysisTask in analyses:
+            dependencies = []
+            for stage in analysisTask.stages:
+                if stage.stageName not in dependencies:
+                    dependencies.append(stage.stageName)
+            self._add_node(analysisTask.taskName, analysisTask, dependencies)
+
+        self._check_for_cycles()
+
+        # stages whose outputs all exist don't need to be run again
+        for stageName, stage in stages.items():
+            if stage.is_complete():
+                self.status[stageName] = 'success'
+
+        self.consumers = OrderedDict([(name, []) for name in self.nodes])
+        for name, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                self.consumers[dependency].append(name)
+        # }}}
+
+    def is_stage(self, name):  # {{{
+        """
+        Returns whether the node with the given name is a stage (as opposed to
+        an analysis task)
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        return not hasattr(self.nodes[name], 'taskName')  # }}}
+
+    def ready_nodes(self):  # {{{
+        """
+        Returns the names of pending nodes whose dependencies have all
+        succeeded, with stages first and otherwise in the order they were
+        added to the graph
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        ready = []
+        for name, dependencies in self.dependencies.items():
+            if self.status[name] != 'pending':
+                continue
+            if all([self.status[dependency] == 'success' for dependency in
+                    dependencies]):
+                ready.append(name)
+        return ready  # }}}
+
+    def set_running(self, name):  # {{{
+        """
+        Mark the given node as running
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.status[name] = 'running'  # }}}
+
+    def set_finished(self, name, success):  # {{{
+        """
+        Mark the given node as having succeeded or failed.  If it failed, all
+        nodes that depend on it (directly or indirectly) are marked as
+        skipped.
+
+        Parameters
+        ----------
+        name : str
+            The name of the node that finished
+
+        success : bool
+            Whether the node finished successfully
+
+        Returns
+        -------
+        skipped : list of str
+            The names of the nodes that will be skipped because this node
+            failed
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        skipped = []
+        if success:
+            self.status[name] = 'success'
+            return skipped
+
+        self.status[name] = 'fail'
+        toVisit = list(self.consumers[name])
+        while len(toVisit) > 0:
+            consumer = toVisit.pop(0)
+            if self.status[consumer] == 'pending':
+                self.status[consumer] = 'skipped'
+                skipped.append(consumer)
+                toVisit.extend(self.consumers[consumer])
+        return skipped  # }}}
+
+    def is_finished(self):  # {{{
+        """
+        Returns whether all nodes have finished (or been skipped)
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        for status in self.status.values():
+            if status in ['pending', 'running']:
+                return False
+        return True  # }}}
+
+    def get_task_for_stage(self, stageName):  # {{{
+        """
+        Returns the name of the first analysis task that depends (directly or
+        indirectly) on the given stage.  This task's setup is needed to
+        reconstruct the stage in a separate process.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        toVisit = [stageName]
+        while len(toVisit) > 0:
+            name = toVisit.pop(0)
+            for consumer in self.consumers[name]:
+                if not self.is_stage(consumer):
+                    return consumer
+                toVisit.append(consumer)
+        return None  # }}}
+
+    def get_critical_path_lengths(self, expectedRuntimes):  # {{{
+        """
+        Compute the length of the critical path starting at each node: its
+        expected runtime plus the longest critical path of any node that
+        depends on it.  Launching the ready nodes with the longest critical
+        paths first keeps the longest chains of work from starting last.
+
+        Parameters
+        ----------
+        expectedRuntimes : dict
+            The expected runtime (in seconds) of each node, or ``None`` if
+            unknown.  Nodes with unknown runtimes are assumed to take the
+            average of the known runtimes.
+
+        Returns
+        -------
+        lengths : dict
+            The critical path length (in seconds) of each node
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        known = [runtime for runtime in expectedRuntimes.values() if
+                 runtime is not None]
+        if len(known) > 0:
+            defaultRuntime = sum(known)/len(known)
+        else:
+            defaultRuntime = 0.
+
+        lengths = {}
+
+        def visit(name):
+            if name in lengths:
+                return lengths[name]
+            runtime = expectedRuntimes.get(name)
+            if runtime is None:
+                runtime = defaultRuntime
+            longest = 0.
+            for consumer in self.consumers[name]:
+                longest = max(longest, visit(consumer))
+            lengths[name] = runtime + longest
+            return lengths[name]
+
+        for name in self.nodes:
+            visit(name)
+
+        return lengths  # }}}
+
+    def _add_node(self, name, node, dependencies):  # {{{
+        """
+        Add a node with the given dependencies
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if name in self.nodes:
+            raise ValueError('More than one task or stage with name '
+                             '{}'.format(name))
+        self.nodes[name] = node
+        self.dependencies[name] = dependencies
+        self.status[name] = 'pending'  # }}}
+
+    def _check_for_cycles(self):  # {{{
+        """
+        Raise an exception if the dependencies contain a cycle
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        # 0: not visited, 1: being visited, 2: done
+        visited = dict([(name, 0) for name in self.nodes])
+
+        def visit(name):
+            if visited[name] == 1:
+                raise ValueError('Dependencies of {} contain a '
+                                 'cycle.'.format(name))
+            if visited[name] == 2:
+                return
+            visited[name] = 1
+            for dependency in self.dependencies[name]:
+                visit(dependency)
+            visited[name] = 2
+
+        for name in self.nodes:
+            visit(name)  # }}}
+
+# }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
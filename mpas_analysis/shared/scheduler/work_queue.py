@@ -0,0 +1,343 @@
+"""
+A work queue of analysis tasks and stages stored as files in a shared
+directory, so that worker processes on any number of nodes can claim and run
+tasks.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import json
+import time
+import shutil
+
+from ..io.utility import make_directories
+
+
+class WorkQueue(object):  # {{{
+    """
+    A work queue stored in a directory on a file system shared between the
+    coordinator and the workers.  The directory contains:
+
+    ``queue.json``
+        The names of the tasks and stages in the order they should be run,
+        the dependencies of each and the command-line arguments needed to run
+        each in a subtask
+
+    ``<name>.claim``
+        Created (atomically, with ``O_EXCL``) by the worker that claims a
+        task or stage, and containing the worker's name.  The worker touches
+        the file regularly while the task runs, so a claim that hasn't been
+        touched for longer than the lease time belongs to a worker that was
+        killed (e.g. by a node failure or the end of the allocation).
+
+    ``<name>.status``
+        The final status of the task or stage, one of ``'success'``,
+        ``'fail'`` or ``'skipped'``
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, queueDirectory, leaseTime=600.):  # {{{
+        """
+        Construct a work queue in the given directory
+
+        Parameters
+        ----------
+        queueDirectory : str
+            A directory on a file system shared between the coordinator and
+            the workers
+
+        leaseTime : float, optional
+            The time in seconds after which a claim that hasn't been renewed
+            is considered stale
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.queueDirectory = queueDirectory
+        self.leaseTime = leaseTime
+        self.queueFileName = '{}/queue.json'.format(queueDirectory)
+        self.names = None
+        self.dependencies = None
+        self.args = None  # }}}
+
+    def initialize(self, graph, args, names=None):  # {{{
+        """
+        Write a new queue containing the tasks and stages in a graph,
+        removing any previous queue in the directory.  Nodes that have
+        already succeeded (e.g. complete stages) or been skipped are marked
+        as such.
+
+        Parameters
+        ----------
+        graph : ``TaskGraph`` object
+            The tasks and stages to run
+
+        args : dict
+            The command-line arguments needed to run each task or stage in a
+            subtask
+
+        names : list of str, optional
+            The names of the tasks and stages in the order workers should
+            claim them (once their dependencies have finished).  By default,
+            the order of the nodes in the graph.
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if os.path.exists(self.queueDirectory):
+            shutil.rmtree(self.queueDirectory)
+        make_directories(self.queueDirectory)
+
+        if names is None:
+            names = graph.nodes.keys()
+        self.names = list(names)
+        self.dependencies = dict(graph.dependencies)
+        self.args = args
+
+        for name in self.names:
+            if graph.status[name] in ['success', 'skipped']:
+                self._write_status(name, graph.status[name])
+
+        self._write_atomic(self.queueFileName,
+                           json.dumps({'names': self.names,
+                                       'dependencies': self.dependencies,
+                                       'args': self.args}, indent=2))
+        # }}}
+
+    def is_initialized(self):  # {{{
+        """
+        Returns whether the coordinator has written the queue yet
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        return os.path.exists(self.queueFileName)  # }}}
+
+    def claim(self, workerName):  # {{{
+        """
+        Claim the next task or stage whose dependencies have all succeeded.
+        Any tasks or stages whose dependencies have failed are marked as
+        skipped along the way.
+
+        Parameters
+        ----------
+        workerName : str
+            A name identifying the worker (e.g. host name and process ID)
+
+        Returns
+        -------
+        name : str or None
+            The name of the claimed task or stage, or ``None`` if nothing can
+            be claimed right now
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if not self._read():
+            return None
+
+        for name in self.names:
+            if os.path.exists(self._claim_file_name(name)) or \
+                    os.path.exists(self._status_file_name(name)):
+                continue
+            statuses = [self.get_status(dependency) for dependency in
+                        self.dependencies[name]]
+            failed = any([status in ['fail', 'skipped'] for status in
+                          statuses])
+            if not failed and \
+                    not all([status == 'success' for status in statuses]):
+                # still waiting for dependencies
+                continue
+
+            try:
+                fileDescriptor = os.open(self._claim_file_name(name),
+                                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError:
+                # another worker claimed this one first
+                continue
+            os.write(fileDescriptor, workerName)
+            os.close(fileDescriptor)
+
+            if failed:
+                self._write_status(name, 'skipped')
+                continue
+
+            return name
+
+        return None  # }}}
+
+    def get_args(self, name):  # {{{
+        """
+        Returns the command-line arguments for running the given task or stage
+        in a subtask
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self._read()
+        return self.args[name]  # }}}
+
+    def renew(self, name):  # {{{
+        """
+        Renew the claim on a task or stage, showing that the worker running
+        it is still alive
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        try:
+            os.utime(self._claim_file_name(name), None)
+        except OSError:
+            # the queue was removed, e.g. by a new coordinator
+            pass  # }}}
+
+    def expire_stale_claims(self):  # {{{
+        """
+        Mark tasks and stages whose claims haven't been renewed within the
+        lease time as failed, since the workers running them have died
+
+        Returns
+        -------
+        names : list of str
+            The names of the tasks and stages that were marked as failed
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if not self._read():
+            return []
+
+        now = time.time()
+        expired = []
+        for name in self.names:
+            claimFileName = self._claim_file_name(name)
+            if os.path.exists(self._status_file_name(name)):
+                continue
+            try:
+                age = now - os.path.getmtime(claimFileName)
+            except OSError:
+                # not claimed
+                continue
+            if age > self.leaseTime:
+                self._write_status(name, 'fail')
+                expired.append(name)
+        return expired  # }}}
+
+    def set_finished(self, name, success):  # {{{
+        """
+        Mark the given task or stage as having succeeded or failed, unless
+        it has already been marked as failed (because its claim expired or
+        the queue timed out)
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if os.path.exists(self._status_file_name(name)):
+            return
+        if success:
+            self._write_status(name, 'success')
+        else:
+            self._write_status(name, 'fail')  # }}}
+
+    def get_status(self, name):  # {{{
+        """
+        Returns the status of a task or stage: one of ``'pending'``,
+        ``'running'``, ``'success'``, ``'fail'`` or ``'skipped'``
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        statusFileName = self._status_file_name(name)
+        if os.path.exists(statusFileName):
+            with open(statusFileName) as statusFile:
+                return statusFile.read().strip()
+        if os.path.exists(self._claim_file_name(name)):
+            return 'running'
+        return 'pending'  # }}}
+
+    def is_finished(self):  # {{{
+        """
+        Returns whether every task and stage in the queue has finished (or
+        been skipped)
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if not self._read():
+            return False
+        for name in self.names:
+            if not os.path.exists(self._status_file_name(name)):
+                return False
+        return True  # }}}
+
+    def _read(self):  # {{{
+        """
+        Read the queue file if it hasn't been read yet, returning whether the
+        queue exists
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        if self.names is not None:
+            return True
+        if not self.is_initialized():
+            return False
+        with open(self.queueFileName) as queueFile:
+            queue = json.load(queueFile)
+        self.names = [str(name) for name in queue['names']]
+        self.dependencies = dict(
+            [(str(name), [str(dependency) for dependency in dependencies])
+             for name, dependencies in queue['dependencies'].items()])
+        self.args = dict([(str(name), [str(arg) for arg in args])
+                          for name, args in queue['args'].items()])
+        return True  # }}}
+
+    def _write_status(self, name, status):  # {{{
+        """
+        Write the status file for a task or stage
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self._write_atomic(self._status_file_name(name), status)  # }}}
+
+    def _write_atomic(self, fileName, contents):  # {{{
+        """
+        Write a file so that other processes never see it partially written
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        tempFileName = '{}.{}.tmp'.format(fileName, os.getpid())
+        with open(tempFileName, 'w') as tempFile:
+            tempFile.write(contents)
+        os.rename(tempFileName, fileName)  # }}}
+
+    def _claim_file_name(self, name):  # {{{
+        return '{}/{}.claim'.format(self.queueDirectory, name)  # }}}
+
+    def _status_file_name(self, name):  # {{{
+        return '{}/{}.status'.format(self.queueDirectory, name)  # }}}
+
+# }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -11,7 +11,7 @@ import numpy
 import os
 import warnings
 
-from ..timekeeping.utility import days_to_datetime
+from ..timekeeping.vectorized_calendar import days_to_dates
 
 
 def cache_time_series(timesInDataSet, timeSeriesCalcFunction, cacheFileName,
@@ -94,8 +94,7 @@ def cache_time_series(timesInDataSet, timeSeriesCalcFunction, cacheFileName,
             for time in dsCache.Time.values:
                 timesProcessed[timesInDataSet == time] = True
 
-    datetimes = days_to_datetime(timesInDataSet, calendar=calendar)
-    yearsInDataSet = numpy.array([date.year for date in datetimes])
+    yearsInDataSet = days_to_dates(timesInDataSet, calendar=calendar)[0]
 
     startYear = yearsInDataSet[0]
     endYear = yearsInDataSet[-1]
@@ -128,6 +127,10 @@ def cache_time_series(timesInDataSet, timeSeriesCalcFunction, cacheFileName,
         firstProcessed = False
 
         if cacheDataSetExists:
+            # a cache written before the reader added the time-table
+            # coordinates (year, month, etc.) doesn't have them
+            ds = ds.drop([coord for coord in ds.coords if
+                          coord not in dsCache.coords])
             dsCache = xr.concat([dsCache, ds], dim='Time')
             # now sort the Time dimension:
             dsCache = dsCache.loc[{'Time': sorted(dsCache.Time.values)}]
@@ -0,0 +1,113 @@
+"""
+A compact table of the calendar information for each time in a data set (the
+year, month and number of days in the month), computed once when the data set
+is read rather than each time a climatology or index needs it
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import numpy
+
+from .vectorized_calendar import days_to_dates
+from ..constants import constants
+
+# the fields of a time table
+timeTableDtype = numpy.dtype([('year', numpy.int64),
+                              ('month', numpy.int64),
+                              ('daysInMonth', numpy.float64)])
+
+
+def build_time_table(times, calendar, startTimes=None,
+                     endTimes=None):  # {{{
+    """
+    Build a table of the calendar information for each time
+
+    Parameters
+    ----------
+    times : numpy.ndarray
+        The times in days since 0001-01-01
+
+    calendar : {'gregorian', 'gregorian_noleap'}
+        The name of one of the calendars supported by MPAS cores
+
+    startTimes, endTimes : numpy.ndarray, optional
+        The start and end of the interval each time represents (e.g. of a
+        monthly average) in days since 0001-01-01
+
+    Returns
+    -------
+    timeTable : numpy.ndarray
+        A read-only structured array with the fields of ``timeTableDtype``.
+        ``daysInMonth`` is the length of the interval if ``startTimes`` and
+        ``endTimes`` are supplied, and otherwise the length of the month
+        ignoring leap years.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    times = numpy.asarray(times)
+    timeTable = numpy.zeros(times.shape, dtype=timeTableDtype)
+
+    (years, months, _, _) = days_to_dates(times, calendar=calendar)
+    timeTable['year'] = years
+    timeTable['month'] = months
+
+    if startTimes is not None and endTimes is not None:
+        timeTable['daysInMonth'] = numpy.asarray(endTimes) - \
+            numpy.asarray(startTimes)
+    else:
+        timeTable['daysInMonth'] = constants.daysInMonth[months - 1]
+
+    timeTable.flags.writeable = False
+    return timeTable  # }}}
+
+
+def add_time_table_coords(ds, calendar):  # {{{
+    """
+    Add the time table of a newly opened data set as ``year`` and ``month``
+    (and, if the data set has ``startTime`` and ``endTime`` coordinates,
+    ``daysInMonth``) coordinates along ``Time``.  The coordinates
+    are added in place, so they follow the data set through any selections
+    and are shared by every view of it.
+
+    Parameters
+    ----------
+    ds : ``xarray.Dataset``
+        A data set with a ``Time`` coordinate in days since 0001-01-01
+
+    calendar : {'gregorian', 'gregorian_noleap'}
+        The name of one of the calendars supported by MPAS cores
+
+    Returns
+    -------
+    ds : ``xarray.Dataset``
+        The same data set with the coordinates added
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if 'Time' not in ds.coords:
+        return ds
+
+    hasBounds = 'startTime' in ds.coords and 'endTime' in ds.coords
+    if hasBounds:
+        timeTable = build_time_table(ds.Time.values, calendar,
+                                     startTimes=ds.startTime.values,
+                                     endTimes=ds.endTime.values)
+    else:
+        timeTable = build_time_table(ds.Time.values, calendar)
+
+    ds.coords['year'] = ('Time', timeTable['year'])
+    ds.coords['month'] = ('Time', timeTable['month'])
+    if hasBounds:
+        # without the bounds, the length of each month depends on whether
+        # leap years should be ignored, which is up to each analysis task
+        ds.coords['daysInMonth'] = ('Time', timeTable['daysInMonth'])
+
+    return ds  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,396 @@
+"""
+Vectorized conversion between days since a reference date and MPAS date
+strings (e.g. ``xtime``) or arrays of integer years, months, days and seconds,
+using numpy array operations rather than converting each date to or from a
+``datetime.datetime``
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import datetime
+import numpy
+
+from .utility import string_to_datetime, string_to_days_since_date, \
+    _mpas_to_netcdf_calendar
+
+# the number of days before the first of each month in a year with no leap day
+_daysBeforeMonth = numpy.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273,
+                                304, 334], dtype=numpy.int64)
+
+# the first date on the Gregorian calendar, before which the 'gregorian'
+# calendar is the Julian calendar
+_gregorianSwitch = datetime.datetime(1582, 10, 15)
+# the Julian day number of the switch
+_gregorianSwitchDayNumber = 2299161
+
+
+def char_array_to_days(timeChars, calendar='gregorian',
+                       referenceDate='0001-01-01'):  # {{{
+    """
+    Convert an array of MPAS date strings to days since a reference date
+
+    Parameters
+    ----------
+    timeChars : numpy.ndarray
+        Either a ``(Time, StrLen)`` array of single characters as stored in
+        MPAS files or a ``(Time,)`` array of fixed-length strings (e.g.
+        ``|S64``), each with a date of the form ``YYYY-MM-DD_hh:mm:ss`` or
+        ``YYYY-MM-DD`` (any number of year digits, padded with spaces or null
+        characters)
+
+    calendar : {'gregorian', 'gregorian_noleap'}, optional
+        The name of one of the calendars supported by MPAS cores
+
+    referenceDate : str, optional
+        A reference date of the form:
+            - 0001-01-01
+            - 0001-01-01 00:00:00
+
+    Returns
+    -------
+    days : numpy.ndarray
+        The number of days since ``referenceDate`` for each date, the same as
+        ``string_to_days_since_date`` would return
+
+    Raises
+    ------
+    ValueError
+        If an invalid ``calendar`` or ``referenceDate`` is supplied.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    # make sure the calendar is supported before doing any work
+    _mpas_to_netcdf_calendar(calendar)
+
+    timeChars = numpy.asarray(timeChars)
+    if timeChars.ndim == 1:
+        # an array of fixed-length strings, viewed as its characters
+        timeChars = numpy.ascontiguousarray(timeChars)
+        timeChars = timeChars.view('S1').reshape(
+            (timeChars.shape[0], timeChars.dtype.itemsize))
+
+    timeCount = timeChars.shape[0]
+    if timeCount == 0:
+        return numpy.zeros(0)
+
+    codes = timeChars.view(numpy.uint8)
+
+    fields = _find_fields(codes)
+    if fields is None:
+        # the dates don't all have the expected layout, so parse them one by
+        # one, which supports every format MPAS uses
+        timeStrings = [''.join(row).strip() for row in timeChars]
+        return string_to_days_since_date(dateString=timeStrings,
+                                         referenceDate=referenceDate,
+                                         calendar=calendar)
+
+    digits = codes.astype(numpy.int64) - ord('0')
+    values = []
+    for start, end in fields:
+        value = numpy.zeros(timeCount, dtype=numpy.int64)
+        for column in range(start, end):
+            value = 10*value + digits[:, column]
+        values.append(value)
+
+    if len(values) == 3:
+        zeros = numpy.zeros(timeCount, dtype=numpy.int64)
+        values.extend([zeros, zeros, zeros])
+
+    (year, month, day, hour, minute, second) = values
+
+    return dates_to_days(year, month, day, 3600*hour + 60*minute + second,
+                         calendar=calendar, referenceDate=referenceDate)
+    # }}}
+
+
+def days_to_dates(days, calendar='gregorian',
+                  referenceDate='0001-01-01'):  # {{{
+    """
+    Convert days since a reference date to arrays of years, months, days and
+    seconds, rounded to the nearest second like ``days_to_datetime``
+
+    Parameters
+    ----------
+    days : float or array-like of floats
+        The number of days since the reference date
+
+    calendar : {'gregorian', 'gregorian_noleap'}, optional
+        The name of one of the calendars supported by MPAS cores
+
+    referenceDate : str, optional
+        A reference date of the form:
+            - 0001-01-01
+            - 0001-01-01 00:00:00
+
+    Returns
+    -------
+    year, month, day, seconds : numpy.ndarray of int
+        The date and the seconds since the start of the day, with the same
+        shape as ``days``
+
+    Raises
+    ------
+    ValueError
+        If an invalid ``calendar`` or ``referenceDate`` is supplied.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    _mpas_to_netcdf_calendar(calendar)
+
+    (referenceDays, referenceSeconds, proleptic) = \
+        _reference_day_number(referenceDate, calendar)
+
+    totalSeconds = numpy.round(86400.*numpy.asarray(days, dtype=float))
+    totalSeconds = totalSeconds.astype(numpy.int64) + referenceSeconds
+    dayNumber = referenceDays + totalSeconds//86400
+    seconds = totalSeconds % 86400
+
+    if calendar == 'gregorian_noleap':
+        year = (dayNumber - 1)//365
+        dayOfYear = dayNumber - 365*year
+        month = numpy.searchsorted(_daysBeforeMonth, dayOfYear - 1,
+                                   side='right')
+        day = dayOfYear - _daysBeforeMonth[month - 1]
+        return year, month, day, seconds
+
+    # invert the Julian day number, see e.g.
+    # https://en.wikipedia.org/wiki/Julian_day
+    a = dayNumber + 32044
+    b = (4*a + 3)//146097
+    c = a - 146097*b//4
+    if not proleptic:
+        # dates before the switch are on the Julian calendar
+        isJulian = dayNumber < _gregorianSwitchDayNumber
+        b = numpy.where(isJulian, 0, b)
+        c = numpy.where(isJulian, dayNumber + 32082, c)
+    d = (4*c + 3)//1461
+    e = c - 1461*d//4
+    m = (5*e + 2)//153
+    day = e - (153*m + 2)//5 + 1
+    month = m + 3 - 12*(m//10)
+    year = 100*b + d - 4800 + m//10
+    return year, month, day, seconds  # }}}
+
+
+def dates_to_days(year, month=1, day=1, seconds=0, calendar='gregorian',
+                  referenceDate='0001-01-01'):  # {{{
+    """
+    Convert arrays of years, months, days and seconds to days since a
+    reference date, like ``datetime_to_days``
+
+    Parameters
+    ----------
+    year, month, day, seconds : int or array-like of int
+        The date and the seconds since the start of the day
+
+    calendar : {'gregorian', 'gregorian_noleap'}, optional
+        The name of one of the calendars supported by MPAS cores
+
+    referenceDate : str, optional
+        A reference date of the form:
+            - 0001-01-01
+            - 0001-01-01 00:00:00
+
+    Returns
+    -------
+    days : numpy.ndarray
+        The number of days since ``referenceDate``
+
+    Raises
+    ------
+    ValueError
+        If an invalid ``calendar`` or ``referenceDate`` is supplied.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    _mpas_to_netcdf_calendar(calendar)
+
+    (referenceDays, referenceSeconds, proleptic) = \
+        _reference_day_number(referenceDate, calendar)
+
+    days = _day_number(numpy.asarray(year, dtype=numpy.int64),
+                       numpy.asarray(month, dtype=numpy.int64),
+                       numpy.asarray(day, dtype=numpy.int64), calendar,
+                       proleptic) - referenceDays
+    seconds = numpy.asarray(seconds) - referenceSeconds
+
+    return days + seconds/86400.  # }}}
+
+
+def days_in_month(year, month, calendar='gregorian'):  # {{{
+    """
+    The number of days in each month of each year
+
+    Parameters
+    ----------
+    year, month : int or array-like of int
+        The year and month
+
+    calendar : {'gregorian', 'gregorian_noleap'}, optional
+        The name of one of the calendars supported by MPAS cores.  Leap years
+        on the 'gregorian' calendar follow the Gregorian rules for all years,
+        as in ``calendar.monthrange``.
+
+    Returns
+    -------
+    daysInMonth : numpy.ndarray of int
+        The number of days in each month
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    _mpas_to_netcdf_calendar(calendar)
+
+    year = numpy.asarray(year, dtype=numpy.int64)
+    month = numpy.asarray(month, dtype=numpy.int64)
+    nextYear = year + month//12
+    nextMonth = month % 12 + 1
+    return _day_number(nextYear, nextMonth, 1, calendar, True) - \
+        _day_number(year, month, 1, calendar, True)  # }}}
+
+
+def _reference_day_number(referenceDate, calendar):  # {{{
+    """
+    The day number and seconds since the start of the day of a reference
+    date, and whether the 'gregorian' calendar is proleptic for dates counted
+    from it
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    reference = string_to_datetime(referenceDate)
+    # like netCDF4.date2num and num2date, use the Gregorian calendar for all
+    # dates if the reference date is after the switch from the Julian
+    # calendar
+    proleptic = reference > _gregorianSwitch
+    referenceDays = int(_day_number(
+        numpy.array([reference.year]), numpy.array([reference.month]),
+        numpy.array([reference.day]), calendar, proleptic)[0])
+    referenceSeconds = 3600*reference.hour + 60*reference.minute + \
+        reference.second
+    return referenceDays, referenceSeconds, proleptic  # }}}
+
+
+def _find_fields(codes):  # {{{
+    """
+    Find the columns holding the year, month, day, hour, minute and second
+    (or just the year, month and day) if every date has the same layout
+
+    Returns
+    -------
+    fields : list of tuple or None
+        The first and last (exclusive) column of each field, or ``None`` if
+        the dates don't all have one of the supported layouts
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    charCount = codes.shape[1]
+
+    # the year has as many digits as there are characters before the first
+    # dash in the first date
+    dashes = numpy.nonzero(codes[0, :] == ord('-'))[0]
+    if len(dashes) == 0 or dashes[0] == 0:
+        return None
+    yearDigits = dashes[0]
+
+    # the layout of 'YYYY-MM-DD_hh:mm:ss' after the year, with digits marked
+    # as None and the characters that separate the fields
+    layout = ['-', None, None, '-', None, None, ['_', ' '], None, None, ':',
+              None, None, ':', None, None]
+    dateLength = yearDigits + 6
+    fullLength = yearDigits + len(layout)
+
+    if charCount < dateLength:
+        return None
+
+    isDigit = numpy.logical_and(codes >= ord('0'), codes <= ord('9'))
+    if not numpy.all(isDigit[:, 0:yearDigits]):
+        return None
+
+    if charCount >= fullLength and \
+            _matches(codes, isDigit, yearDigits, layout):
+        length = fullLength
+    elif _matches(codes, isDigit, yearDigits, layout[0:6]):
+        length = dateLength
+    else:
+        return None
+
+    # anything after the date must be padding
+    padding = codes[:, length:]
+    if not numpy.all(numpy.logical_or(padding == ord(' '), padding == 0)):
+        return None
+
+    fields = [(0, yearDigits), (yearDigits + 1, yearDigits + 3),
+              (yearDigits + 4, yearDigits + 6)]
+    if length == fullLength:
+        fields.extend([(yearDigits + 7, yearDigits + 9),
+                       (yearDigits + 10, yearDigits + 12),
+                       (yearDigits + 13, yearDigits + 15)])
+    return fields  # }}}
+
+
+def _matches(codes, isDigit, offset, layout):  # {{{
+    """
+    Whether every date matches the given layout of digits and separators
+    starting at the given column
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    for index, separator in enumerate(layout):
+        column = offset + index
+        if separator is None:
+            valid = isDigit[:, column]
+        else:
+            valid = numpy.zeros(codes.shape[0], dtype=bool)
+            for character in separator:
+                valid = numpy.logical_or(valid,
+                                         codes[:, column] == ord(character))
+        if not numpy.all(valid):
+            return False
+    return True  # }}}
+
+
+def _day_number(year, month, day, calendar, proleptic):  # {{{
+    """
+    The number of days since an arbitrary epoch of each date on the given
+    calendar.  For the 'gregorian' calendar, dates before 1582-10-15 are on
+    the Julian calendar unless ``proleptic`` is ``True``.
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    if calendar == 'gregorian_noleap':
+        return 365*year + _daysBeforeMonth[month - 1] + day
+
+    # the Julian day number, see e.g.
+    # https://en.wikipedia.org/wiki/Julian_day
+    a = (14 - month)//12
+    y = year + 4800 - a
+    m = month + 12*a - 3
+    julianDayNumber = day + (153*m + 2)//5 + 365*y + y//4 - 32083
+    gregorianDayNumber = day + (153*m + 2)//5 + 365*y + y//4 - y//100 + \
+        y//400 - 32045
+
+    if proleptic:
+        return gregorianDayNumber
+
+    isGregorian = (10000*year + 100*month + day) >= 15821015
+    return numpy.where(isGregorian, gregorianDayNumber, julianDayNumber)
+    # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
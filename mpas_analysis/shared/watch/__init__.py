@@ -0,0 +1 @@
+from .watch import get_last_complete_year, limit_end_years
@@ -0,0 +1,130 @@
+"""
+Utilities for following a running simulation: finding the last year for
+which the simulation has written complete monthly output and limiting the
+analysis to complete years.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import os
+import time
+
+from ..io import StreamsFile
+from ..io.utility import build_config_full_path
+
+
+def get_last_complete_year(config, componentName,
+                           streamName='timeSeriesStatsMonthlyOutput',
+                           settleTime=0.):  # {{{
+    """
+    Find the last year for which a component has written all of the monthly
+    output of a given stream.  Each file is assumed to be named with the
+    start date of the month it contains, so a year is complete once the file
+    for its December has been written.
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    componentName : {'ocean', 'seaIce'}
+        The name of the component, used to find its streams file and history
+        directory
+
+    streamName : str, optional
+        The name of the monthly stream
+
+    settleTime : float, optional
+        Files modified less than this many seconds ago are assumed to still be
+        being written and are ignored
+
+    Returns
+    -------
+    lastYear : int or None
+        The last complete year, or ``None`` if the component's streams file
+        or stream can't be found, there is no output yet or no year has been
+        completed since the output (or the analysis, if start years are
+        configured) began
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    streamsFileName = build_config_full_path(
+        config, 'input', '{}StreamsFileName'.format(componentName))
+    if not os.path.exists(streamsFileName):
+        return None
+
+    runDirectory = build_config_full_path(config, 'input', 'runSubdirectory')
+    historyDirectory = build_config_full_path(
+        config, 'input', '{}HistorySubdirectory'.format(componentName),
+        defaultPath=runDirectory)
+
+    streams = StreamsFile(streamsFileName, streamsdir=historyDirectory)
+    if not streams.has_stream(streamName):
+        return None
+
+    try:
+        fileNames = streams.readpath(streamName)
+    except ValueError:
+        # no output yet
+        return None
+
+    now = time.time()
+    fileNames = [fileName for fileName in fileNames if
+                 now - os.path.getmtime(fileName) >= settleTime]
+
+    fileDates = [date for date in streams.get_file_dates(streamName,
+                                                         fileNames)
+                 if date is not None]
+    if len(fileDates) == 0:
+        return None
+
+    lastDate = max(fileDates)
+    if lastDate.month == 12:
+        lastYear = lastDate.year
+    else:
+        lastYear = lastDate.year - 1
+
+    # there is nothing to analyze until the first year the analysis covers
+    # has been completed
+    startYears = [config.getint(section, 'startYear') for section in
+                  ['climatology', 'timeSeries', 'index']
+                  if config.has_option(section, 'startYear')]
+    if len(startYears) == 0:
+        startYears = [min(fileDates).year]
+    if lastYear < min(startYears):
+        return None
+
+    return lastYear  # }}}
+
+
+def limit_end_years(config, lastYear):  # {{{
+    """
+    Limit the end year of climatologies, time series and indices to a given
+    year, so that the analysis only includes complete years of a running
+    simulation
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options, which are modified
+
+    lastYear : int
+        The last year to include in the analysis
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    for section in ['climatology', 'timeSeries', 'index']:
+        if not config.has_option(section, 'endYear'):
+            continue
+        endYear = config.getint(section, 'endYear')
+        if endYear > lastYear:
+            config.set(section, 'endYear', str(lastYear))
+    # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
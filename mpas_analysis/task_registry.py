@@ -0,0 +1,194 @@
+"""
+A registry of the analysis tasks in MPAS-Analysis.  Each entry gives the
+name, component and tags of a task (used with the ``generate`` config option)
+along with the module and class that implement it, so that a task's module
+(and the plotting libraries it imports) is only imported if the task is to be
+generated.
+
+To add a new task, add an entry to ``taskRegistry`` below.
+
+Authors
+-------
+Xylar Asay-Davis
+"""
+
+import importlib
+
+from .shared.analysis_task import check_generate
+
+
+class RegisteredTask(object):  # {{{
+    """
+    A description of an analysis task that can be used to decide whether to
+    generate the task before its module is imported
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+
+    def __init__(self, taskName, componentName, tags, moduleName, className,
+                 kwargs=None):  # {{{
+        """
+        Describe an analysis task
+
+        Parameters
+        ----------
+        taskName : str
+            The name of the task, which must match ``taskName`` of the task
+            object
+
+        componentName : {'ocean', 'seaIce'}
+            The name of the component, which must match ``componentName`` of
+            the task object
+
+        tags : list of str
+            Tags used to describe the task, which must match ``tags`` of the
+            task object
+
+        moduleName : str
+            The full name of the module containing the task's class
+
+        className : str
+            The name of the task's class
+
+        kwargs : dict, optional
+            Keyword arguments (other than ``config``) passed to the class's
+            constructor
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        self.taskName = taskName
+        self.componentName = componentName
+        self.tags = tags
+        self.moduleName = moduleName
+        self.className = className
+        if kwargs is None:
+            kwargs = {}
+        self.kwargs = kwargs  # }}}
+
+    def check_generate(self, config):  # {{{
+        """
+        Determines if this task should be generated, based on the
+        ``generate`` config option
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        return check_generate(config, self.taskName, self.componentName,
+                              self.tags)  # }}}
+
+    def build(self, config):  # {{{
+        """
+        Import the task's module and create the task
+
+        Parameters
+        ----------
+        config :  instance of MpasAnalysisConfigParser
+            Contains configuration options
+
+        Returns
+        -------
+        analysisTask : ``AnalysisTask`` object
+            The task, whose ``setup_and_check`` method has not been called
+
+        Raises
+        ------
+        ValueError
+            If the task's name, component or tags don't match those in the
+            registry
+
+        Authors
+        -------
+        Xylar Asay-Davis
+        """
+        module = importlib.import_module(self.moduleName)
+        analysisTask = getattr(module, self.className)(config=config,
+                                                       **self.kwargs)
+        if analysisTask.taskName != self.taskName or \
+                analysisTask.componentName != self.componentName or \
+                analysisTask.tags != self.tags:
+            raise ValueError('The name, component or tags of task {} do not '
+                             'match those in the task registry.'.format(
+                                 analysisTask.taskName))
+        return analysisTask  # }}}
+
+# }}}
+
+
+taskRegistry = [
+    # Ocean Analyses
+    RegisteredTask('climatologyMapMLD', 'ocean',
+                   ['climatology', 'horizontalMap', 'mld'],
+                   'mpas_analysis.ocean.climatology_map',
+                   'ClimatologyMapMLD'),
+    RegisteredTask('climatologyMapSST', 'ocean',
+                   ['climatology', 'horizontalMap', 'sst'],
+                   'mpas_analysis.ocean.climatology_map',
+                   'ClimatologyMapSST'),
+    RegisteredTask('climatologyMapSSS', 'ocean',
+                   ['climatology', 'horizontalMap', 'sss'],
+                   'mpas_analysis.ocean.climatology_map',
+                   'ClimatologyMapSSS'),
+    RegisteredTask('timeSeriesOHC', 'ocean', ['timeSeries', 'ohc'],
+                   'mpas_analysis.ocean.time_series_ohc', 'TimeSeriesOHC'),
+    RegisteredTask('timeSeriesSST', 'ocean', ['timeSeries', 'sst'],
+                   'mpas_analysis.ocean.time_series_sst', 'TimeSeriesSST'),
+    RegisteredTask('meridionalHeatTransport', 'ocean', ['climatology'],
+                   'mpas_analysis.ocean.meridional_heat_transport',
+                   'MeridionalHeatTransport'),
+    RegisteredTask('streamfunctionMOC', 'ocean',
+                   ['streamfunction', 'moc', 'climatology', 'timeSeries'],
+                   'mpas_analysis.ocean.streamfunction_moc',
+                   'StreamfunctionMOC'),
+    RegisteredTask('indexNino34', 'ocean', ['index', 'nino'],
+                   'mpas_analysis.ocean.index_nino34', 'IndexNino34'),
+
+    # Sea Ice Analyses
+    RegisteredTask('climatologyMapSeaIceConcNH', 'seaIce',
+                   ['climatology', 'horizontalMap', 'seaIceConc'],
+                   'mpas_analysis.sea_ice.climatology_map',
+                   'ClimatologyMapSeaIceConc', {'hemisphere': 'NH'}),
+    RegisteredTask('climatologyMapSeaIceThickNH', 'seaIce',
+                   ['climatology', 'horizontalMap', 'seaIceThick'],
+                   'mpas_analysis.sea_ice.climatology_map',
+                   'ClimatologyMapSeaIceThick', {'hemisphere': 'NH'}),
+    RegisteredTask('climatologyMapSeaIceConcSH', 'seaIce',
+                   ['climatology', 'horizontalMap', 'seaIceConc'],
+                   'mpas_analysis.sea_ice.climatology_map',
+                   'ClimatologyMapSeaIceConc', {'hemisphere': 'SH'}),
+    RegisteredTask('climatologyMapSeaIceThickSH', 'seaIce',
+                   ['climatology', 'horizontalMap', 'seaIceThick'],
+                   'mpas_analysis.sea_ice.climatology_map',
+                   'ClimatologyMapSeaIceThick', {'hemisphere': 'SH'}),
+    RegisteredTask('timeSeriesSeaIceAreaVol', 'seaIce', ['timeSeries'],
+                   'mpas_analysis.sea_ice.time_series', 'TimeSeriesSeaIce')]
+
+
+def build_analysis_tasks(config):  # {{{
+    """
+    Create the analysis tasks selected by the ``generate`` config option,
+    importing only the modules for those tasks
+
+    Parameters
+    ----------
+    config :  instance of MpasAnalysisConfigParser
+        Contains configuration options
+
+    Returns
+    -------
+    analyses : list of ``AnalysisTask`` objects
+        The tasks to generate, whose ``setup_and_check`` methods have not
+        been called
+
+    Authors
+    -------
+    Xylar Asay-Davis
+    """
+    return [registeredTask.build(config) for registeredTask in taskRegistry
+            if registeredTask.check_generate(config)]  # }}}
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,100 @@
+"""
+Unit tests for the automatic chunking policy
+
+Xylar Asay-Davis
+"""
+
+import numpy
+import xarray
+import dask.array
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.generalized_reader.chunk_policy import \
+    compute_chunks, get_chunk_memory, get_time_chunks
+from mpas_analysis.shared.generalized_reader.generalized_reader import \
+    _apply_chunking
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestChunkPolicy(TestCase):
+
+    def setup_config(self, chunkMemory=1.):
+        config = MpasAnalysisConfigParser()
+        config.add_section('input')
+        config.set('input', 'chunkMemory', str(chunkMemory))
+        return config
+
+    def setup_dataset(self):
+        # 120 monthly records of a 3D (8 MB per record) and a 2D field
+        shape3D = (120, 10000, 100)
+        shape2D = (120, 10000)
+        ds = xarray.Dataset(
+            {'temperature': (('Time', 'nCells', 'nVertLevels'),
+                             dask.array.zeros(shape3D, chunks=(1, 10000, 100),
+                                              dtype=numpy.float64)),
+             'ssh': (('Time', 'nCells'),
+                     dask.array.zeros(shape2D, chunks=(1, 10000),
+                                      dtype=numpy.float64))})
+        return ds
+
+    def test_compute_chunks(self):
+        ds = self.setup_dataset()
+        chunkMemory = 1024**2
+
+        # all times and all levels in each chunk of 3D temperature, as many
+        # cells as fit
+        chunks = compute_chunks(ds, 'climatology', chunkMemory)
+        self.assertEqual(chunks['Time'], 120)
+        self.assertEqual(chunks['nVertLevels'], 100)
+        self.assertEqual(chunks['nCells'], chunkMemory//(120*100*8))
+
+        # whole levels, and as many cells as fit, in each record
+        chunks = compute_chunks(ds, 'timeSeries', chunkMemory)
+        self.assertEqual(chunks['Time'], 1)
+        self.assertEqual(chunks['nVertLevels'], 100)
+        self.assertEqual(chunks['nCells'], chunkMemory//(100*8))
+
+        # whole records of the 2D field fit, so several are in each chunk
+        chunks = compute_chunks(ds[['ssh']], 'timeSeries', chunkMemory)
+        self.assertEqual(chunks, {'Time': chunkMemory//(10000*8),
+                                  'nCells': 10000})
+
+        # no more than a year of records in each chunk
+        chunks = compute_chunks(ds, 'climatology', chunkMemory,
+                                maxTimeChunk=12)
+        self.assertEqual(chunks['Time'], 12)
+        self.assertEqual(chunks['nCells'], chunkMemory//(12*100*8))
+
+        with self.assertRaisesRegexp(ValueError, 'access pattern'):
+            compute_chunks(ds, 'random', chunkMemory)
+
+    def test_time_chunks(self):
+        # 10 months of the first year, then 2 full years
+        years = [1]*10 + [2]*12 + [3]*12
+        self.assertEqual(get_time_chunks(years, 1, 12), (10, 12, 12))
+        self.assertEqual(get_time_chunks(years, 2, 24), (22, 12))
+        # blocks larger than the largest chunk are split
+        self.assertEqual(get_time_chunks(years, 2, 8), (8, 8, 6, 8, 4))
+
+    def test_chunk_memory(self):
+        config = self.setup_config(chunkMemory=64.)
+        self.assertEqual(get_chunk_memory(config), 64*1024**2)
+
+        # the memory budget is shared between 4 tasks, each holding 8 chunks
+        config.add_section('execute')
+        config.set('execute', 'memoryBudget', '1.')
+        config.set('execute', 'parallelTaskCount', '4')
+        self.assertEqual(get_chunk_memory(config), 1024**3//32)
+
+    def test_apply_chunking(self):
+        ds = self.setup_dataset()
+        config = self.setup_config(chunkMemory=1.)
+        ds = _apply_chunking(ds, config, 'climatology')
+        # each chunk holds a year, the records in a climatology cache file
+        self.assertEqual(ds.chunks['Time'], (12,)*10)
+        self.assertEqual(ds.chunks['nCells'][0], 1024**2//(12*100*8))
+        self.assertArrayEqual(ds.ssh.mean(dim='Time').values,
+                              numpy.zeros(10000))
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
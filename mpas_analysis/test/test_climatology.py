@@ -22,7 +22,7 @@ from mpas_analysis.shared.climatology import \
     get_mpas_climatology_file_names, get_observation_climatology_file_names, \
     add_years_months_days_in_month, compute_climatology, \
     compute_monthly_climatology, update_climatology_bounds_from_file_names, \
-    cache_climatologies
+    cache_climatologies, get_climatology_cache_file_names
 from mpas_analysis.shared.grid import MpasMeshDescriptor, LatLonGridDescriptor
 from mpas_analysis.shared.constants import constants
 
@@ -38,12 +38,10 @@ class TestClimatology(TestCase):
         # Remove the directory after the test
         shutil.rmtree(self.test_dir)
 
-    def setup_config(self, autocloseFileLimitFraction=0.5,
-                     maxChunkSize=10000):
+    def setup_config(self, maxOpenFiles=0, maxChunkSize=10000):
         config = MpasAnalysisConfigParser()
         config.add_section('input')
-        config.set('input', 'autocloseFileLimitFraction',
-                   str(autocloseFileLimitFraction))
+        config.set('input', 'maxOpenFiles', str(maxOpenFiles))
         config.set('input', 'maxChunkSize', str(maxChunkSize))
         config.set('input', 'mpasMeshName', 'QU240')
 
@@ -218,6 +216,25 @@ class TestClimatology(TestCase):
                                    'year0002.nc'.format(self.test_dir)
         self.assertEqual(remappedFileName, expectedRemappedFileName)
 
+    def test_get_climatology_cache_file_names(self):
+        config = self.setup_config()
+        config.set('climatology', 'startYear', '2')
+        config.set('climatology', 'endYear', '4')
+        config.set('climatology', 'yearsPerCacheFile', '2')
+        cachePrefix = '{}/clim/mpas/sst_QU240_JFM'.format(self.test_dir)
+
+        cacheFileNames = get_climatology_cache_file_names(config, cachePrefix)
+        self.assertEqual(cacheFileNames,
+                         ['{}_years0002-0003.nc'.format(cachePrefix),
+                          '{}_years0004-0005.nc'.format(cachePrefix),
+                          '{}_years0002-0004.nc'.format(cachePrefix)])
+
+        # with a single cache file, it is also the aggregated climatology
+        config.set('climatology', 'endYear', '3')
+        cacheFileNames = get_climatology_cache_file_names(config, cachePrefix)
+        self.assertEqual(cacheFileNames,
+                         ['{}_years0002-0003.nc'.format(cachePrefix)])
+
     def test_get_observation_climatology_file_names(self):
         config = self.setup_config()
         fieldName = 'sst'
@@ -243,10 +260,13 @@ class TestClimatology(TestCase):
         calendar = 'gregorian_noleap'
         ds = self.open_test_ds(config, calendar)
 
-        assert('month' not in ds.coords.keys())
-        assert('daysInMonth' not in ds.coords.keys())
+        # the reader adds the coordinates from the time table, so they
+        # aren't computed again
+        self.assertArrayEqual(ds.month.values, [1, 2, 3])
+        self.assertIs(add_years_months_days_in_month(ds, calendar), ds)
 
         # test add_months_and_days_in_month
+        ds = ds.drop(['year', 'month', 'daysInMonth'])
         ds = add_years_months_days_in_month(ds, calendar)
 
         self.assertArrayEqual(ds.month.values, [1, 2, 3])
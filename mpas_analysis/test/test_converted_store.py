@@ -0,0 +1,140 @@
+"""
+Unit tests for stores of history streams converted into a single compressed,
+chunked file
+
+Xylar Asay-Davis
+"""
+
+import os
+import json
+import shutil
+import tempfile
+
+import numpy
+import netCDF4
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.generalized_reader.converted_store import \
+    ConvertedStore
+from mpas_analysis.shared.generalized_reader.generalized_reader import \
+    open_multifile_dataset
+from mpas_analysis.shared.performance import start_recording, \
+    stop_recording
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestConvertedStore(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.storeFileName = '{}/stores/ocean.timeSeriesStatsMonthlyOutput.' \
+            'nc'.format(self.tempDir)
+        self.timeVariableName = ['xtime_startMonthly', 'xtime_endMonthly']
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def setup_config(self, useStore=True):
+        config = MpasAnalysisConfigParser()
+        config.add_section('input')
+        config.set('input', 'maxChunkSize', '10000')
+        config.set('input', 'multifileReader', 'virtual')
+        config.set('input', 'fileOpenProcessCount', '1')
+        config.add_section('output')
+        config.set('output', 'baseDirectory', self.tempDir)
+        if useStore:
+            config.set('output', 'storeSubdirectory', 'stores')
+        return config
+
+    def write_monthly_file(self, year, month):
+        startTime = '{:04d}-{:02d}-01_00:00:00'.format(year, month)
+        if month == 12:
+            endTime = '{:04d}-01-01_00:00:00'.format(year+1)
+        else:
+            endTime = '{:04d}-{:02d}-01_00:00:00'.format(year, month+1)
+        fileName = '{}/mpaso.hist.am.timeSeriesStatsMonthly.' \
+            '{:04d}-{:02d}-01.nc'.format(self.tempDir, year, month)
+        dataset = netCDF4.Dataset(fileName, 'w')
+        dataset.createDimension('Time', None)
+        dataset.createDimension('StrLen', 64)
+        dataset.createDimension('nCells', 50)
+        for varName, value in [('xtime_startMonthly', startTime),
+                               ('xtime_endMonthly', endTime)]:
+            var = dataset.createVariable(varName, 'S1', ('Time', 'StrLen'))
+            var[0, :] = netCDF4.stringtochar(numpy.array([value], 'S64'))[0]
+        for varName, offset in [('timeMonthly_avg_ssh', 0.),
+                                ('timeMonthly_avg_tThreshMLD', 100.)]:
+            var = dataset.createVariable(varName, 'f8', ('Time', 'nCells'))
+            var[0, :] = offset + 12*year + month + numpy.arange(50.)
+        dataset.close()
+        return fileName
+
+    def test_convert_and_append(self):
+        fileNames = [self.write_monthly_file(1, month) for month in
+                     range(1, 4)]
+        store = ConvertedStore(self.storeFileName)
+        self.assertEqual(store.append(
+            fileNames[0:2], calendar='gregorian_noleap',
+            timeVariableName=self.timeVariableName,
+            variableList=['timeMonthly_avg_ssh'], timeChunkSize=12), 2)
+
+        # new output is appended and files already in the store are skipped
+        store = ConvertedStore(self.storeFileName)
+        self.assertEqual(len(store.times), 2)
+        self.assertEqual(store.append(
+            fileNames, calendar='gregorian_noleap',
+            timeVariableName=self.timeVariableName,
+            variableList=['timeMonthly_avg_ssh'], timeChunkSize=12), 1)
+
+        with open('{}.json'.format(self.storeFileName)) as inFile:
+            index = json.load(inFile)
+        self.assertEqual(len(index['files']), 3)
+        self.assertEqual(len(index['times']), 3)
+
+        dataset = netCDF4.Dataset(self.storeFileName, 'r')
+        var = dataset.variables['timeMonthly_avg_ssh']
+        self.assertEqual(var.shape, (3, 50))
+        self.assertEqual(var.chunking(), [12, 50])
+        self.assertTrue(var.filters()['zlib'])
+        self.assertEqual(sorted(dataset.variables.keys()),
+                         ['timeMonthly_avg_ssh', 'xtime_endMonthly',
+                          'xtime_startMonthly'])
+        dataset.close()
+
+        # the store is read instead of the history files when it holds the
+        # variables from those files
+        datasets = []
+        for useStore in [True, False]:
+            config = self.setup_config(useStore)
+            recorder = start_recording('test')
+            datasets.append(open_multifile_dataset(
+                fileNames=fileNames[1:3], calendar='gregorian_noleap',
+                config=config, timeVariableName=self.timeVariableName,
+                variableList=['timeMonthly_avg_ssh']))
+            stop_recording(success=True)
+            self.assertEqual(recorder.filesOpened, 1 if useStore else 2)
+        self.assertArrayEqual(datasets[0].timeMonthly_avg_ssh.values,
+                              datasets[1].timeMonthly_avg_ssh.values)
+        self.assertArrayEqual(datasets[0].Time.values,
+                              datasets[1].Time.values)
+
+        # the store doesn't have the MLD, so the history files are read
+        config = self.setup_config()
+        recorder = start_recording('test')
+        ds = open_multifile_dataset(
+            fileNames=fileNames, calendar='gregorian_noleap',
+            config=config, timeVariableName=self.timeVariableName,
+            variableList=['timeMonthly_avg_tThreshMLD'])
+        stop_recording(success=True)
+        self.assertEqual(recorder.filesOpened, 3)
+        self.assertEqual(ds.dims['Time'], 3)
+
+        # a history file that changed can't be appended
+        os.utime(fileNames[0], (0, 0))
+        with self.assertRaisesRegexp(ValueError, 'has changed'):
+            store.append(fileNames, calendar='gregorian_noleap',
+                         timeVariableName=self.timeVariableName,
+                         variableList=['timeMonthly_avg_ssh'])
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,106 @@
+"""
+Unit tests for the pool of open files shared by the multi-file readers
+
+Xylar Asay-Davis
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy
+import netCDF4
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.generalized_reader.file_pool import FilePool, \
+    get_file_pool
+from mpas_analysis.shared.generalized_reader.generalized_reader import \
+    open_multifile_dataset
+from mpas_analysis.shared.performance import start_recording, \
+    stop_recording
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestFilePool(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        get_file_pool().close()
+        shutil.rmtree(self.tempDir)
+
+    def write_monthly_file(self, month):
+        fileName = '{}/mpaso.hist.am.timeSeriesStatsMonthly.' \
+            '0001-{:02d}-01.nc'.format(self.tempDir, month)
+        dataset = netCDF4.Dataset(fileName, 'w')
+        dataset.createDimension('Time', None)
+        dataset.createDimension('StrLen', 64)
+        dataset.createDimension('nCells', 10)
+        var = dataset.createVariable('xtime', 'S1', ('Time', 'StrLen'))
+        var[0, :] = netCDF4.stringtochar(numpy.array(
+            ['0001-{:02d}-01_00:00:00'.format(month)], 'S64'))[0]
+        var = dataset.createVariable('ssh', 'f8', ('Time', 'nCells'))
+        var[0, :] = month + numpy.arange(10.)
+        dataset.close()
+        return fileName
+
+    def test_least_recently_used(self):
+        fileNames = [self.write_monthly_file(month) for month in range(1, 4)]
+        pool = FilePool(maxOpenFiles=2)
+        recorder = start_recording('test')
+        for index in [0, 1, 0, 2]:
+            pool.open(fileNames[index])
+        self.assertEqual((pool.hits, pool.misses), (1, 3))
+        self.assertEqual(pool.open_file_count(), 2)
+
+        # the second file was least recently used, so it was closed
+        pool.open(fileNames[0])
+        pool.open(fileNames[1])
+        self.assertEqual((pool.hits, pool.misses), (2, 4))
+        stop_recording(success=True)
+        self.assertEqual(recorder.summary['fileHandleHits'], 2)
+        self.assertEqual(recorder.summary['fileHandleMisses'], 4)
+
+        # a file that has changed since it was opened is only opened again
+        # if the caller asks for it to be checked
+        os.utime(fileNames[1], (0, 0))
+        pool.open(fileNames[1])
+        self.assertEqual(pool.misses, 4)
+        pool.open(fileNames[1], checkForChanges=True)
+        self.assertEqual(pool.misses, 5)
+
+        pool.set_max_open_files(1)
+        self.assertEqual(pool.open_file_count(), 1)
+        pool.close()
+        self.assertEqual(pool.open_file_count(), 0)
+
+    def test_virtual_reader(self):
+        fileNames = [self.write_monthly_file(month) for month in range(1, 7)]
+        config = MpasAnalysisConfigParser()
+        config.add_section('input')
+        config.set('input', 'maxChunkSize', '10000')
+        config.set('input', 'maxOpenFiles', '2')
+        config.set('input', 'multifileReader', 'virtual')
+        config.set('input', 'fileOpenProcessCount', '1')
+
+        recorder = start_recording('test')
+        ds = open_multifile_dataset(fileNames=fileNames,
+                                    calendar='gregorian_noleap',
+                                    config=config,
+                                    timeVariableName='xtime',
+                                    variableList=['ssh'])
+        ssh = ds.ssh.values
+        stop_recording(success=True)
+
+        # no more files than the limit are ever open
+        self.assertEqual(get_file_pool().open_file_count(), 2)
+        self.assertArrayEqual(ssh[:, 0], numpy.arange(1., 7.))
+        # the first file is requested for its metadata, then each file for its
+        # times and again for its data
+        self.assertEqual(recorder.fileHandleHits + recorder.fileHandleMisses,
+                         14)
+        self.assertGreater(recorder.fileHandleHits, 0)
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
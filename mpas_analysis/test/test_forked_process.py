@@ -0,0 +1,57 @@
+"""
+Unit tests for running tasks in forked processes
+
+Xylar Asay-Davis
+"""
+
+import os
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.scheduler import ForkedProcess
+
+
+class TestForkedProcess(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def run_target(self, target):
+        logFileName = '{}/task.log'.format(self.tempDir)
+        logFile = open(logFileName, 'w')
+        logFile.write('header\n')
+        process = ForkedProcess(target, logFile)
+        (pid, status) = os.waitpid(process.pid, 0)
+        logFile.close()
+        with open(logFileName) as logFile:
+            log = logFile.read()
+        return status, log
+
+    def test_success(self):
+        def target():
+            print 'running in child'
+            return None
+
+        status, log = self.run_target(target)
+        self.assertEqual(status, 0)
+        self.assertEqual(log, 'header\nrunning in child\n')
+
+    def test_failure(self):
+        def target():
+            raise ValueError('failure in child')
+
+        status, log = self.run_target(target)
+        self.assertNotEqual(status, 0)
+        self.assertIn('ValueError: failure in child', log)
+
+        def target():
+            return ValueError('failure in child')
+
+        status, log = self.run_target(target)
+        self.assertNotEqual(status, 0)
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -6,9 +6,19 @@ Xylar Asay-Davis
 """
 
 import pytest
+import numpy
+import netCDF4
+import xarray
 from mpas_analysis.test import TestCase, loaddatadir
 from mpas_analysis.shared.generalized_reader.generalized_reader \
-    import open_multifile_dataset
+    import open_multifile_dataset, get_open_file_limit, iterate_years
+from mpas_analysis.shared.generalized_reader import virtual_dataset, \
+    generalized_reader
+from mpas_analysis.shared.generalized_reader.dataset_broker \
+    import DatasetBroker
+from mpas_analysis.shared.generalized_reader.file_pool import get_file_pool
+from mpas_analysis.shared.performance import start_recording, \
+    stop_recording
 from mpas_analysis.configuration.MpasAnalysisConfigParser \
     import MpasAnalysisConfigParser
 
@@ -16,13 +26,14 @@ from mpas_analysis.configuration.MpasAnalysisConfigParser \
 @pytest.mark.usefixtures("loaddatadir")
 class TestGeneralizedReader(TestCase):
 
-    def setup_config(self, autocloseFileLimitFraction=0.5,
-                           maxChunkSize=10000):
+    def setup_config(self, maxOpenFiles=0, maxChunkSize=10000,
+                     multifileReader='mfdataset', fileOpenProcessCount=1):
         config = MpasAnalysisConfigParser()
         config.add_section('input')
-        config.set('input', 'autocloseFileLimitFraction',
-                   str(autocloseFileLimitFraction))
+        config.set('input', 'maxOpenFiles', str(maxOpenFiles))
+        config.set('input', 'fileOpenProcessCount', str(fileOpenProcessCount))
         config.set('input', 'maxChunkSize', str(maxChunkSize))
+        config.set('input', 'multifileReader', multifileReader)
         return config
 
     def test_variableMap(self):
@@ -128,9 +139,9 @@ class TestGeneralizedReader(TestCase):
         variableMap = {'mld': ['timeMonthly_avg_tThreshMLD'],
                        'Time': [['xtime_startMonthly', 'xtime_endMonthly']]}
         annualClimatologies = []
-        for frac, autoclose in zip([1.0, 0.], [False, True]):
+        for maxOpenFiles, autoclose in zip([100, 1], [False, True]):
             # effectively, test with autoclose=False and autoclose=True
-            config = self.setup_config(autocloseFileLimitFraction=frac)
+            config = self.setup_config(maxOpenFiles=maxOpenFiles)
             ds = open_multifile_dataset(
                 fileNames=fileNames,
                 calendar=calendar,
@@ -153,4 +164,413 @@ class TestGeneralizedReader(TestCase):
         self.assertArrayEqual(annualClimatologies[0].mld.values,
                               annualClimatologies[1].mld.values)
 
+    def test_dataset_broker(self):
+        fileNames = [str(self.datadir.join(
+            'timeSeries.0002-{:02d}-01.nc'.format(month)))
+            for month in [1, 2, 3]]
+        calendar = 'gregorian_noleap'
+        timeVariableName = ['xtime_startMonthly', 'xtime_endMonthly']
+        config = self.setup_config()
+        broker = DatasetBroker()
+
+        # two tasks register the same files
+        key = broker.register(fileNames, calendar,
+                              timeVariableName=timeVariableName)
+        self.assertEqual(broker.register(fileNames, calendar,
+                                         timeVariableName=timeVariableName),
+                         key)
+
+        dsMLD = broker.open_dataset(
+            key, config, variableList=['timeMonthly_avg_tThreshMLD'],
+            iselValues={'nCells': slice(0, 10)})
+        dsSSH = broker.open_dataset(key, config,
+                                    variableList=['timeMonthly_avg_ssh'],
+                                    startDate='0002-02-01',
+                                    endDate='0002-03-31')
+
+        # the files were only opened once
+        self.assertEqual(len(broker.datasets), 1)
+        self.assertEqual(dsMLD.data_vars.keys(),
+                         ['timeMonthly_avg_tThreshMLD'])
+        self.assertEqual(dsMLD.dims['nCells'], 10)
+        self.assertEqual(dsMLD.dims['Time'], 3)
+        self.assertEqual(dsSSH.data_vars.keys(), ['timeMonthly_avg_ssh'])
+        self.assertEqual(dsSSH.dims['Time'], 2)
+
+        ds = open_multifile_dataset(fileNames=fileNames, calendar=calendar,
+                                    config=config,
+                                    timeVariableName=timeVariableName,
+                                    variableList=['timeMonthly_avg_ssh'],
+                                    startDate='0002-02-01',
+                                    endDate='0002-03-31')
+        self.assertArrayEqual(dsSSH.timeMonthly_avg_ssh.values,
+                              ds.timeMonthly_avg_ssh.values)
+
+        # the data set stays open until both tasks release it
+        broker.release(key)
+        self.assertEqual(len(broker.datasets), 1)
+        broker.release(key)
+        self.assertEqual(len(broker.datasets), 0)
+
+        with self.assertRaisesRegexp(ValueError, 'registered'):
+            broker.open_dataset(key, config)
+
+    def test_virtual_dataset(self):
+        fileNames = [str(self.datadir.join(
+            'timeSeries.0002-{:02d}-01.nc'.format(month)))
+            for month in [1, 2, 3]]
+        calendar = 'gregorian_noleap'
+        variableMap = {'mld': ['timeMonthly_avg_tThreshMLD'],
+                       'ssh': ['timeMonthly_avg_ssh'],
+                       'Time': [['xtime_startMonthly', 'xtime_endMonthly']]}
+
+        # the first file is repeated, as when a run is restarted
+        for files in [fileNames, fileNames[0:1] + fileNames]:
+            datasets = []
+            for multifileReader in ['mfdataset', 'virtual']:
+                config = self.setup_config(multifileReader=multifileReader)
+                datasets.append(open_multifile_dataset(
+                    fileNames=files,
+                    calendar=calendar,
+                    config=config,
+                    timeVariableName='Time',
+                    variableList=['mld', 'ssh'],
+                    variableMap=variableMap,
+                    iselValues={'nCells': slice(2, 12)},
+                    startDate='0002-02-01',
+                    endDate='0002-03-31'))
+
+            (dsMfdataset, dsVirtual) = datasets
+            self.assertEqual(sorted(dsVirtual.data_vars.keys()),
+                             ['mld', 'ssh'])
+            self.assertEqual(dsVirtual.dims['Time'], 2)
+            self.assertEqual(dsVirtual.dims['nCells'], 10)
+            for coordName in ['Time', 'startTime', 'endTime']:
+                self.assertArrayEqual(dsVirtual[coordName].values,
+                                      dsMfdataset[coordName].values)
+            for varName in ['mld', 'ssh']:
+                self.assertArrayEqual(dsVirtual[varName].values,
+                                      dsMfdataset[varName].values)
+
+        config = self.setup_config(multifileReader='virtual')
+        with self.assertRaisesRegexp(ValueError, 'no Time entries'):
+            open_multifile_dataset(fileNames=fileNames,
+                                   calendar=calendar,
+                                   config=config,
+                                   timeVariableName='Time',
+                                   variableList=['mld'],
+                                   variableMap=variableMap,
+                                   startDate='0003-01-01',
+                                   endDate='0003-12-31')
+
+        # ranges that are open at one end
+        for startDate, endDate, months in [('0002-02-01', None, [2, 3]),
+                                           (None, '0002-01-31', [1])]:
+            ds = open_multifile_dataset(fileNames=fileNames,
+                                        calendar=calendar,
+                                        config=config,
+                                        timeVariableName='Time',
+                                        variableList=['mld'],
+                                        variableMap=variableMap,
+                                        startDate=startDate,
+                                        endDate=endDate)
+            self.assertArrayEqual(ds.month.values, months)
+
+        with self.assertRaisesRegexp(ValueError, '0003-01-01 and None'):
+            open_multifile_dataset(fileNames=fileNames,
+                                   calendar=calendar,
+                                   config=config,
+                                   timeVariableName='Time',
+                                   variableList=['mld'],
+                                   variableMap=variableMap,
+                                   startDate='0003-01-01')
+
+    def test_parallel_time_decoding(self):
+        fileNames = [str(self.datadir.join(
+            'timeSeries.0002-{:02d}-01.nc'.format(month)))
+            for month in [1, 2, 3]]
+        calendar = 'gregorian_noleap'
+        timeVariableName = ['xtime_startMonthly', 'xtime_endMonthly']
+
+        datasets = []
+        for processCount in [1, 3]:
+            # make sure the times are read from the files each time
+            virtual_dataset._timeCache.clear()
+            config = self.setup_config(multifileReader='virtual',
+                                       fileOpenProcessCount=processCount)
+            datasets.append(open_multifile_dataset(
+                fileNames=fileNames,
+                calendar=calendar,
+                config=config,
+                timeVariableName=timeVariableName,
+                variableList=['timeMonthly_avg_ssh']))
+
+        self.assertEqual(len(virtual_dataset._timeCache), 3)
+        for coordName in ['Time', 'startTime', 'endTime']:
+            self.assertArrayEqual(datasets[0][coordName].values,
+                                  datasets[1][coordName].values)
+        self.assertArrayEqual(datasets[0].timeMonthly_avg_ssh.values,
+                              datasets[1].timeMonthly_avg_ssh.values)
+
+    def test_open_file_limit(self):
+        config = self.setup_config(maxOpenFiles=10)
+        self.assertEqual(get_open_file_limit(config), 10)
+
+        # the system limit is divided among parallel tasks
+        config = self.setup_config()
+        serialLimit = get_open_file_limit(config)
+        config.add_section('execute')
+        config.set('execute', 'parallelTaskCount', '4')
+        self.assertEqual(get_open_file_limit(config),
+                         max(serialLimit//4, 1))
+
+    def test_hyperslab_selection(self):
+        # files with one record of a 3D variable each
+        fileNames = []
+        for month in [1, 2]:
+            fileName = str(self.datadir.join(
+                'temperature.0002-{:02d}-01.nc'.format(month)))
+            dataset = netCDF4.Dataset(fileName, 'w')
+            dataset.createDimension('Time', None)
+            dataset.createDimension('StrLen', 64)
+            dataset.createDimension('nCells', 20)
+            dataset.createDimension('nVertLevels', 10)
+            xtime = dataset.createVariable('xtime', 'S1', ('Time', 'StrLen'))
+            xtime[0, :] = netCDF4.stringtochar(numpy.array(
+                ['0002-{:02d}-15_00:00:00'.format(month)], 'S64'))[0]
+            var = dataset.createVariable('temperature', 'f8',
+                                         ('Time', 'nCells', 'nVertLevels'))
+            var[0, :, :] = 100.*month + numpy.arange(200.).reshape(20, 10)
+            dataset.close()
+            fileNames.append(fileName)
+
+        calendar = 'gregorian_noleap'
+        for iselValues, bytesRequested in [
+                ({'nVertLevels': 0}, 2*20*8),
+                ({'nCells': [7, 3, 5], 'nVertLevels': slice(2, 4)},
+                 2*5*2*8)]:
+            datasets = []
+            for multifileReader in ['mfdataset', 'virtual']:
+                config = self.setup_config(multifileReader=multifileReader)
+                recorder = start_recording('test')
+                datasets.append(open_multifile_dataset(
+                    fileNames=fileNames,
+                    calendar=calendar,
+                    config=config,
+                    timeVariableName='xtime',
+                    variableList=['temperature'],
+                    iselValues=iselValues))
+                stop_recording(success=True)
+
+            (dsMfdataset, dsVirtual) = datasets
+            # only the hyperslab (the smallest block containing the
+            # selection) is read from each file
+            self.assertEqual(recorder.bytesRequested, bytesRequested)
+            self.assertEqual(dsVirtual.temperature.dims,
+                             dsMfdataset.temperature.dims)
+            self.assertArrayEqual(dsVirtual.temperature.values,
+                                  dsMfdataset.temperature.values)
+
+    def test_dataset_broker_hyperslab(self):
+        # files with one record of 3D temperature and salinity and 2D layer
+        # thickness each
+        fileNames = []
+        for month in [1, 2]:
+            fileName = str(self.datadir.join(
+                'tracers.0002-{:02d}-01.nc'.format(month)))
+            dataset = netCDF4.Dataset(fileName, 'w')
+            dataset.createDimension('Time', None)
+            dataset.createDimension('StrLen', 64)
+            dataset.createDimension('nCells', 20)
+            dataset.createDimension('nVertLevels', 10)
+            xtime = dataset.createVariable('xtime', 'S1', ('Time', 'StrLen'))
+            xtime[0, :] = netCDF4.stringtochar(numpy.array(
+                ['0002-{:02d}-15_00:00:00'.format(month)], 'S64'))[0]
+            for varName in ['temperature', 'salinity', 'layerThickness']:
+                var = dataset.createVariable(
+                    varName, 'f8', ('Time', 'nCells', 'nVertLevels'))
+                var[0, :, :] = 100.*month + \
+                    numpy.arange(200.).reshape(20, 10)
+            var = dataset.createVariable('mld', 'f8', ('Time', 'nCells'))
+            var[0, :] = numpy.arange(20.)
+            dataset.close()
+            fileNames.append(fileName)
+
+        calendar = 'gregorian_noleap'
+        config = self.setup_config(multifileReader='virtual')
+        broker = DatasetBroker()
+
+        # like the SST, SSS and MLD tasks, reading the top level of two
+        # variables and a variable without vertical levels
+        key = broker.register(fileNames, calendar, timeVariableName='xtime',
+                              variableList=['temperature'],
+                              iselValues={'nVertLevels': 0})
+        broker.register(fileNames, calendar, timeVariableName='xtime',
+                        variableList=['salinity'],
+                        iselValues={'nVertLevels': 0})
+        broker.register(fileNames, calendar, timeVariableName='xtime',
+                        variableList=['mld'])
+
+        recorder = start_recording('test')
+        dsSST = broker.open_dataset(key, config,
+                                    variableList=['temperature'],
+                                    iselValues={'nVertLevels': 0})
+        dsMLD = broker.open_dataset(key, config, variableList=['mld'])
+        stop_recording(success=True)
+
+        # only the top level of temperature and salinity and the MLD are
+        # read, not layer thickness or the levels below
+        self.assertEqual(recorder.bytesRequested, 3*2*20*8)
+        self.assertEqual(sorted(broker.datasets[key].data_vars.keys()),
+                         ['mld', 'salinity', 'temperature'])
+
+        ds = open_multifile_dataset(fileNames=fileNames, calendar=calendar,
+                                    config=config, timeVariableName='xtime',
+                                    variableList=['temperature'],
+                                    iselValues={'nVertLevels': 0})
+        self.assertEqual(dsSST.temperature.dims, ds.temperature.dims)
+        self.assertArrayEqual(dsSST.temperature.values,
+                              ds.temperature.values)
+        self.assertArrayEqual(dsMLD.mld.values, numpy.tile(numpy.arange(20.),
+                                                           (2, 1)))
+
+        # a task that needs more than was registered reads the files itself
+        dsDeep = broker.open_dataset(key, config,
+                                     variableList=['temperature'],
+                                     iselValues={'nVertLevels': 5})
+        self.assertArrayEqual(dsDeep.temperature.values,
+                              ds.temperature.values + 5.)
+
+    def test_iterate_years(self):
+        # monthly files covering 3 years
+        fileNames = []
+        for year in [1, 2, 3]:
+            for month in range(1, 13):
+                fileName = str(self.datadir.join(
+                    'monthly.{:04d}-{:02d}-01.nc'.format(year, month)))
+                dataset = netCDF4.Dataset(fileName, 'w')
+                dataset.createDimension('Time', None)
+                dataset.createDimension('StrLen', 64)
+                dataset.createDimension('nCells', 4)
+                nextYear, nextMonth = divmod(12*(year-1) + month, 12)
+                for varName, date in [
+                        ('xtime_startMonthly', (year, month)),
+                        ('xtime_endMonthly', (nextYear + 1, nextMonth + 1))]:
+                    var = dataset.createVariable(varName, 'S1',
+                                                 ('Time', 'StrLen'))
+                    var[0, :] = netCDF4.stringtochar(numpy.array(
+                        ['{:04d}-{:02d}-01_00:00:00'.format(*date)],
+                        'S64'))[0]
+                var = dataset.createVariable('ssh', 'f8', ('Time', 'nCells'))
+                var[0, :] = 12*year + month + numpy.arange(4.)
+                dataset.close()
+                fileNames.append(fileName)
+
+        calendar = 'gregorian_noleap'
+        timeVariableName = ['xtime_startMonthly', 'xtime_endMonthly']
+        for multifileReader in ['mfdataset', 'virtual']:
+            config = self.setup_config(multifileReader=multifileReader)
+            dsAll = open_multifile_dataset(fileNames=fileNames,
+                                           calendar=calendar,
+                                           config=config,
+                                           timeVariableName=timeVariableName,
+                                           variableList=['ssh'],
+                                           startDate='0001-03-01',
+                                           endDate='0003-12-31')
+            blocks = list(iterate_years(fileNames=fileNames,
+                                        calendar=calendar,
+                                        config=config,
+                                        timeVariableName=timeVariableName,
+                                        variableList=['ssh'],
+                                        startDate='0001-03-01',
+                                        endDate='0003-12-31',
+                                        yearsPerBlock=2))
+            self.assertEqual([ds.dims['Time'] for ds in blocks], [22, 12])
+            self.assertArrayEqual(numpy.unique(blocks[0].year.values), [1, 2])
+            self.assertArrayEqual(blocks[1].month.values, range(1, 13))
+            self.assertArrayEqual(blocks[1].daysInMonth.values,
+                                  [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30,
+                                   31])
+            self.assertArrayEqual(
+                numpy.concatenate([ds.ssh.values for ds in blocks]),
+                dsAll.ssh.values)
+
+    def test_climatology_chunks(self):
+        # monthly files covering 3 years
+        fileNames = []
+        for year in [1, 2, 3]:
+            for month in range(1, 13):
+                fileName = str(self.datadir.join(
+                    'climatology.{:04d}-{:02d}-01.nc'.format(year, month)))
+                dataset = netCDF4.Dataset(fileName, 'w')
+                dataset.createDimension('Time', None)
+                dataset.createDimension('StrLen', 64)
+                dataset.createDimension('nCells', 4)
+                xtime = dataset.createVariable('xtime', 'S1',
+                                               ('Time', 'StrLen'))
+                xtime[0, :] = netCDF4.stringtochar(numpy.array(
+                    ['{:04d}-{:02d}-15_00:00:00'.format(year, month)],
+                    'S64'))[0]
+                var = dataset.createVariable('ssh', 'f8', ('Time', 'nCells'))
+                var[0, :] = 12*year + month + numpy.arange(4.)
+                dataset.close()
+                fileNames.append(fileName)
+
+        config = self.setup_config(multifileReader='virtual')
+        config.add_section('climatology')
+        config.set('climatology', 'yearsPerCacheFile', '1')
+        ds = open_multifile_dataset(fileNames=fileNames,
+                                    calendar='gregorian_noleap',
+                                    config=config,
+                                    timeVariableName='xtime',
+                                    variableList=['ssh'],
+                                    chunking='climatology')
+        self.assertEqual(ds.chunks['Time'], (12, 12, 12))
+
+        # as when caching climatologies, each year is selected by index and
+        # computed on its own, reading only the files for that year
+        filePool = get_file_pool()
+        for year in [1, 2, 3]:
+            filePool.close()
+            misses = filePool.misses
+            dsYear = ds.isel(Time=numpy.nonzero(ds.year.values == year)[0])
+            self.assertArrayEqual(dsYear.ssh.mean(dim='Time').values,
+                                  12*year + 6.5 + numpy.arange(4.))
+            self.assertEqual(filePool.misses - misses, 12)
+
+    def test_preprocess_plan(self):
+        fileNames = [str(self.datadir.join(
+            'timeSeries.0002-{:02d}-01.nc'.format(month)))
+            for month in [1, 2, 3]]
+        arguments = {'calendar': 'gregorian_noleap',
+                     'simulationStartTime': None,
+                     'timeVariableName': 'Time',
+                     'variableList': ['mld'],
+                     'selValues': None,
+                     'iselValues': {'nCells': slice(2, 12)},
+                     'variableMap': {
+                         'mld': ['timeMonthly_avg_tThreshMLD'],
+                         'Time': [['xtime_startMonthly',
+                                   'xtime_endMonthly']]},
+                     'startDate': None,
+                     'endDate': None}
+
+        plan = generalized_reader._PreprocessPlan(**arguments)
+        for fileName in fileNames:
+            ds = xarray.open_dataset(fileName, decode_times=False)
+            # the plan gives the same result as preprocessing each file in
+            # full
+            self.assertTrue(plan(ds).identical(
+                generalized_reader._preprocess(ds, **arguments)))
+        self.assertEqual(plan.fallbackCount, 0)
+        self.assertIn('timeMonthly_avg_ssh', plan.dropBeforeTime)
+        self.assertEqual(plan.dropAfterTime,
+                         ['xtime_endMonthly', 'xtime_startMonthly'])
+
+        # a file with other variables is preprocessed in full
+        ds = ds.drop(['timeMonthly_avg_ssh'])
+        self.assertTrue(plan(ds).identical(
+            generalized_reader._preprocess(ds, **arguments)))
+        self.assertEqual(plan.fallbackCount, 1)
+
 # vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,81 @@
+"""
+Unit tests for the manifests used to skip tasks that are up to date
+
+Xylar Asay-Davis
+"""
+
+import os
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.analysis_task import AnalysisTask
+from mpas_analysis.shared.manifest import write_manifest, is_up_to_date, \
+    get_manifest_file_name
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestManifest(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.config = MpasAnalysisConfigParser()
+        self.config.add_section('output')
+        self.config.set('output', 'baseDirectory', self.tempDir)
+        self.config.set('output', 'manifestSubdirectory', 'manifests')
+        self.config.add_section('myTask')
+        self.config.set('myTask', 'startYear', '1')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def build_task(self):
+        task = AnalysisTask(config=self.config, taskName='myTask',
+                            componentName='ocean')
+        self.inputFileName = '{}/input.nc'.format(self.tempDir)
+        self.touch(self.inputFileName, 'input')
+        task.add_input_files([self.inputFileName], ['temperature'])
+        task.xmlFileNames = ['{}/myTask.xml'.format(self.tempDir)]
+        for fileName in task.get_output_files():
+            self.touch(fileName, 'output')
+        return task
+
+    def touch(self, fileName, contents):
+        with open(fileName, 'w') as outFile:
+            outFile.write(contents)
+
+    def test_up_to_date(self):
+        task = self.build_task()
+        # there is no manifest until the task has run
+        self.assertFalse(is_up_to_date(task))
+        write_manifest(task)
+        self.assertTrue(os.path.exists(
+            get_manifest_file_name(self.config, 'myTask')))
+        self.assertTrue(is_up_to_date(task))
+
+    def test_changed_input(self):
+        task = self.build_task()
+        write_manifest(task)
+        self.touch(self.inputFileName, 'more input')
+        self.assertFalse(is_up_to_date(task))
+
+    def test_changed_config(self):
+        task = self.build_task()
+        write_manifest(task)
+        self.config.set('myTask', 'startYear', '2')
+        self.assertFalse(is_up_to_date(task))
+
+    def test_missing_output(self):
+        task = self.build_task()
+        write_manifest(task)
+        os.remove('{}/myTask.png'.format(self.tempDir))
+        self.assertFalse(is_up_to_date(task))
+
+    def test_corrupt_manifest(self):
+        task = self.build_task()
+        write_manifest(task)
+        self.touch(get_manifest_file_name(self.config, 'myTask'), '{"task')
+        self.assertFalse(is_up_to_date(task))
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
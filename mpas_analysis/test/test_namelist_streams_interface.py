@@ -6,9 +6,12 @@ Phillip J. Wolfram, Xylar Asay-Davis
 10/26/2016
 """
 
+import os
 import pytest
 from mpas_analysis.test import TestCase, loaddatadir
-from mpas_analysis.shared.io import NameList, StreamsFile
+from mpas_analysis.shared.io import NameList, StreamsFile, RunContext
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
 
 
 @pytest.mark.usefixtures("loaddatadir")
@@ -105,4 +108,66 @@ class TestNamelist(TestCase):
         expectedFiles = ['{}/mesh.nc'.format(self.sf.streamsdir)]
         self.assertEqual(files, expectedFiles)
 
+    def test_run_context(self):
+        nlpath = bytes(self.datadir.join('namelist.ocean'))
+        sfpath = bytes(self.datadir.join('streams.ocean'))
+        runContext = RunContext()
+
+        # files are only parsed once
+        namelist = runContext.get_namelist(nlpath)
+        self.assertTrue(runContext.get_namelist(nlpath) is namelist)
+        streams = runContext.get_streams_file(sfpath)
+        self.assertTrue(runContext.get_streams_file(sfpath) is streams)
+        self.assertFalse(runContext.get_streams_file(
+            sfpath, streamsdir=bytes(self.datadir)) is streams)
+
+        files = streams.readpath('output', startDate='0001-01-02',
+                                 endDate='0001-12-30')
+        self.assertEqual(len(files), 2)
+
+        # the stream's files are only searched for once, so a new file isn't
+        # found until the run context is cleared
+        newFileName = '{}/output/output.0001-03-01_00.00.00.nc'.format(
+            streams.streamsdir)
+        open(newFileName, 'w').close()
+        files = streams.readpath('output', startDate='0001-01-02',
+                                 endDate='0001-12-30')
+        self.assertEqual(len(files), 2)
+
+        runContext.clear()
+        streams = runContext.get_streams_file(sfpath)
+        files = streams.readpath('output', startDate='0001-01-02',
+                                 endDate='0001-12-30')
+        self.assertEqual(files[-1], newFileName)
+        self.assertEqual(len(files), 3)
+
+    def test_write_read_run_context(self):
+        sfpath = bytes(self.datadir.join('streams.ocean'))
+        contextFileName = bytes(self.datadir.join('run_context.pickle'))
+        config = MpasAnalysisConfigParser()
+        config.add_section('climatology')
+        config.set('climatology', 'startYear', '2')
+        config.set('climatology', 'comparisonTimes', "['JFM', 'ANN']")
+
+        runContext = RunContext()
+        streams = runContext.get_streams_file(sfpath)
+        expectedFiles = streams.readpath('output', startDate='0001-01-02',
+                                         endDate='0001-12-30')
+        runContext.write(contextFileName, config)
+
+        # a file that is removed after the run context was written is still
+        # found, since the subtask uses the same files as the main process
+        os.remove(expectedFiles[-1])
+
+        subtaskContext = RunContext()
+        subtaskConfig = subtaskContext.read(contextFileName)
+        self.assertEqual(subtaskConfig.getint('climatology', 'startYear'), 2)
+        self.assertEqual(subtaskConfig.getExpression('climatology',
+                                                     'comparisonTimes'),
+                         ['JFM', 'ANN'])
+        streams = subtaskContext.get_streams_file(sfpath)
+        self.assertEqual(streams.readpath('output', startDate='0001-01-02',
+                                          endDate='0001-12-30'),
+                         expectedFiles)
+
 # vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
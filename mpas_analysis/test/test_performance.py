@@ -0,0 +1,101 @@
+"""
+Unit tests for recording the performance of tasks and phases
+
+Xylar Asay-Davis
+"""
+
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.performance import start_recording, \
+    stop_recording, get_recorder, record_phase, record_files_opened, \
+    read_performance_reports, format_duration
+
+
+@record_phase('load')
+def load(fileCount):
+    record_files_opened(fileCount)
+    return [0]*100000
+
+
+@record_phase('climatology')
+def compute(fileCount):
+    # loading within another phase counts toward that phase
+    return sum(load(fileCount))
+
+
+class TestPerformance(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_phases(self):
+        # nothing is recorded when no task is running
+        self.assertEqual(get_recorder(), None)
+        self.assertEqual(len(load(1)), 100000)
+
+        recorder = start_recording('myTask')
+        self.assertIs(get_recorder(), recorder)
+        load(3)
+        load(2)
+        self.assertEqual(compute(4), 0)
+        stop_recording(success=True)
+        self.assertEqual(get_recorder(), None)
+
+        summary = recorder.summary
+        self.assertEqual(summary['name'], 'myTask')
+        self.assertTrue(summary['success'])
+        self.assertEqual(summary['filesOpened'], 9)
+        self.assertEqual(summary['phases'].keys(), ['load', 'climatology'])
+        self.assertEqual(summary['phases']['load']['calls'], 2)
+        self.assertEqual(summary['phases']['load']['filesOpened'], 5)
+        self.assertEqual(summary['phases']['climatology']['calls'], 1)
+        self.assertEqual(summary['phases']['climatology']['filesOpened'], 4)
+        for key in ['wallTime', 'cpuTime', 'bytesRead']:
+            self.assertGreaterEqual(summary[key], 0)
+        if recorder.firstInProcess:
+            self.assertGreater(summary['peakRSS'], 0)
+        self.assertGreaterEqual(summary['wallTime'],
+                                summary['phases']['load']['wallTime'])
+
+        recorder.write(self.tempDir)
+        reports = read_performance_reports(self.tempDir,
+                                           ['myTask', 'otherTask'])
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['name'], 'myTask')
+        self.assertEqual(reports[0]['phases'].keys(), ['load', 'climatology'])
+
+    def test_failure(self):
+        recorder = start_recording('myTask')
+        with self.assertRaises(ValueError):
+            self.raise_in_phase()
+        # the phase was ended despite the exception
+        self.assertEqual(recorder.activePhase, None)
+        stop_recording(success=False)
+        self.assertFalse(recorder.summary['success'])
+        self.assertEqual(recorder.summary['phases']['plot']['calls'], 1)
+
+    @record_phase('plot')
+    def raise_in_phase(self):
+        raise ValueError('failed to plot')
+
+    def test_peak_rss(self):
+        start_recording('firstTask')
+        stop_recording(success=True)
+        # a task that doesn't raise the process's peak can't report the
+        # peak of an earlier task
+        recorder = start_recording('otherTask')
+        self.assertFalse(recorder.firstInProcess)
+        stop_recording(success=True)
+        if recorder.summary['peakRSS'] is not None:
+            self.assertGreater(recorder.summary['peakRSS'],
+                               recorder.start['peakRSS'])
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(3725.5), '1:02:05.50')
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,61 @@
+"""
+Unit tests for monitoring the processes running tasks
+
+Xylar Asay-Davis
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.scheduler import ProcessMonitor, ForkedProcess
+
+
+class TestProcessMonitor(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_finish_order(self):
+        monitor = ProcessMonitor()
+        monitor.add('slow', subprocess.Popen(['sleep', '1']))
+        monitor.add('fast', subprocess.Popen(['true']))
+        self.assertEqual(sorted(monitor.get_names()), ['fast', 'slow'])
+
+        (name, process) = monitor.wait()
+        self.assertEqual(name, 'fast')
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(monitor.get_names(), ['slow'])
+        self.assertGreaterEqual(monitor.get_elapsed_times()['slow'], 0.)
+
+        (name, process) = monitor.wait()
+        self.assertEqual(name, 'slow')
+        self.assertEqual(monitor.get_names(), [])
+
+    def test_timeout_and_terminate(self):
+        def target():
+            time.sleep(60)
+
+        logFile = open('{}/task.log'.format(self.tempDir), 'w')
+        monitor = ProcessMonitor()
+        monitor.add('forked', ForkedProcess(target, logFile))
+
+        (name, process) = monitor.wait(timeout=0.1)
+        self.assertEqual(name, None)
+
+        monitor.terminate('forked')
+        (name, process) = monitor.wait()
+        logFile.close()
+        self.assertEqual(name, 'forked')
+        self.assertNotEqual(process.returncode, 0)
+        # the child has been reaped
+        with self.assertRaises(OSError):
+            os.waitpid(process.pid, os.WNOHANG)
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,124 @@
+"""
+Unit tests for estimating the resources used by tasks and packing tasks onto
+a node
+
+Xylar Asay-Davis
+"""
+
+import os
+import shutil
+import tempfile
+import numpy
+import xarray
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.scheduler.resources import \
+    estimate_input_memory, estimate_input_bytes, select_tasks_to_launch, \
+    bytesPerGB
+
+
+class TestResources(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_estimate_input_memory(self):
+        nTime = 2
+        nCells = 100
+        nEdges = 300
+        nVertLevels = 10
+        ds = xarray.Dataset()
+        ds['temperature'] = (('Time', 'nCells', 'nVertLevels'),
+                             numpy.zeros((nTime, nCells, nVertLevels)))
+        ds['normalVelocity'] = (('Time', 'nEdges', 'nVertLevels'),
+                                numpy.zeros((nTime, nEdges, nVertLevels),
+                                            numpy.float32))
+        fileNames = []
+        for index in range(3):
+            fileName = '{}/file{}.nc'.format(self.tempDir, index)
+            ds.to_netcdf(fileName)
+            fileNames.append(fileName)
+
+        # all 6 time slices of a double-precision 3D field
+        group = {'fileNames': fileNames,
+                 'variableList': ['temperature'],
+                 'iselValues': None,
+                 'timeSlicesInMemory': None}
+        self.assertEqual(estimate_input_memory([group]),
+                         6*8*nCells*nVertLevels)
+
+        # a single level, at most 4 time slices at once, and a variable that
+        # isn't in the file
+        group['iselValues'] = {'nVertLevels': 0}
+        group['timeSlicesInMemory'] = 4
+        group['variableList'] = ['temperature', 'salinity']
+        self.assertEqual(estimate_input_memory([group]), 4*8*nCells)
+
+        # two groups add up
+        group2 = {'fileNames': fileNames[0:1],
+                  'variableList': ['normalVelocity'],
+                  'iselValues': None,
+                  'timeSlicesInMemory': None}
+        self.assertEqual(estimate_input_memory([group, group2]),
+                         4*8*nCells + 2*4*nEdges*nVertLevels)
+
+        # all time slices are read, even if only some are in memory at once
+        self.assertEqual(estimate_input_bytes([group, group2]),
+                         6*8*nCells + 2*4*nEdges*nVertLevels)
+
+        # without a variable list, the whole files are read
+        group3 = {'fileNames': fileNames,
+                  'variableList': None,
+                  'iselValues': None,
+                  'timeSlicesInMemory': None}
+        self.assertEqual(estimate_input_memory([group3]), 0.)
+        self.assertEqual(estimate_input_bytes([group3]),
+                         sum([os.path.getsize(fileName) for fileName in
+                              fileNames]))
+
+    def test_select_tasks_to_launch(self):
+        resources = {'big': (20*bytesPerGB, 1),
+                     'medium': (8*bytesPerGB, 1),
+                     'small': (bytesPerGB, 1),
+                     'multicore': (bytesPerGB, 12)}
+
+        # small tasks fill in around large ones
+        selected = select_tasks_to_launch(['big', 'medium', 'small'], [],
+                                          resources, coreBudget=8,
+                                          memoryBudget=24*bytesPerGB)
+        self.assertEqual(selected, ['big', 'small'])
+
+        # the core budget still applies
+        selected = select_tasks_to_launch(['big', 'medium', 'small'], [],
+                                          resources, coreBudget=1,
+                                          memoryBudget=24*bytesPerGB)
+        self.assertEqual(selected, ['big'])
+
+        # nothing fits while the big task is running
+        selected = select_tasks_to_launch(['medium'], ['big'], resources,
+                                          coreBudget=8,
+                                          memoryBudget=24*bytesPerGB)
+        self.assertEqual(selected, [])
+
+        # a task bigger than the budget runs on its own
+        selected = select_tasks_to_launch(['big', 'small'], [], resources,
+                                          coreBudget=8,
+                                          memoryBudget=16*bytesPerGB)
+        self.assertEqual(selected, ['big'])
+
+        # a task needing more cores than available uses all of them
+        selected = select_tasks_to_launch(['multicore', 'small'], [],
+                                          resources, coreBudget=8,
+                                          memoryBudget=0)
+        self.assertEqual(selected, ['multicore'])
+
+        # no memory limit
+        selected = select_tasks_to_launch(['big', 'medium', 'small'], [],
+                                          resources, coreBudget=8,
+                                          memoryBudget=0)
+        self.assertEqual(selected, ['big', 'medium', 'small'])
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,60 @@
+"""
+Unit tests for the history of task runtimes used to schedule tasks
+
+Xylar Asay-Davis
+"""
+
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.scheduler import RuntimeHistory, find_stragglers
+
+
+class TestRuntimeHistory(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.fileName = '{}/history/runtime_history.json'.format(self.tempDir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_history(self):
+        history = RuntimeHistory(self.fileName, 'QU240', maxRuns=3)
+        self.assertEqual(history.get_expected_runtime('taskA'), None)
+        for runtime in [100., 10., 20., 30.]:
+            history.add_runtime('taskA', runtime)
+        # only the last 3 runtimes are kept
+        self.assertEqual(history.get_expected_runtime('taskA'), 20.)
+        history.write()
+
+        history = RuntimeHistory(self.fileName, 'QU240', maxRuns=3)
+        self.assertEqual(history.get_expected_runtime('taskA'), 20.)
+        history.add_runtime('taskA', 40.)
+        self.assertEqual(history.get_expected_runtime('taskA'), 30.)
+
+        # runtimes are separate for each mesh
+        history = RuntimeHistory(self.fileName, 'EC60to30')
+        self.assertEqual(history.get_expected_runtime('taskA'), None)
+
+    def test_corrupt_history(self):
+        with open('{}/runtime_history.json'.format(self.tempDir), 'w') as \
+                outFile:
+            outFile.write('{"QU240": ')
+        history = RuntimeHistory('{}/runtime_history.json'.format(
+            self.tempDir), 'QU240')
+        self.assertEqual(history.get_expected_runtime('taskA'), None)
+
+    def test_find_stragglers(self):
+        elapsedTimes = {'taskA': 50., 'taskB': 250., 'taskC': 1000.}
+        expectedRuntimes = {'taskA': 100., 'taskB': 100., 'taskC': None}
+        self.assertEqual(find_stragglers(elapsedTimes, expectedRuntimes, 2.),
+                         ['taskB'])
+        self.assertEqual(find_stragglers(elapsedTimes, expectedRuntimes,
+                                         0.1), ['taskA', 'taskB'])
+        # a factor of 0 turns off the check
+        self.assertEqual(find_stragglers(elapsedTimes, expectedRuntimes, 0.),
+                         [])
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
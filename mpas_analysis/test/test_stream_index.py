@@ -0,0 +1,105 @@
+"""
+Unit tests for the persistent index of the times in the files produced by a
+stream
+
+Xylar Asay-Davis
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy
+import netCDF4
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.io import StreamsFile
+from mpas_analysis.shared.io.stream_index import StreamIndex
+
+
+class TestStreamIndex(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.indexDirectory = '{}/stream_indices'.format(self.tempDir)
+        self.streamsFileName = '{}/streams.ocean'.format(self.tempDir)
+        with open(self.streamsFileName, 'w') as streamsFile:
+            streamsFile.write(
+                '<streams>\n'
+                '<stream name="timeSeriesStatsMonthlyOutput"\n'
+                '        type="output"\n'
+                '        filename_template="mpaso.hist.am.'
+                'timeSeriesStatsMonthly.$Y-$M-$D.nc"\n'
+                '        output_interval="00-01-00_00:00:00" >\n'
+                '</stream>\n'
+                '</streams>\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def write_monthly_file(self, year, month):
+        startTime = '{:04d}-{:02d}-01_00:00:00'.format(year, month)
+        if month == 12:
+            endTime = '{:04d}-01-01_00:00:00'.format(year+1)
+        else:
+            endTime = '{:04d}-{:02d}-01_00:00:00'.format(year, month+1)
+        fileName = '{}/mpaso.hist.am.timeSeriesStatsMonthly.' \
+            '{:04d}-{:02d}-01.nc'.format(self.tempDir, year, month)
+        dataset = netCDF4.Dataset(fileName, 'w')
+        dataset.createDimension('Time', None)
+        dataset.createDimension('StrLen', 64)
+        for varName, value in [('xtime_startMonthly', startTime),
+                               ('xtime_endMonthly', endTime)]:
+            var = dataset.createVariable(varName, 'S1', ('Time', 'StrLen'))
+            var[0, :] = netCDF4.stringtochar(numpy.array([value], 'S64'))[0]
+        dataset.close()
+        return fileName
+
+    def test_exact_selection(self):
+        fileNames = [self.write_monthly_file(year, month) for year, month in
+                     [(1, 11), (1, 12), (2, 1), (2, 2)]]
+        streams = StreamsFile(self.streamsFileName, streamsdir=self.tempDir,
+                              indexDirectory=self.indexDirectory)
+
+        # December of year 1 ends exactly when year 2 begins, so it isn't
+        # needed
+        self.assertEqual(
+            streams.readpath('timeSeriesStatsMonthlyOutput',
+                             startDate='0002-01-01', endDate='0002-12-31'),
+            fileNames[2:])
+        self.assertEqual(
+            streams.readpath('timeSeriesStatsMonthlyOutput',
+                             startDate='0001-12-15', endDate='0002-01-15'),
+            fileNames[1:3])
+        self.assertEqual(
+            streams.readpath('timeSeriesStatsMonthlyOutput'), fileNames)
+
+    def test_incremental_update(self):
+        fileNames = [self.write_monthly_file(1, month) for month in [1, 2]]
+        streams = StreamsFile(self.streamsFileName, streamsdir=self.tempDir,
+                              indexDirectory=self.indexDirectory)
+        streams.readpath('timeSeriesStatsMonthlyOutput')
+
+        indexFileName = '{}/streams.ocean.timeSeriesStatsMonthlyOutput.' \
+            'json'.format(self.indexDirectory)
+        self.assertTrue(os.path.exists(indexFileName))
+
+        fileDates = streams.get_file_dates('timeSeriesStatsMonthlyOutput',
+                                           fileNames)
+
+        # nothing has changed, so no files need to be read
+        streamIndex = StreamIndex(indexFileName)
+        timeBounds = streamIndex.update(fileNames, fileDates)
+        self.assertFalse(streamIndex.changed)
+        self.assertEqual(timeBounds[1][0], fileDates[1])
+
+        # a new file is read and added to the index
+        fileNames.append(self.write_monthly_file(1, 3))
+        fileDates = streams.get_file_dates('timeSeriesStatsMonthlyOutput',
+                                           fileNames)
+        timeBounds = streamIndex.update(fileNames, fileDates)
+        self.assertTrue(streamIndex.changed)
+        self.assertEqual(len(streamIndex.entries), 3)
+        self.assertEqual(timeBounds[2][1], fileDates[2].replace(month=4))
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
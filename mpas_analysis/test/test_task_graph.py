@@ -0,0 +1,163 @@
+"""
+Unit tests for the task graph used to schedule analysis tasks and stages
+
+Xylar Asay-Davis
+"""
+
+import os
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.analysis_task import AnalysisTask
+from mpas_analysis.shared.analysis_stage import AnalysisStage
+from mpas_analysis.shared.scheduler import TaskGraph, estimate_wall_time
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestTaskGraph(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.config = MpasAnalysisConfigParser()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def build_task(self, taskName, stages):
+        task = AnalysisTask(config=self.config, taskName=taskName,
+                            componentName='ocean')
+        for stage in stages:
+            task.add_stage(stage)
+        return task
+
+    def build_stage(self, stageName, inputs=None, outputs=None):
+        return AnalysisStage(config=self.config, stageName=stageName,
+                             inputs=inputs, outputs=outputs)
+
+    def test_shared_stage(self):
+        mappingFile = '{}/map.nc'.format(self.tempDir)
+        tasks = [self.build_task('taskA', [self.build_stage(
+                     'mapping', outputs=[mappingFile])]),
+                 self.build_task('taskB', [self.build_stage(
+                     'mapping', outputs=[mappingFile])]),
+                 self.build_task('taskC', [])]
+
+        graph = TaskGraph(tasks)
+
+        # the shared stage only appears once
+        self.assertEqual(graph.nodes.keys(),
+                         ['mapping', 'taskA', 'taskB', 'taskC'])
+        self.assertTrue(graph.is_stage('mapping'))
+        self.assertFalse(graph.is_stage('taskA'))
+        self.assertEqual(graph.consumers['mapping'], ['taskA', 'taskB'])
+        self.assertEqual(graph.get_task_for_stage('mapping'), 'taskA')
+
+        # only the stage and the independent task can run at first
+        self.assertEqual(graph.ready_nodes(), ['mapping', 'taskC'])
+        graph.set_running('mapping')
+        self.assertEqual(graph.ready_nodes(), ['taskC'])
+        graph.set_finished('mapping', success=True)
+        self.assertEqual(graph.ready_nodes(), ['taskA', 'taskB', 'taskC'])
+
+        for name in ['taskA', 'taskB', 'taskC']:
+            self.assertFalse(graph.is_finished())
+            graph.set_running(name)
+            graph.set_finished(name, success=True)
+        self.assertTrue(graph.is_finished())
+
+    def test_failed_stage(self):
+        stage1 = self.build_stage('stage1', outputs=['file1.nc'])
+        stage2 = self.build_stage('stage2', inputs=['file1.nc'],
+                                  outputs=['file2.nc'])
+        tasks = [self.build_task('taskA', [stage2]),
+                 self.build_task('taskB', [stage1]),
+                 self.build_task('taskC', [])]
+
+        graph = TaskGraph(tasks)
+
+        # stage2 depends on stage1 because it reads its output
+        self.assertEqual(graph.dependencies['stage2'], ['stage1'])
+        self.assertEqual(graph.ready_nodes(), ['stage1', 'taskC'])
+        self.assertEqual(graph.get_task_for_stage('stage1'), 'taskB')
+
+        skipped = graph.set_finished('stage1', success=False)
+        self.assertEqual(sorted(skipped), ['stage2', 'taskA', 'taskB'])
+        self.assertEqual(graph.status['taskA'], 'skipped')
+        self.assertEqual(graph.ready_nodes(), ['taskC'])
+        graph.set_finished('taskC', success=True)
+        self.assertTrue(graph.is_finished())
+
+    def test_complete_stage(self):
+        mappingFile = '{}/map.nc'.format(self.tempDir)
+        open(mappingFile, 'w').close()
+        self.assertTrue(os.path.exists(mappingFile))
+
+        tasks = [self.build_task('taskA', [self.build_stage(
+                     'mapping', outputs=[mappingFile])])]
+        graph = TaskGraph(tasks)
+
+        # the mapping file already exists so the stage doesn't need to run
+        self.assertEqual(graph.status['mapping'], 'success')
+        self.assertEqual(graph.ready_nodes(), ['taskA'])
+
+    def test_critical_path(self):
+        mappingFile = '{}/map.nc'.format(self.tempDir)
+        tasks = [self.build_task('taskA', [self.build_stage(
+                     'mapping', outputs=[mappingFile])]),
+                 self.build_task('taskB', []),
+                 self.build_task('taskC', [self.build_stage(
+                     'mapping', outputs=[mappingFile])])]
+        graph = TaskGraph(tasks)
+
+        lengths = graph.get_critical_path_lengths(
+            {'mapping': 10., 'taskA': 20., 'taskB': 50., 'taskC': None})
+        # the unknown runtime of taskC is the average of the others
+        self.assertEqual(lengths['taskC'], 80./3.)
+        self.assertEqual(lengths['taskB'], 50.)
+        self.assertEqual(lengths['mapping'], 10. + 80./3.)
+
+    def test_estimate_wall_time(self):
+        mappingFile = '{}/map.nc'.format(self.tempDir)
+        tasks = [self.build_task('taskA', [self.build_stage(
+                     'mapping', outputs=[mappingFile])]),
+                 self.build_task('taskB', []),
+                 self.build_task('taskC', [])]
+        graph = TaskGraph(tasks)
+        expectedRuntimes = {'mapping': 10., 'taskA': 20., 'taskB': 30.,
+                            'taskC': None}
+
+        serialTime, criticalPath, wallTime, unknownCount = \
+            estimate_wall_time(graph, expectedRuntimes, taskCount=1)
+        self.assertEqual(serialTime, 80.)
+        self.assertEqual(criticalPath, 30.)
+        self.assertEqual(wallTime, 80.)
+        self.assertEqual(unknownCount, 1)
+
+        serialTime, criticalPath, wallTime, unknownCount = \
+            estimate_wall_time(graph, expectedRuntimes, taskCount=4)
+        self.assertEqual(wallTime, 30.)
+
+        # tasks that are up to date don't need to run
+        graph.set_finished('taskB', success=True)
+        serialTime, criticalPath, wallTime, unknownCount = \
+            estimate_wall_time(graph, expectedRuntimes, taskCount=4)
+        self.assertEqual(serialTime, 50.)
+        self.assertEqual(wallTime, 30.)
+
+    def test_cycle(self):
+        stage1 = self.build_stage('stage1', inputs=['file2.nc'],
+                                  outputs=['file1.nc'])
+        stage2 = self.build_stage('stage2', inputs=['file1.nc'],
+                                  outputs=['file2.nc'])
+        tasks = [self.build_task('taskA', [stage1, stage2])]
+
+        with self.assertRaisesRegexp(ValueError, 'cycle'):
+            TaskGraph(tasks)
+
+        tasks = [self.build_task('taskA', [self.build_stage('taskA')])]
+        with self.assertRaisesRegexp(ValueError, 'More than one'):
+            TaskGraph(tasks)
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
@@ -0,0 +1,87 @@
+"""
+Unit tests for the registry of analysis tasks
+
+Xylar Asay-Davis
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+import mpas_analysis
+from mpas_analysis.test import TestCase
+from mpas_analysis.task_registry import taskRegistry
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+# modules that are slow to import and should only be imported by the tasks
+# that need them
+heavyModules = ['matplotlib', 'mpl_toolkits.basemap', 'PIL', 'scipy',
+                'xarray', 'pandas']
+
+# the maximum time (in seconds) it should take to import the registry and
+# select tasks, generous enough for a slow file system
+importBudget = 5.
+
+
+class TestTaskRegistry(TestCase):
+
+    def setUp(self):
+        self.config = MpasAnalysisConfigParser()
+        self.config.add_section('output')
+
+    def get_selected(self, generate):
+        self.config.set('output', 'generate', generate)
+        return [registeredTask.taskName for registeredTask in taskRegistry
+                if registeredTask.check_generate(self.config)]
+
+    def test_unique_names(self):
+        taskNames = [registeredTask.taskName for registeredTask in
+                     taskRegistry]
+        self.assertEqual(len(taskNames), len(set(taskNames)))
+
+    def test_check_generate(self):
+        self.assertEqual(len(self.get_selected("['all']")), len(taskRegistry))
+        self.assertEqual(self.get_selected("['climatologyMapSST']"),
+                         ['climatologyMapSST'])
+        self.assertEqual(
+            self.get_selected("['all_seaIce', "
+                              "'no_climatologyMapSeaIceThickSH', "
+                              "'no_timeSeries']"),
+            ['climatologyMapSeaIceConcNH', 'climatologyMapSeaIceThickNH',
+             'climatologyMapSeaIceConcSH'])
+        self.assertEqual(
+            self.get_selected("['all_timeSeries', 'no_ocean']"),
+            ['timeSeriesSeaIceAreaVol'])
+
+    def test_import_budget(self):
+        # run in a separate process, since other tests may have imported
+        # these modules already
+        script = \
+            'import sys, time, json\n' \
+            'start = time.time()\n' \
+            'from mpas_analysis.task_registry import taskRegistry\n' \
+            'from mpas_analysis.configuration.MpasAnalysisConfigParser ' \
+            'import MpasAnalysisConfigParser\n' \
+            'config = MpasAnalysisConfigParser()\n' \
+            'config.add_section("output")\n' \
+            'config.set("output", "generate", "[\'all\']")\n' \
+            'selected = [task for task in taskRegistry if ' \
+            'task.check_generate(config)]\n' \
+            'print json.dumps({"time": time.time() - start, ' \
+            '"modules": sys.modules.keys()})\n'
+        # other tests may have changed the working directory
+        rootDirectory = os.path.dirname(os.path.dirname(
+            os.path.abspath(mpas_analysis.__file__)))
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=rootDirectory)
+        result = json.loads(output)
+
+        for moduleName in heavyModules:
+            self.assertNotIn(moduleName, result['modules'])
+        for registeredTask in taskRegistry:
+            self.assertNotIn(registeredTask.moduleName, result['modules'])
+        self.assertLess(result['time'], importBudget)
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
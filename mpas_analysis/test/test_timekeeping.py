@@ -8,12 +8,16 @@ Xylar Asay-Davis
 
 import pytest
 import datetime
+import numpy
 from mpas_analysis.shared.timekeeping.MpasRelativeDelta \
     import MpasRelativeDelta
 from mpas_analysis.test import TestCase
 from mpas_analysis.shared.timekeeping.utility import string_to_datetime, \
     string_to_relative_delta, string_to_days_since_date, days_to_datetime, \
     datetime_to_days, date_to_days
+from mpas_analysis.shared.timekeeping.vectorized_calendar import \
+    char_array_to_days, days_to_dates, dates_to_days, days_in_month
+from mpas_analysis.shared.timekeeping.time_table import build_time_table
 
 
 class TestTimekeeping(TestCase):
@@ -285,4 +289,97 @@ class TestTimekeeping(TestCase):
                                 referenceDate=referenceDate)
             self.assertEqual(days, expected_days)
 
+    def test_char_array_to_days(self):
+        dateStrings = ['0001-01-01_00:00:00', '0001-03-01_12:30:15',
+                       '1582-10-04_00:00:00', '1582-10-15_00:00:00',
+                       '1850-07-15_06:00:00', '2000-03-01_23:59:59']
+        # fixed-length strings, as xarray reads MPAS time variables
+        timeStrings = numpy.array(dateStrings, dtype='S64')
+        # single characters, as stored in MPAS files
+        timeChars = timeStrings.view('S1').reshape((len(dateStrings), 64))
+        for calendar in ['gregorian', 'gregorian_noleap']:
+            for referenceDate in ['0001-01-01', '1582-10-15',
+                                  '1850-01-01 03:00:00']:
+                expected = string_to_days_since_date(
+                    dateString=dateStrings, calendar=calendar,
+                    referenceDate=referenceDate)
+                for timeVar in [timeStrings, timeChars]:
+                    days = char_array_to_days(timeVar, calendar=calendar,
+                                              referenceDate=referenceDate)
+                    self.assertArrayApproxEqual(days, expected, atol=1e-6)
+
+        # dates without times and with 5-digit years
+        for dateStrings in [['0002-01-01', '0003-01-01'],
+                            ['10001-01-01_00:00:00', '10002-01-01_00:00:00']]:
+            days = char_array_to_days(numpy.array(dateStrings, dtype='S64'),
+                                      calendar='gregorian_noleap')
+            year = int(dateStrings[0].split('-')[0])
+            self.assertArrayEqual(days, [365.*(year - 1), 365.*year])
+
+        # dates with different layouts are parsed one by one
+        days = char_array_to_days(numpy.array(['0010-01-01',
+                                               '0011-01-01_00:00:00'],
+                                              dtype='S64'),
+                                  calendar='gregorian_noleap')
+        self.assertArrayEqual(days, [3285., 3650.])
+
+        with self.assertRaisesRegexp(ValueError, 'Unsupported calendar'):
+            char_array_to_days(timeStrings, calendar='julian')
+
+    def test_days_to_dates(self):
+        # times spanning the switch from the Julian calendar, leap days and
+        # times that round up to the next day
+        days = numpy.concatenate([numpy.arange(0., 730000., 366.3),
+                                  [577735., 577736., 730119.5,
+                                   730120. - 0.4/86400.]])
+        for calendar in ['gregorian', 'gregorian_noleap']:
+            for referenceDate in ['0001-01-01', '1582-10-15',
+                                  '1850-01-01 03:00:00']:
+                (year, month, day, seconds) = days_to_dates(
+                    days, calendar=calendar, referenceDate=referenceDate)
+                datetimes = days_to_datetime(days, calendar=calendar,
+                                             referenceDate=referenceDate)
+                self.assertArrayEqual(year, [date.year for date in datetimes])
+                self.assertArrayEqual(month,
+                                      [date.month for date in datetimes])
+                self.assertArrayEqual(day, [date.day for date in datetimes])
+                self.assertArrayEqual(seconds,
+                                      [3600*date.hour + 60*date.minute +
+                                       date.second for date in datetimes])
+
+                expected = datetime_to_days(datetimes, calendar=calendar,
+                                            referenceDate=referenceDate)
+                self.assertArrayApproxEqual(
+                    dates_to_days(year, month, day, seconds,
+                                  calendar=calendar,
+                                  referenceDate=referenceDate),
+                    expected, atol=1e-6)
+
+        self.assertArrayEqual(days_in_month([1900, 2000, 2001], [2, 2, 12]),
+                              [28, 29, 31])
+        self.assertArrayEqual(days_in_month(2000, 2,
+                                            calendar='gregorian_noleap'), 28)
+
+    def test_build_time_table(self):
+        # mid-month times in Jan., Feb. and Mar. of year 2000
+        times = dates_to_days([2000, 2000, 2000], [1, 2, 3], 15,
+                              calendar='gregorian')
+        timeTable = build_time_table(times, calendar='gregorian')
+        self.assertArrayEqual(timeTable['year'], [2000, 2000, 2000])
+        self.assertArrayEqual(timeTable['month'], [1, 2, 3])
+        # without bounds, the months have no leap days
+        self.assertArrayEqual(timeTable['daysInMonth'], [31, 28, 31])
+        assert(not timeTable.flags.writeable)
+
+        startTimes = dates_to_days([2000, 2000, 2000], [1, 2, 3],
+                                   calendar='gregorian')
+        endTimes = dates_to_days([2000, 2000, 2000], [2, 3, 4],
+                                 calendar='gregorian')
+        timeTable = build_time_table(times, calendar='gregorian',
+                                     startTimes=startTimes,
+                                     endTimes=endTimes)
+        self.assertArrayEqual(timeTable['daysInMonth'], [31, 29, 31])
+        self.assertEqual(timeTable.dtype.names,
+                         ('year', 'month', 'daysInMonth'))
+
 # vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
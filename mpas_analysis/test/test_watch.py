@@ -0,0 +1,110 @@
+"""
+Unit tests for following a running simulation
+
+Xylar Asay-Davis
+"""
+
+import os
+import time
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.watch import get_last_complete_year, \
+    limit_end_years
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestWatch(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        os.makedirs('{}/history'.format(self.tempDir))
+        with open('{}/streams.ocean'.format(self.tempDir), 'w') as outFile:
+            outFile.write(
+                '<streams>\n'
+                '<stream name="timeSeriesStatsMonthlyOutput"\n'
+                '        type="output"\n'
+                '        filename_template="history/mpaso.hist.am.'
+                'timeSeriesStatsMonthly.$Y-$M-$D.nc"\n'
+                '        output_interval="00-01-00_00:00:00" >\n'
+                '</stream>\n'
+                '</streams>\n')
+
+        self.config = MpasAnalysisConfigParser()
+        self.config.add_section('input')
+        self.config.set('input', 'baseDirectory', self.tempDir)
+        self.config.set('input', 'runSubdirectory', '.')
+        self.config.set('input', 'oceanHistorySubdirectory', '.')
+        self.config.set('input', 'oceanStreamsFileName', 'streams.ocean')
+        self.config.set('input', 'seaIceHistorySubdirectory', '.')
+        self.config.set('input', 'seaIceStreamsFileName', 'streams.cice')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def write_months(self, year, lastMonth):
+        for month in range(1, lastMonth+1):
+            fileName = '{}/history/mpaso.hist.am.timeSeriesStatsMonthly.' \
+                '{:04d}-{:02d}-01.nc'.format(self.tempDir, year, month)
+            open(fileName, 'w').close()
+        return fileName
+
+    def test_last_complete_year(self):
+        # no output yet
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), None)
+
+        # the first year isn't complete yet
+        self.write_months(year=1, lastMonth=6)
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), None)
+
+        self.write_months(year=1, lastMonth=12)
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), 1)
+
+        self.write_months(year=2, lastMonth=3)
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), 1)
+
+        # there is no sea-ice streams file
+        self.assertEqual(get_last_complete_year(self.config, 'seaIce'), None)
+
+    def test_settle_time(self):
+        self.write_months(year=1, lastMonth=11)
+        fileName = self.write_months(year=1, lastMonth=12)
+        # all but the last file were written long ago
+        then = time.time() - 3600.
+        for otherFileName in os.listdir('{}/history'.format(self.tempDir)):
+            otherFileName = '{}/history/{}'.format(self.tempDir,
+                                                   otherFileName)
+            if otherFileName != fileName:
+                os.utime(otherFileName, (then, then))
+
+        self.assertEqual(get_last_complete_year(self.config, 'ocean',
+                                                settleTime=600.), None)
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), 1)
+
+    def test_last_complete_year_before_start(self):
+        self.config.add_section('climatology')
+        self.config.set('climatology', 'startYear', '3')
+        self.config.add_section('timeSeries')
+        self.config.set('timeSeries', 'startYear', '2')
+
+        self.write_months(year=1, lastMonth=12)
+        self.write_months(year=2, lastMonth=6)
+        # no year the analysis covers has been completed
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), None)
+
+        self.write_months(year=2, lastMonth=12)
+        self.assertEqual(get_last_complete_year(self.config, 'ocean'), 2)
+
+    def test_limit_end_years(self):
+        self.config.add_section('climatology')
+        self.config.set('climatology', 'endYear', '20')
+        self.config.add_section('timeSeries')
+        self.config.set('timeSeries', 'endYear', '9999')
+
+        limit_end_years(self.config, 25)
+        self.assertEqual(self.config.getint('climatology', 'endYear'), 20)
+        self.assertEqual(self.config.getint('timeSeries', 'endYear'), 25)
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
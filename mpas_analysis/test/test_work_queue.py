@@ -0,0 +1,127 @@
+"""
+Unit tests for the file-based work queue used to distribute tasks to workers
+
+Xylar Asay-Davis
+"""
+
+import os
+import time
+import shutil
+import tempfile
+
+from mpas_analysis.test import TestCase
+from mpas_analysis.shared.analysis_task import AnalysisTask
+from mpas_analysis.shared.analysis_stage import AnalysisStage
+from mpas_analysis.shared.scheduler import TaskGraph, WorkQueue
+from mpas_analysis.configuration.MpasAnalysisConfigParser \
+    import MpasAnalysisConfigParser
+
+
+class TestWorkQueue(TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.queueDirectory = '{}/queue'.format(self.tempDir)
+
+        config = MpasAnalysisConfigParser()
+        tasks = []
+        for taskName in ['taskA', 'taskB', 'taskC']:
+            task = AnalysisTask(config=config, taskName=taskName,
+                                componentName='ocean')
+            if taskName != 'taskC':
+                task.add_stage(AnalysisStage(
+                    config=config, stageName='mapping',
+                    outputs=['{}/map.nc'.format(self.tempDir)]))
+            tasks.append(task)
+
+        self.graph = TaskGraph(tasks)
+        self.args = dict([(name, ['--generate', name]) for name in
+                          self.graph.nodes])
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_claim(self):
+        # workers started before the coordinator just wait
+        worker1 = WorkQueue(self.queueDirectory)
+        self.assertEqual(worker1.claim('worker1'), None)
+        self.assertFalse(worker1.is_finished())
+
+        coordinator = WorkQueue(self.queueDirectory)
+        coordinator.initialize(self.graph, self.args)
+
+        worker2 = WorkQueue(self.queueDirectory)
+
+        self.assertEqual(worker1.claim('worker1'), 'mapping')
+        self.assertEqual(coordinator.get_status('mapping'), 'running')
+        self.assertEqual(worker1.get_args('mapping'),
+                         ['--generate', 'mapping'])
+        # the other tasks must wait for the mapping stage
+        self.assertEqual(worker2.claim('worker2'), 'taskC')
+        self.assertEqual(worker2.claim('worker2'), None)
+
+        worker1.set_finished('mapping', success=True)
+        worker2.set_finished('taskC', success=True)
+        self.assertEqual(worker2.claim('worker2'), 'taskA')
+        self.assertEqual(worker1.claim('worker1'), 'taskB')
+        self.assertFalse(coordinator.is_finished())
+
+        worker2.set_finished('taskA', success=True)
+        worker1.set_finished('taskB', success=False)
+        self.assertTrue(coordinator.is_finished())
+        self.assertEqual(coordinator.get_status('taskB'), 'fail')
+
+    def test_skip_after_failure(self):
+        coordinator = WorkQueue(self.queueDirectory)
+        coordinator.initialize(self.graph, self.args)
+
+        worker = WorkQueue(self.queueDirectory)
+        self.assertEqual(worker.claim('worker'), 'mapping')
+        worker.set_finished('mapping', success=False)
+
+        # tasks that depend on the failed stage are skipped
+        self.assertEqual(worker.claim('worker'), 'taskC')
+        self.assertEqual(coordinator.get_status('taskA'), 'skipped')
+        self.assertEqual(coordinator.get_status('taskB'), 'skipped')
+        worker.set_finished('taskC', success=True)
+        self.assertTrue(coordinator.is_finished())
+
+    def test_stale_claim(self):
+        coordinator = WorkQueue(self.queueDirectory, leaseTime=60.)
+        coordinator.initialize(self.graph, self.args)
+
+        worker1 = WorkQueue(self.queueDirectory)
+        worker2 = WorkQueue(self.queueDirectory)
+        self.assertEqual(worker1.claim('worker1'), 'mapping')
+        self.assertEqual(worker2.claim('worker2'), 'taskC')
+
+        # worker1 was killed an hour ago, while worker2 is still renewing
+        # its claim
+        then = time.time() - 3600.
+        os.utime('{}/mapping.claim'.format(self.queueDirectory),
+                 (then, then))
+        worker2.renew('taskC')
+        self.assertEqual(coordinator.expire_stale_claims(), ['mapping'])
+        self.assertEqual(coordinator.get_status('mapping'), 'fail')
+        self.assertEqual(coordinator.get_status('taskC'), 'running')
+
+        # the tasks that depend on the failed stage are skipped, and the
+        # worker can't change the status of its expired claim
+        self.assertEqual(worker2.claim('worker2'), None)
+        self.assertEqual(coordinator.get_status('taskA'), 'skipped')
+        worker1.set_finished('mapping', success=True)
+        self.assertEqual(coordinator.get_status('mapping'), 'fail')
+        worker2.set_finished('taskC', success=True)
+        self.assertTrue(coordinator.is_finished())
+
+    def test_complete_stage(self):
+        open('{}/map.nc'.format(self.tempDir), 'w').close()
+        graph = TaskGraph(self.graph.nodes.values()[1:])
+        coordinator = WorkQueue(self.queueDirectory)
+        coordinator.initialize(graph, self.args)
+        self.assertEqual(coordinator.get_status('mapping'), 'success')
+
+        worker = WorkQueue(self.queueDirectory)
+        self.assertEqual(worker.claim('worker'), 'taskA')
+
+# vim: foldmethod=marker ai ts=4 sts=4 et sw=4 ft=python
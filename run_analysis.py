@@ -10,21 +10,61 @@ Xylar Asay-Davis, Phillip J. Wolfram
 """
 
 import os
-import matplotlib as mpl
 import argparse
 import traceback
 import sys
 import warnings
 import subprocess
+import socket
 import time
+from functools import partial
 
 from mpas_analysis.configuration import MpasAnalysisConfigParser
 
+from mpas_analysis.task_registry import build_analysis_tasks
+
+from mpas_analysis.shared.io import runContext
 from mpas_analysis.shared.io.utility import build_config_full_path, \
     make_directories
 
 from mpas_analysis.shared.html import generate_html
 
+from mpas_analysis.shared.generalized_reader.dataset_broker import \
+    datasetBroker
+from mpas_analysis.shared.generalized_reader.converted_store import \
+    ConvertedStore
+
+from mpas_analysis.shared.manifest import write_manifest, is_up_to_date
+
+from mpas_analysis.shared.performance import start_recording, \
+    stop_recording, format_duration, read_performance_reports
+
+from mpas_analysis.shared.scheduler import TaskGraph, ForkedProcess, \
+    WorkQueue, ProcessMonitor, RuntimeHistory, find_stragglers, \
+    estimate_wall_time
+from mpas_analysis.shared.scheduler.resources import get_base_memory, \
+    select_tasks_to_launch, bytesPerGB
+
+from mpas_analysis.shared.watch import get_last_complete_year, \
+    limit_end_years
+
+
+def read_config(configFiles, generate=None):  # {{{
+    """
+    Read the config files and update the 'generate' option (if a string was
+    supplied on the command line)
+
+    Author: Xylar Asay-Davis
+    """
+
+    config = MpasAnalysisConfigParser()
+    config.read(configFiles)
+
+    if generate:
+        update_generate(config, generate)
+
+    return config  # }}}
+
 
 def update_generate(config, generate):  # {{{
     """
@@ -42,116 +82,618 @@ def update_generate(config, generate):  # {{{
     config.set('output', 'generate', generateString)  # }}}
 
 
+def skip_up_to_date_tasks(config, graph):  # {{{
+    """
+    If requested in the config file, mark tasks whose manifest shows that
+    their inputs, config options and outputs haven't changed since they last
+    ran as finished, so they are not run again.  Stages that are only needed
+    by these tasks are skipped as well.
+
+    Author: Xylar Asay-Davis
+    """
+    if not config.getWithDefault('execute', 'skipUpToDateTasks',
+                                 default=False):
+        return
+
+    for name in graph.nodes:
+        if graph.is_stage(name) or graph.status[name] != 'pending':
+            continue
+        try:
+            upToDate = is_up_to_date(graph.nodes[name])
+        except (IOError, OSError, ValueError):
+            traceback.print_exc(file=sys.stdout)
+            upToDate = False
+        if upToDate:
+            print "Skipping {} because its outputs are up to date".format(
+                name)
+            graph.set_finished(name, success=True)
+
+    for name in graph.nodes:
+        if not graph.is_stage(name) or graph.status[name] != 'pending':
+            continue
+        if all([graph.status[consumer] == 'success' for consumer in
+                graph.consumers[name]]):
+            print "Skipping {} because no task needs it".format(name)
+            graph.status[name] = 'skipped'
+    # }}}
+
+
 def run_parallel_tasks(config, analyses, configFiles, taskCount):
     # {{{
     """
-    Run this script once each for several parallel tasks.
+    Run this script once each for several parallel tasks and the stages they
+    depend on.  Stages shared between several tasks are run only once, and
+    tasks are launched as soon as the stages they depend on have finished and
+    there are enough cores (``taskCount``) and memory (the ``memoryBudget``
+    config option) for them.  Among the tasks that are ready, those with the
+    longest expected runtime (including the tasks waiting on them) are
+    launched first.
 
     Author
     ------
     Xylar Asay-Davis
     """
 
-    taskNames = [analysisTask.taskName for analysisTask in analyses]
+    graph = TaskGraph(analyses)
+    skip_up_to_date_tasks(config, graph)
+
+    executor = config.getWithDefault('execute', 'executor',
+                                     default='subprocess')
+    if executor not in ['subprocess', 'fork']:
+        raise ValueError('Unexpected executor {}.  Should be "subprocess" '
+                         'or "fork".'.format(executor))
+
+    memoryBudget = bytesPerGB*config.getWithDefault('execute',
+                                                    'memoryBudget',
+                                                    default=0.)
+    stragglerFactor = config.getWithDefault('execute', 'stragglerFactor',
+                                            default=2.)
+    timeoutFactor = config.getWithDefault('execute', 'taskTimeoutFactor',
+                                          default=0.)
+
+    history = get_runtime_history(config)
+    expectedRuntimes = dict([(name, history.get_expected_runtime(name))
+                             for name in graph.nodes])
+    priorities = graph.get_critical_path_lengths(expectedRuntimes)
+    resources = estimate_resources(graph, expectedRuntimes)
+
+    if executor == 'subprocess':
+        # subtasks use the same config options and input files as this process
+        contextFileName = write_run_context(config)
+
+    monitor = ProcessMonitor()
+    logs = {}
+    warned = []
+    timedOut = []
+    while not graph.is_finished():
+        readyNames = order_by_priority(graph.ready_nodes(), priorities)
+        newNames = select_tasks_to_launch(readyNames, monitor.get_names(),
+                                          resources, coreBudget=taskCount,
+                                          memoryBudget=memoryBudget)
+        if len(newNames) > 0:
+            if executor == 'fork':
+                (process, log) = fork_tasks(newNames, graph, config)
+            else:
+                (process, log) = launch_tasks(newNames, graph, config,
+                                              configFiles, contextFileName)
+            # merge the new logs into this dictionary
+            logs.update(log)
+            for name in newNames:
+                monitor.add(name, process[name])
+                graph.set_running(name)
+
+        # wake up periodically to check for tasks that are taking too long
+        (name, process) = monitor.wait(timeout=10.)
+
+        elapsedTimes = monitor.get_elapsed_times()
+        for straggler in find_stragglers(elapsedTimes, expectedRuntimes,
+                                         stragglerFactor):
+            if straggler not in warned:
+                print "WARNING: {} has been running for {}, more than {} " \
+                    "times its typical runtime of {}.  See log file {} for " \
+                    "its progress.".format(
+                        straggler, format_duration(elapsedTimes[straggler]),
+                        stragglerFactor,
+                        format_duration(expectedRuntimes[straggler]),
+                        logs[straggler].name)
+                warned.append(straggler)
+        for straggler in find_stragglers(elapsedTimes, expectedRuntimes,
+                                         timeoutFactor):
+            if straggler not in timedOut:
+                print "ERROR: stopping {} because it has been running for " \
+                    "{}, more than {} times its typical runtime of " \
+                    "{}.".format(
+                        straggler, format_duration(elapsedTimes[straggler]),
+                        timeoutFactor,
+                        format_duration(expectedRuntimes[straggler]))
+                monitor.terminate(straggler)
+                timedOut.append(straggler)
+
+        if name is None:
+            continue
+
+        success = process.returncode == 0
+        if success:
+            print "Task {} has finished successfully.".format(name)
+            update_runtime_history(history, config, name)
+        else:
+            print "ERROR in task {}.  See log file {} for details".format(
+                name, logs[name].name)
+        logs[name].close()
+
+        skipped = graph.set_finished(name, success)
+        for skippedName in skipped:
+            print "Skipping {} because {} failed".format(skippedName, name)
+
+    history.write()
+    # }}}
+
+
+def get_runtime_history(config):  # {{{
+    """
+    Read the history of how long each task and stage took in recent runs on
+    this mesh
+
+    Author: Xylar Asay-Davis
+    """
+    fileName = build_config_full_path(config, 'output',
+                                      'runtimeHistoryFileName')
+    return RuntimeHistory(fileName, config.get('input', 'mpasMeshName'))
+    # }}}
+
+
+def update_runtime_history(history, config, name):  # {{{
+    """
+    Add the runtime of a task or stage that has just finished successfully to
+    the history, taken from the performance report it wrote
+
+    Author: Xylar Asay-Davis
+    """
+    logsDirectory = build_config_full_path(config, 'output',
+                                           'logsSubdirectory')
+    reports = read_performance_reports('{}/performance'.format(logsDirectory),
+                                       [name])
+    if len(reports) > 0 and reports[0]['success']:
+        history.add_runtime(name, reports[0]['wallTime'])  # }}}
+
+
+def order_by_priority(names, priorities):  # {{{
+    """
+    Sort the names of tasks and stages so those with the highest priority
+    (longest critical path) come first, otherwise keeping their order
+
+    Author: Xylar Asay-Davis
+    """
+    return sorted(names, key=lambda name: -priorities[name])  # }}}
+
 
-    taskCount = min(taskCount, len(taskNames))
+def estimate_resources(graph, expectedRuntimes):  # {{{
+    """
+    Estimate the memory and cores needed by each task and stage in the graph
+    and print them along with the expected runtimes
 
-    (processes, logs) = launch_tasks(taskNames[0:taskCount], config,
-                                     configFiles)
-    remainingTasks = taskNames[taskCount:]
-    while len(processes) > 0:
-        (taskName, process) = wait_for_task(processes)
-        if process.returncode == 0:
-            print "Task {} has finished successfully.".format(taskName)
+    Author: Xylar Asay-Davis
+    """
+
+    print "Estimated resources:"
+    resources = {}
+    for name, node in graph.nodes.items():
+        try:
+            resources[name] = node.estimate_resources()
+        except (IOError, RuntimeError, ValueError):
+            # this happens if, e.g., an input file can't be read; the error
+            # will be reported when the task runs
+            traceback.print_exc(file=sys.stdout)
+            resources[name] = (get_base_memory(graph.nodes[name].config), 1)
+        memory, cores = resources[name]
+        if expectedRuntimes[name] is None:
+            runtime = 'unknown'
         else:
-            print "ERROR in task {}.  See log file {} for details".format(
-                taskName, logs[taskName].name)
-        logs[taskName].close()
-        # remove the process from the process dictionary (no need to bother)
-        processes.pop(taskName)
-
-        if len(remainingTasks) > 0:
-            (process, log) = launch_tasks(remainingTasks[0:1], config,
-                                          configFiles)
-            # merge the new process and log into these dictionaries
-            processes.update(process)
-            logs.update(log)
-            remainingTasks = remainingTasks[1:]
+            runtime = format_duration(expectedRuntimes[name])
+        print "  {}: {:.2f} GB, {} core(s), runtime {}".format(
+            name, memory/bytesPerGB, cores, runtime)
+
+    return resources  # }}}
+
+
+def estimate_costs(config, analyses):  # {{{
+    """
+    Report the input data each task will read, which caches will be reused
+    and which must be computed, the mapping files that must be built and the
+    expected runtime of each task and stage, along with estimates of the
+    wall time and memory needed to run them all, without running anything
+
+    Author: Xylar Asay-Davis
+    """
+
+    graph = TaskGraph(analyses)
+    skip_up_to_date_tasks(config, graph)
+
+    history = get_runtime_history(config)
+    expectedRuntimes = dict([(name, history.get_expected_runtime(name))
+                             for name in graph.nodes])
+    resources = estimate_resources(graph, expectedRuntimes)
+
+    print "\nEstimated costs:"
+    totalBytes = 0.
+    for name, node in graph.nodes.items():
+        if graph.status[name] != 'pending':
+            print "  {}: up to date".format(name)
+            continue
+        try:
+            bytesRead = node.estimate_bytes_read()
+        except (IOError, RuntimeError, ValueError):
+            traceback.print_exc(file=sys.stdout)
+            bytesRead = 0.
+        totalBytes += bytesRead
+        print "  {}: reads {:.2f} GB".format(name, bytesRead/bytesPerGB)
+        if graph.is_stage(name):
+            for fileName in node.outputs:
+                if not os.path.exists(fileName):
+                    print "    builds {}".format(fileName)
+        else:
+            for fileName in node.get_cache_files():
+                if os.path.exists(fileName):
+                    print "    reuses {}".format(fileName)
+                else:
+                    print "    computes {}".format(fileName)
+
+    parallelTaskCount = config.getWithDefault('execute', 'parallelTaskCount',
+                                              default=1)
+    serialTime, criticalPath, wallTime, unknownCount = \
+        estimate_wall_time(graph, expectedRuntimes, parallelTaskCount)
+    peakMemory = max([resources[name][0] for name in graph.nodes
+                      if graph.status[name] == 'pending'] + [0.])
+
+    print "\nTotal input data: {:.2f} GB".format(totalBytes/bytesPerGB)
+    print "Peak memory of a single task: {:.2f} GB".format(
+        peakMemory/bytesPerGB)
+    print "Serial runtime: {}".format(format_duration(serialTime))
+    print "Critical path: {}".format(format_duration(criticalPath))
+    print "Estimated wall time with {} parallel task(s): {}".format(
+        parallelTaskCount, format_duration(wallTime))
+    if unknownCount > 0:
+        print "WARNING: {} task(s) and stage(s) have no runtime history and " \
+            "are assumed to take the average runtime".format(unknownCount)
     # }}}
 
 
-def launch_tasks(taskNames, config, configFiles):  # {{{
+def convert_history_streams(config):  # {{{
     """
-    Launch one or more tasks
+    Convert (or append new output to) the history streams listed in the
+    [convert] section into compressed stores chunked for reading long time
+    series
 
     Author: Xylar Asay-Davis
     """
-    thisFile = os.path.realpath(__file__)
 
+    storeDirectory = build_config_full_path(config, 'output',
+                                            'storeSubdirectory')
+    runDirectory = build_config_full_path(config, 'input', 'runSubdirectory')
+    timeVariableName = config.getExpression('convert', 'timeVariableName')
+
+    for componentName in config.getExpression('convert', 'components'):
+        historyDirectory = build_config_full_path(
+            config, 'input', '{}HistorySubdirectory'.format(componentName),
+            defaultPath=runDirectory)
+        namelist = runContext.get_namelist(build_config_full_path(
+            config, 'input', '{}NamelistFileName'.format(componentName)))
+        streams = runContext.get_streams_file(
+            build_config_full_path(config, 'input',
+                                   '{}StreamsFileName'.format(componentName)),
+            streamsdir=historyDirectory)
+
+        streamName = config.get('convert',
+                                '{}StreamName'.format(componentName))
+        variableList = config.getExpression(
+            'convert', '{}VariableList'.format(componentName))
+        fileNames = streams.readpath(streamName)
+
+        store = ConvertedStore('{}/{}.{}.nc'.format(
+            storeDirectory, componentName, streamName))
+        print "Converting {} {} to {}...".format(componentName, streamName,
+                                                 store.fileName)
+        convertedCount = store.append(
+            fileNames, calendar=namelist.get('config_calendar_type'),
+            timeVariableName=timeVariableName,
+            variableList=variableList,
+            timeChunkSize=config.getint('convert', 'timeChunkSize'),
+            chunkSize=int(1024**2*config.getfloat('convert', 'chunkSize')),
+            compressionLevel=config.getint('convert', 'compressionLevel'))
+        print "  added {} of {} history files ({} records in total)".format(
+            convertedCount, len(fileNames), len(store.times))
+    # }}}
+
+
+def get_command_prefix(config):  # {{{
+    """
+    Get the prefix on the command line before a parallel task as a list
+
+    Author: Xylar Asay-Davis
+    """
     commandPrefix = config.getWithDefault('execute', 'commandPrefix',
                                           default='')
     if commandPrefix == '':
-        commandPrefix = []
+        return []
+    else:
+        return commandPrefix.split(' ')  # }}}
+
+
+def write_run_context(config):  # {{{
+    """
+    Write the config options (as adjusted during the setup of the analysis
+    tasks) and the files found for each stream to a file that subtasks read
+    instead of the config files, returning the name of the file
+
+    Author: Xylar Asay-Davis
+    """
+    contextFileName = build_config_full_path(config, 'output',
+                                             'runContextFileName')
+    make_directories(os.path.dirname(contextFileName))
+    runContext.write(contextFileName, config)
+    return contextFileName  # }}}
+
+
+def get_subtask_args(graph, name, contextFileName):  # {{{
+    """
+    Get the command-line arguments (other than the config files) for running
+    a task or stage in a subtask
+
+    Author: Xylar Asay-Davis
+    """
+    if graph.is_stage(name):
+        # a stage is set up by the setup_and_check of one of the tasks that
+        # depends on it
+        taskName = graph.get_task_for_stage(name)
+        args = ['--subtask', '--stage', name, '--generate', taskName]
     else:
-        commandPrefix = commandPrefix.split(' ')
+        args = ['--subtask', '--generate', name]
+    return args + ['--context', contextFileName]  # }}}
+
+
+def launch_tasks(names, graph, config, configFiles,
+                 contextFileName):  # {{{
+    """
+    Launch one or more tasks or stages
+
+    Author: Xylar Asay-Davis
+    """
+    thisFile = os.path.realpath(__file__)
+
+    commandPrefix = get_command_prefix(config)
 
     processes = {}
     logs = {}
-    for taskName in taskNames:
-        args = commandPrefix + \
-            [thisFile, '--subtask', '--generate', taskName] + configFiles
+    for name in names:
+        args = commandPrefix + [thisFile] + \
+            get_subtask_args(graph, name, contextFileName) + configFiles
 
-        logFileName = '{}/{}.log'.format(logsDirectory, taskName)
+        logFileName = '{}/{}.log'.format(logsDirectory, name)
 
         # write the command to the log file
         logFile = open(logFileName, 'w')
         logFile.write('Command: {}\n'.format(' '.join(args)))
         # make sure the command gets written before the rest of the log
         logFile.flush()
-        print 'Running {}'.format(taskName)
+        print 'Running {}'.format(name)
         process = subprocess.Popen(args, stdout=logFile,
                                    stderr=subprocess.STDOUT)
-        processes[taskName] = process
-        logs[taskName] = logFile
+        processes[name] = process
+        logs[name] = logFile
 
     return (processes, logs)  # }}}
 
 
-def wait_for_task(processes):  # {{{
+def fork_tasks(names, graph, config):  # {{{
     """
-    Wait for the next process to finish and check its status.  Returns both the
-    task name and the process that finished.
+    Fork one or more tasks or stages from this process, which has already
+    performed the setup of all tasks
 
     Author: Xylar Asay-Davis
     """
 
-    # first, check if any process has already finished
-    for taskName, process in processes.iteritems():  # python 2.7!
-        if(not is_running(process)):
-            return (taskName, process)
+    processes = {}
+    logs = {}
+    for name in names:
+        logFileName = '{}/{}.log'.format(logsDirectory, name)
 
-    # No process has already finished, so wait for the next one
-    (pid, status) = os.waitpid(-1, 0)
-    for taskName, process in processes.iteritems():
-        if pid == process.pid:
-            process.returncode = status
-            # since we used waitpid, this won't happen automatically
-            return (taskName, process)  # }}}
+        logFile = open(logFileName, 'w')
+        logFile.write('Forked from process {}\n'.format(os.getpid()))
+        print 'Running {}'.format(name)
+        process = ForkedProcess(partial(run_node, config, graph, name),
+                                logFile)
+        processes[name] = process
+        logs[name] = logFile
 
+    return (processes, logs)  # }}}
 
-def is_running(process):  # {{{
+
+def run_queue_tasks(config, analyses):  # {{{
     """
-    Returns whether a given process is currently running
+    Write the tasks and stages to a work queue in the output directory and
+    wait for workers (``run_analysis.py --worker``, possibly on other nodes)
+    to run them.  Tasks whose workers stop renewing their claims (e.g.
+    because they were killed) are marked as failed, as are all unfinished
+    tasks once ``queueTimeout`` (if any) has passed.
 
     Author: Xylar Asay-Davis
     """
 
-    try:
-        os.kill(process.pid, 0)
-    except OSError:
-        return False
-    else:
-        return True  # }}}
+    graph = TaskGraph(analyses)
+    skip_up_to_date_tasks(config, graph)
+
+    # subtasks use the same config options and input files as this process
+    contextFileName = write_run_context(config)
+    args = dict([(name, get_subtask_args(graph, name, contextFileName))
+                 for name in graph.nodes])
+
+    history = get_runtime_history(config)
+    expectedRuntimes = dict([(name, history.get_expected_runtime(name))
+                             for name in graph.nodes])
+    priorities = graph.get_critical_path_lengths(expectedRuntimes)
+
+    queue = WorkQueue(build_config_full_path(config, 'output',
+                                             'queueSubdirectory'),
+                      leaseTime=config.getWithDefault('execute',
+                                                      'queueLeaseTime',
+                                                      default=600.))
+    queue.initialize(graph, args,
+                     names=order_by_priority(graph.nodes.keys(), priorities))
+
+    print "Waiting for workers to run the tasks in {}.\n" \
+        "Start workers with:\n" \
+        "    run_analysis.py --worker <config files>".format(
+            queue.queueDirectory)
+
+    pollInterval = config.getWithDefault('execute', 'queuePollInterval',
+                                         default=10.)
+    # a timeout of zero means to wait as long as it takes
+    timeout = config.getWithDefault('execute', 'queueTimeout', default=0.)
+    startTime = time.time()
+
+    while True:
+        for name in queue.expire_stale_claims():
+            print "ERROR: the worker running {} stopped responding".format(
+                name)
+        if timeout > 0. and time.time() - startTime > timeout:
+            unfinished = [name for name in graph.nodes if
+                          queue.get_status(name) in ['pending', 'running']]
+            print "ERROR: the work queue timed out before {} " \
+                "finished".format(', '.join(unfinished))
+            for name in unfinished:
+                queue.set_finished(name, success=False)
+        finished = queue.is_finished()
+        for name in graph.nodes:
+            status = queue.get_status(name)
+            if status != graph.status[name]:
+                graph.status[name] = status
+                if status == 'fail':
+                    print "ERROR in task {}.  See log file {}/{}.log for " \
+                        "details".format(name, logsDirectory, name)
+                elif status == 'skipped':
+                    print "Skipping {} because a task it depends on " \
+                        "failed".format(name)
+                else:
+                    print "Task {}: {}".format(name, status)
+                    if status == 'success':
+                        update_runtime_history(history, config, name)
+        if finished:
+            break
+        time.sleep(pollInterval)
+
+    history.write()
+    # }}}
+
+
+def run_worker(config, configFiles):  # {{{
+    """
+    Claim tasks and stages from the work queue one at a time and run each in
+    a subtask, until all tasks in the queue have finished.
+
+    Author: Xylar Asay-Davis
+    """
+
+    thisFile = os.path.realpath(__file__)
+    commandPrefix = get_command_prefix(config)
+
+    queue = WorkQueue(build_config_full_path(config, 'output',
+                                             'queueSubdirectory'))
+
+    pollInterval = config.getWithDefault('execute', 'queuePollInterval',
+                                         default=10.)
+    # claims are renewed several times within the lease, so one late renewal
+    # doesn't make the claim stale
+    leaseTime = config.getWithDefault('execute', 'queueLeaseTime',
+                                      default=600.)
+    renewInterval = min(pollInterval, leaseTime/4.)
+
+    workerName = '{}:{}'.format(socket.gethostname(), os.getpid())
+
+    while not queue.is_finished():
+        name = queue.claim(workerName)
+        if name is None:
+            # wait for the queue to be written or for dependencies to finish
+            time.sleep(pollInterval)
+            continue
+
+        args = commandPrefix + [thisFile] + queue.get_args(name) + \
+            configFiles
+
+        logFileName = '{}/{}.log'.format(logsDirectory, name)
+        logFile = open(logFileName, 'w')
+        logFile.write('Worker: {}\n'.format(workerName))
+        logFile.write('Command: {}\n'.format(' '.join(args)))
+        logFile.flush()
+        print 'Running {}'.format(name)
+        process = subprocess.Popen(args, stdout=logFile,
+                                   stderr=subprocess.STDOUT)
+        while process.poll() is None:
+            queue.renew(name)
+            time.sleep(renewInterval)
+        returncode = process.returncode
+        logFile.close()
+
+        success = returncode == 0
+        if success:
+            print "Task {} has finished successfully.".format(name)
+        else:
+            print "ERROR in task {}.  See log file {} for details".format(
+                name, logFileName)
+        queue.set_finished(name, success)
+    # }}}
+
+
+def watch_simulation(configFiles, generate):  # {{{
+    """
+    Follow a running simulation, updating the analysis each time the
+    simulation has written another complete year of monthly output.  Tasks
+    run in this process, one at a time, so mapping weights stay in memory
+    between updates, and tasks whose inputs haven't changed are skipped.
+
+    Author: Xylar Asay-Davis
+    """
+
+    lastYear = None
+    while True:
+        # start from a fresh config each time, since tasks modify it during
+        # setup (e.g. to clip the climatology years to the available output)
+        config = read_config(configFiles, generate)
+        # the simulation may have written more output since the files were
+        # last searched for
+        runContext.clear()
+
+        pollInterval = config.getWithDefault('watch', 'pollInterval',
+                                             default=300.)
+        settleTime = config.getWithDefault('watch', 'settleTime',
+                                           default=60.)
+
+        years = [get_last_complete_year(config, componentName,
+                                        settleTime=settleTime)
+                 for componentName in ['ocean', 'seaIce']]
+        years = [year for year in years if year is not None]
+
+        if len(years) > 0 and min(years) != lastYear:
+            lastYear = min(years)
+            print "\nUpdating the analysis through year {:04d}\n".format(
+                lastYear)
+
+            limit_end_years(config, lastYear)
+            config.set('execute', 'skipUpToDateTasks', 'True')
+
+            analyses = build_analysis_list(config)
+            try:
+                run_analysis(config, analyses)
+            except (Exception, BaseException) as e:
+                if isinstance(e, KeyboardInterrupt):
+                    raise e
+                # the errors have already been reported, so keep watching
+                print "ERROR: not all tasks succeeded during this update"
+            generate_html(config, analyses)
+
+        print "Waiting for more output from the simulation..."
+        sys.stdout.flush()
+        time.sleep(pollInterval)
+    # }}}
 
 
 def build_analysis_list(config):  # {{{
@@ -164,32 +706,12 @@ def build_analysis_list(config):  # {{{
     # choose the right rendering backend, depending on whether we're displaying
     # to the screen
     if not config.getboolean('plot', 'displayToScreen'):
+        import matplotlib as mpl
         mpl.use('Agg')
 
-    # analysis can only be imported after the right MPL renderer is selected
-    from mpas_analysis import ocean
-    from mpas_analysis import sea_ice
-
-    # analyses will be a list of analysis classes
-    analyses = []
-
-    # Ocean Analyses
-
-    analyses.append(ocean.ClimatologyMapMLD(config))
-    analyses.append(ocean.ClimatologyMapSST(config))
-    analyses.append(ocean.ClimatologyMapSSS(config))
-    analyses.append(ocean.TimeSeriesOHC(config))
-    analyses.append(ocean.TimeSeriesSST(config))
-    analyses.append(ocean.MeridionalHeatTransport(config))
-    analyses.append(ocean.StreamfunctionMOC(config))
-    analyses.append(ocean.IndexNino34(config))
-
-    # Sea Ice Analyses
-    analyses.append(sea_ice.ClimatologyMapSeaIceConc(config, hemisphere='NH'))
-    analyses.append(sea_ice.ClimatologyMapSeaIceThick(config, hemisphere='NH'))
-    analyses.append(sea_ice.ClimatologyMapSeaIceConc(config, hemisphere='SH'))
-    analyses.append(sea_ice.ClimatologyMapSeaIceThick(config, hemisphere='SH'))
-    analyses.append(sea_ice.TimeSeriesSeaIce(config))
+    # analysis can only be imported after the right MPL renderer is selected.
+    # Only the modules of tasks selected by the 'generate' option are imported
+    analyses = build_analysis_tasks(config)
 
     # check which analysis we actually want to generate and only keep those
     analysesToGenerate = []
@@ -211,35 +733,97 @@ def build_analysis_list(config):  # {{{
     return analysesToGenerate  # }}}
 
 
-def run_analysis(config, analyses):  # {{{
+def run_node(config, graph, name):  # {{{
+    """
+    Run a single task or stage from the task graph, returning the exception
+    that was raised (if any)
 
-    # run each analysis task
-    lastException = None
-    for analysisTask in analyses:
-        # write out a copy of the configuration to document the run
-        logsDirectory = build_config_full_path(config, 'output',
-                                               'logsSubdirectory')
-        try:
-            startTime = time.clock()
-            analysisTask.run()
-            runDuration = time.clock() - startTime
-            m, s = divmod(runDuration, 60)
-            h, m = divmod(int(m), 60)
-            print 'Execution time: {}:{:02d}:{:05.2f}'.format(h, m, s)
-        except (Exception, BaseException) as e:
-            if isinstance(e, KeyboardInterrupt):
-                raise e
-            traceback.print_exc(file=sys.stdout)
-            print "ERROR: analysis module {} failed during run".format(
-                analysisTask.taskName)
-            lastException = e
+    Author: Xylar Asay-Davis
+    """
+
+    node = graph.nodes[name]
+    exception = None
+    start_recording(name)
+    try:
+        node.run()
+    except (Exception, BaseException) as e:
+        if isinstance(e, KeyboardInterrupt):
+            raise e
+        traceback.print_exc(file=sys.stdout)
+        if graph.is_stage(name):
+            print "ERROR: analysis stage {} failed during run".format(name)
+        else:
+            print "ERROR: analysis module {} failed during run".format(name)
+        exception = e
 
-        configFileName = '{}/configs/config.{}'.format(logsDirectory,
-                                                       analysisTask.taskName)
+    recorder = stop_recording(success=exception is None)
+    logsDirectory = build_config_full_path(config, 'output',
+                                           'logsSubdirectory')
+    recorder.write('{}/performance'.format(logsDirectory))
+    summary = recorder.summary
+    if summary['peakRSS'] is None:
+        # the peak was set by an earlier task in this process
+        peakMemory = 'unknown'
+    else:
+        peakMemory = '{:.2f} GB'.format(summary['peakRSS']/bytesPerGB)
+    print 'Execution time: {} (CPU time: {}, peak memory: {})'.format(
+        format_duration(summary['wallTime']),
+        format_duration(summary['cpuTime']),
+        peakMemory)
+
+    if not graph.is_stage(name):
+        if exception is None:
+            # record the inputs, config options and outputs so the task can
+            # be skipped next time if nothing has changed
+            write_manifest(node)
+
+        # write out a copy of the configuration to document the run
+        configFileName = '{}/configs/config.{}'.format(logsDirectory, name)
         configFile = open(configFileName, 'w')
         config.write(configFile)
         configFile.close()
 
+    return exception  # }}}
+
+
+def run_analysis(config, analyses, updateHistory=True):  # {{{
+    """
+    Run each analysis task, together with the stages it depends on, in serial
+
+    The runtime history is only updated if ``updateHistory`` is ``True``.  In
+    a subtask, the process that scheduled the tasks records their runtimes,
+    so that only one process writes the history.
+
+    Author: Xylar Asay-Davis
+    """
+
+    graph = TaskGraph(analyses)
+    skip_up_to_date_tasks(config, graph)
+
+    history = get_runtime_history(config)
+
+    lastException = None
+    while not graph.is_finished():
+        name = graph.ready_nodes()[0]
+        graph.set_running(name)
+        exception = run_node(config, graph, name)
+        if exception is None:
+            if updateHistory:
+                update_runtime_history(history, config, name)
+        else:
+            lastException = exception
+        skipped = graph.set_finished(name, exception is None)
+        for skippedName in skipped:
+            print "ERROR: {} will not be run because {} failed".format(
+                skippedName, name)
+
+    if updateHistory:
+        history.write()
+
+    # close the data sets that were shared between tasks, including those of
+    # tasks that failed before releasing them
+    datasetBroker.close_all()
+
     if config.getboolean('plot', 'displayToScreen'):
         import matplotlib.pyplot as plt
         plt.show()
@@ -251,6 +835,24 @@ def run_analysis(config, analyses):  # {{{
     return  # }}}
 
 
+def run_stage(config, analyses, stageName):  # {{{
+    """
+    Run a single stage of one of the analysis tasks (in a subtask)
+
+    Author: Xylar Asay-Davis
+    """
+
+    graph = TaskGraph(analyses)
+    if stageName not in graph.nodes or not graph.is_stage(stageName):
+        raise ValueError('Stage {} was not found in any of the analysis '
+                         'tasks'.format(stageName))
+
+    print 'Running stage {}'.format(stageName)
+    exception = run_node(config, graph, stageName)
+    if exception is not None:
+        raise exception  # }}}
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(
@@ -258,6 +860,32 @@ if __name__ == "__main__":
     parser.add_argument("--subtask", dest="subtask", action='store_true',
                         help="If this is a subtask when running parallel "
                              "tasks")
+    parser.add_argument("--worker", dest="worker", action='store_true',
+                        help="Run as a worker that runs tasks from the work "
+                             "queue written by another run_analysis.py "
+                             "process with executor = queue")
+    parser.add_argument("--watch", dest="watch", action='store_true',
+                        help="Follow a running simulation, updating the "
+                             "analysis each time another year of output is "
+                             "complete")
+    parser.add_argument("--estimate", dest="estimate", action='store_true',
+                        help="Report the input data, caches, mapping files "
+                             "and expected runtime of the analysis without "
+                             "running it")
+    parser.add_argument("--convert", dest="convert", action='store_true',
+                        help="Convert the history streams in the [convert] "
+                             "section into compressed, chunked stores (or "
+                             "append new output to them) instead of running "
+                             "the analysis")
+    parser.add_argument("--context", dest="context",
+                        help="A run context written by the process that "
+                             "launched this subtask, used instead of the "
+                             "config files",
+                        metavar="FILE")
+    parser.add_argument("--stage", dest="stage",
+                        help="The name of a stage to run (in a subtask) "
+                             "instead of running the analysis tasks",
+                        metavar="STAGE")
     parser.add_argument("-g", "--generate", dest="generate",
                         help="A list of analysis modules to generate "
                         "(nearly identical generate option in config file).",
@@ -278,24 +906,47 @@ if __name__ == "__main__":
                       'full set of configuration options.')
         configFiles = args.configFiles
 
-    config = MpasAnalysisConfigParser()
-    config.read(configFiles)
-
-    if args.generate:
-        update_generate(config, args.generate)
+    if args.context is not None:
+        config = runContext.read(args.context)
+        if args.generate:
+            update_generate(config, args.generate)
+    else:
+        config = read_config(configFiles, args.generate)
 
     logsDirectory = build_config_full_path(config, 'output',
                                            'logsSubdirectory')
     make_directories(logsDirectory)
     make_directories('{}/configs/'.format(logsDirectory))
 
+    if args.worker:
+        run_worker(config, configFiles)
+        sys.exit(0)
+
+    if args.convert:
+        convert_history_streams(config)
+        sys.exit(0)
+
+    if args.watch:
+        watch_simulation(configFiles, args.generate)
+
     analyses = build_analysis_list(config)
 
+    if args.estimate:
+        estimate_costs(config, analyses)
+        sys.exit(0)
+
     parallelTaskCount = config.getWithDefault('execute', 'parallelTaskCount',
                                               default=1)
-
-    if parallelTaskCount <= 1 or len(analyses) == 1:
-        run_analysis(config, analyses)
+    executor = config.getWithDefault('execute', 'executor',
+                                     default='subprocess')
+
+    if args.stage is not None:
+        run_stage(config, analyses, args.stage)
+    elif executor == 'queue' and not args.subtask:
+        run_queue_tasks(config, analyses)
+    elif parallelTaskCount <= 1 or len(analyses) == 1:
+        # the parent of a subtask records its runtime
+        run_analysis(config, analyses, updateHistory=not args.subtask)
     else:
         run_parallel_tasks(config, analyses, configFiles, parallelTaskCount)
 